@@ -0,0 +1,76 @@
+"""Sbatch: resolving a pasted list at once against one lookup per line.
+
+Builds the ``NameResolver`` from a loaded index (once per data version in
+the bot), then resolves a list of names, some noisy, some truncated and
+some missing, in one call. The baseline sends every line through the
+``Sitem`` path as its own SQL query, as users did before. Synthetic
+names differ only by a trailing number, which normalization drops, so
+most of them resolve as ambiguous; the timing is what matters here.
+
+    python -m benchmarks.bench_batch --rows 10000 100000 --names 300
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synth import make_db
+from scripts import batch
+from scripts import db as itemdb
+from scripts import search
+from scripts.item_index import ItemIndex
+
+
+def pasted_names(index, count, rng):
+    """Catalog names with inventory noise: stack sizes, case, OCR junk."""
+    names = []
+    rows = index.rows
+    for _ in range(count):
+        name = rng.choice(rows)[0]
+        roll = rng.random()
+        if roll < 0.2:
+            name = f"{name} x{rng.randint(2, 9)}"
+        elif roll < 0.4:
+            name = f"[{name.upper()}] |"
+        elif roll < 0.5:
+            name = name[:len(name) // 2]
+        elif roll < 0.6:
+            name = f"Unknown Thing {rng.randint(0, 999)}"
+        names.append(name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--names", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    print(f"{'rows':>9}  {'build':>9}  {'batch':>10}  {'per line':>10}  summary")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            itemdb.configure(make_db(Path(tmp) / f"items_{rows}.db", rows))
+            index = ItemIndex.load()
+            names = pasted_names(index, args.names, rng)
+
+            start = time.perf_counter()
+            resolver = batch.NameResolver(index.live_rows())
+            build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = resolver.resolve(names)
+            resolve = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for name in names:
+                search.run_search(name)
+            per_line = time.perf_counter() - start
+
+            print(f"{rows:>9}  {build:>7.2f} s  {resolve * 1000:>7.1f} ms"
+                  f"  {per_line * 1000:>7.1f} ms  {batch.summary(results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Offline load test of the bot's commands, without Discord.
+
+Builds a synthetic ``items.db`` of ``--rows`` items, loads it the way
+``setup_hook`` does and replays a mix of ``Sitem`` (the ``synth`` query
+mix), ``Srandom`` and ``Svoi`` from many users at each ``--concurrency``
+level. Commands run through their real handlers and the bot's invoke
+hooks; only Discord is faked:
+
+- ``FakeContext`` stands in for ``commands.Context`` (author, guild,
+  message, ``send``, and a no-op ``defer`` with no interaction);
+- ``FakeGateway`` takes every message sent and holds it for ``--send-ms``,
+  like a round trip to Discord's API.
+
+Reports throughput, p50/p95/p99 latency per command and peak RSS for each
+level, and with ``--stages`` the per-stage times from ``scripts.metrics``.
+``--sql`` serves searches from SQLite instead of the in-memory index and
+``--no-cache`` turns off the result cache, to load the paths behind them.
+The per-user and per-guild rate limits are off unless ``--limits``; with
+them, turned-away commands are counted apart from the latencies.
+
+    python -m benchmarks.bench_commands --rows 100000 --concurrency 1 8 32 --requests 2000
+"""
+import argparse
+import asyncio
+import random
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synth import QUERY_MIX, make_db
+from scripts import db as itemdb
+from scripts import metrics
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = f"user{user_id}"
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+
+class FakeMessage:
+    def __init__(self, content=None, embed=None, view=None):
+        self.content = content
+        self.embed = embed
+        self.view = view
+        self.attachments = []
+
+    async def edit(self, **fields):
+        pass
+
+
+class FakeGateway:
+    """Accepts sent messages after a fixed delay and counts them."""
+
+    def __init__(self, send_ms=0.0):
+        self.delay = send_ms / 1000
+        self.sent = 0
+        self.embeds = 0
+
+    async def deliver(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent += 1
+        self.embeds += message.embed is not None
+        return message
+
+
+class FakeCommand:
+    def __init__(self, name):
+        self.name = name
+        self.qualified_name = name
+
+
+class FakeContext:
+    """The parts of ``commands.Context`` the command handlers use."""
+
+    def __init__(self, gateway, command, author, guild):
+        self.gateway = gateway
+        self.command = FakeCommand(command)
+        self.command_failed = False
+        self.author = author
+        self.guild = guild
+        self.message = FakeMessage()
+        # Prefix invocations: there is no slash interaction to answer
+        self.interaction = None
+
+    async def defer(self, ephemeral=False):
+        pass
+
+    async def send(self, content=None, embed=None, view=None, **kwargs):
+        return await self.gateway.deliver(FakeMessage(content, embed, view))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_requests(count, weights, users, guilds, rng):
+    """``count`` (command, query, user, guild) tuples drawn from the mix."""
+    kinds = rng.choices(["item", "random", "voi"], weights=weights, k=count)
+    requests = []
+    for kind in kinds:
+        if kind == "item":
+            query = rng.choice(QUERY_MIX)
+        elif kind == "random":
+            query = rng.choice(["", "", "rarity:legendary", "voi:yes", "sword"])
+        else:
+            query = None
+        requests.append((kind, query, rng.choice(users), rng.choice(guilds)))
+    return requests
+
+
+async def invoke(main, gateway, kind, query, author, guild):
+    """Run one command the way the bot does: the rate limit check, then
+    hooks around the handler. Returns False if the check turned it away."""
+    handler = {"item": main.item_search, "random": main.random_item,
+               "voi": main.voi_items}[kind]
+    ctx = FakeContext(gateway, kind, author, guild)
+    try:
+        await main.check_rate_limit(ctx)
+    except main.Throttled:
+        return False
+    await main.start_command_timer(ctx)
+    try:
+        if query is None:
+            await handler.callback(ctx)
+        else:
+            await handler.callback(ctx, query=query)
+    except Exception:
+        ctx.command_failed = True
+        raise
+    finally:
+        await main.record_command_time(ctx)
+    return True
+
+
+async def run_level(main, gateway, requests, concurrency):
+    """Latencies by command and the wall time, replaying ``requests`` with
+    ``concurrency`` commands in flight."""
+    latencies = {}
+    pending = iter(requests)
+
+    async def worker():
+        for kind, query, author, guild in pending:
+            start = time.perf_counter()
+            if await invoke(main, gateway, kind, query, author, guild):
+                latencies.setdefault(kind, []).append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+async def run(args):
+    # Imported here so main's module-level pool points at the synthetic DB
+    # before anything opens it
+    import main
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        path = make_db(Path(tmp) / "items.db", args.rows)
+        print(f"built {args.rows} rows in {time.perf_counter() - started:.1f} s, "
+              f"peak RSS {peak_rss_mb():.0f} MB")
+        itemdb.configure(path, max_connections=main.DB_WORKERS)
+        await main.load_item_index()
+        if args.sql:
+            main.item_index = None
+        if args.no_cache:
+            main.result_cache.ttl = 0
+        if not args.limits:
+            main.gateway.users.rate = main.gateway.guilds.rate = 0
+
+        rng = random.Random(args.seed)
+        users = [FakeUser(1000 + i) for i in range(args.users)]
+        guilds = [FakeGuild(1 + i) for i in range(args.guilds)]
+        requests = make_requests(args.requests, args.weights, users, guilds, rng)
+        # One untimed pass over the distinct queries: plans compiled, pages cached
+        for kind, query in sorted({(kind, query or "") for kind, query, _, _ in requests}):
+            await invoke(main, FakeGateway(), kind, None if kind == "voi" else query,
+                         users[0], guilds[0])
+        metrics.registry.clear()
+
+        print(f"\n{'conc':>5} {'req/s':>8}  {'command':<7} {'n':>6} "
+              f"{'p50':>8} {'p95':>8} {'p99':>8}  {'peak RSS':>9}")
+        for concurrency in args.concurrency:
+            gateway = FakeGateway(args.send_ms)
+            before = main.gateway.stats()
+            latencies, elapsed = await run_level(main, gateway, requests, concurrency)
+            after = main.gateway.stats()
+            everything = [value for values in latencies.values() for value in values]
+            rows = [("all", everything)] + sorted(latencies.items())
+            for i, (kind, values) in enumerate(rows):
+                lead = (f"{concurrency:>5} {len(everything) / elapsed:>8.0f}" if i == 0
+                        else " " * 14)
+                tail = f"  {peak_rss_mb():>6.0f} MB" if i == 0 else ""
+                print(f"{lead}  {kind:<7} {len(values):>6} "
+                      + " ".join(f"{percentile(values, pct) * 1000:>5.2f} ms"
+                                 for pct in (50, 95, 99)) + tail)
+            counts = {key: after[key] - before[key]
+                      for key in ("executed", "coalesced", "throttled_user", "throttled_guild")}
+            print(" " * 14 + "  " + ", ".join(f"{n} {key.replace('_', ' by ')}"
+                                               for key, n in counts.items()))
+
+        if args.stages:
+            print(f"\n{'stage':<16} {'n':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+            for summary in sorted(metrics.registry.summaries("bot_stage_seconds"),
+                                  key=lambda s: (s.labels["command"], s.labels["stage"])):
+                label = f"{summary.labels['command']}/{summary.labels['stage']}"
+                print(f"{label:<16} {summary.count:>7} "
+                      + " ".join(f"{value * 1000:>5.2f} ms"
+                                 for value in (summary.p50, summary.p95, summary.p99)))
+        main.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--weights", type=float, nargs=3, default=[85, 10, 5],
+                        metavar=("ITEM", "RANDOM", "VOI"), help="share of each command")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--guilds", type=int, default=5)
+    parser.add_argument("--send-ms", type=float, default=0.0,
+                        help="simulated Discord round trip per message")
+    parser.add_argument("--sql", action="store_true",
+                        help="search SQLite instead of the in-memory index")
+    parser.add_argument("--no-cache", action="store_true", help="turn off the result cache")
+    parser.add_argument("--limits", action="store_true",
+                        help="apply the per-user and per-guild rate limits")
+    parser.add_argument("--stages", action="store_true", help="also print per-stage latency")
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
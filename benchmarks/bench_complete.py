@@ -0,0 +1,83 @@
+"""/item autocomplete: bisect over sorted keys against scanning every name.
+
+Builds a ``Completer`` from a synthetic catalog, then replays typing:
+every prefix of sampled item names, of words from the middle of names,
+and of filters (``sub:ele``...), one completion per keystroke. Reports
+build time, per-keystroke latency (mean, p99) and keystrokes per second
+for the completer and for a linear scan that checks every name with
+``startswith``.
+
+    python -m benchmarks.bench_complete --rows 10000 100000 --typed 300
+"""
+import argparse
+import random
+import time
+
+from benchmarks.synth import make_row
+from scripts.complete import MAX_CHOICES, Completer
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def keystrokes(completer, count, rng):
+    """Every prefix of ``count`` things a user might type."""
+    typed = []
+    for name in rng.sample(completer.names, count):
+        typed.append(name)
+        words = name.split()
+        if len(words) > 1:
+            typed.append(rng.choice(words[1:]))
+    typed += [f"sub:{tag}" for tag in rng.sample(completer.popular, min(5, len(completer.popular)))]
+    return [text[:i] for text in typed for i in range(1, len(text) + 1)]
+
+
+def scan(names, lowered, text):
+    prefix = text.lower()
+    found = []
+    for name, key in zip(names, lowered):
+        if key.startswith(prefix) or f" {prefix}" in key:
+            found.append(name)
+            if len(found) == MAX_CHOICES:
+                break
+    return found
+
+
+def measure(complete, typed):
+    times = []
+    for text in typed:
+        start = time.perf_counter()
+        complete(text)
+        times.append(time.perf_counter() - start)
+    total = sum(times)
+    return total / len(times) * 1e6, percentile(times, 99) * 1e6, len(times) / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--typed", type=int, default=300, help="names typed out per run")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    print(f"{'rows':>7}  {'method':<9} {'build':>8}  {'mean':>10} {'p99':>10} {'keys/s':>10}")
+    for rows in args.rows:
+        catalog = [make_row(rng, i)[:5] for i in range(rows)]
+        start = time.perf_counter()
+        completer = Completer(catalog)
+        build = time.perf_counter() - start
+        typed = keystrokes(completer, min(args.typed, rows), rng)
+
+        names = completer.names
+        lowered = [name.lower() for name in names]
+        for label, built, complete in (
+                ("bisect", f"{build:>6.2f} s", completer.complete),
+                ("scan", "", lambda text: scan(names, lowered, text))):
+            mean, p99, rate = measure(complete, typed)
+            print(f"{rows:>7}  {label:<9} {built:>8}  {mean:>7.1f} us {p99:>7.1f} us {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Command latency under a burst of concurrent ``Sitem`` invocations.
+
+Compares running the searches inline on the event loop (the old handlers)
+with running them through ``QueryRunner``. Alongside p50/p99 command
+latency it reports the worst heartbeat delay, i.e. how long the gateway
+loop was unable to run anything else.
+
+    python -m benchmarks.bench_concurrency --rows 200000 --commands 100
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synth import QUERY_MIX, make_db
+from scripts import db as itemdb
+from scripts import search
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def heartbeat(interval, lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def burst(commands, runner=None):
+    latencies = []
+    lags = []
+    stop = asyncio.Event()
+
+    # Every command arrives at once, so latency is measured from the burst
+    # start: a command stuck behind others on the loop counts that wait.
+    start = time.perf_counter()
+
+    async def command(query):
+        if runner is None:
+            search.run_search(query)
+        else:
+            await runner.run(search.run_search, query)
+        latencies.append(time.perf_counter() - start)
+
+    beat = asyncio.create_task(heartbeat(0.005, lags, stop))
+    await asyncio.sleep(0)
+    await asyncio.gather(*(command(QUERY_MIX[i % len(QUERY_MIX)])
+                           for i in range(commands)))
+    stop.set()
+    await beat
+    return latencies, lags
+
+
+def report(label, latencies, lags):
+    ms = [x * 1000 for x in latencies]
+    print(f"{label:<14} p50 {statistics.median(ms):8.1f} ms   "
+          f"p99 {percentile(ms, 99):8.1f} ms   "
+          f"max loop stall {max(lags, default=0) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--commands", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=itemdb.DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        itemdb.configure(make_db(Path(tmp) / "items.db", args.rows),
+                         max_connections=args.workers)
+        print(f"{args.commands} concurrent Sitem commands over {args.rows} rows")
+
+        report("inline", *asyncio.run(burst(args.commands)))
+
+        runner = itemdb.QueryRunner(max_workers=args.workers)
+        try:
+            report(f"pool x{args.workers}",
+                   *asyncio.run(burst(args.commands, runner)))
+        finally:
+            runner.close()
+        print(f"connection pool: {itemdb.pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
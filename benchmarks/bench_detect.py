@@ -0,0 +1,82 @@
+"""Slot detection: candidates kept per stage, and what they cost in OCR.
+
+Runs ``scripts.slots.detect`` on ``inventoryExample.png`` (or
+``--image``) and prints how many candidates each stage keeps. Then it
+times a whole screenshot, detection plus reading every box, two ways:
+
+- every outer contour of the mask as a box, as before;
+- the filtered, grid-snapped slots.
+
+Reads go through Tesseract (``--tesseract`` if it is not on PATH), or,
+with ``--stand-in MS``, through the fixed per-crop cost of
+``bench_ocr``'s stand-in. The stand-in charges a 1x1 speck as much as a
+slot, so it shows the upper bound of the saving.
+
+    python -m benchmarks.bench_detect --images 3
+    python -m benchmarks.bench_detect --stand-in 20
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+from benchmarks.bench_ocr import StandIn
+from scripts import ocr_inventory
+from scripts.ocr_inventory import OcrPool, TesseractNotFoundError, load_image, read_text
+from scripts.slots import detect, mask_regions, reading_order
+
+SAMPLE = Path(__file__).resolve().parent.parent / "inventoryExample.png"
+
+
+def every_contour(img):
+    return reading_order([box for box, _ in mask_regions(img)])
+
+
+def detected_slots(img):
+    return detect(img).boxes
+
+
+def scan(img, find, pool):
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    boxes = find(img)
+    return pool.map([gray[y:y + h, x:x + w] for x, y, w, h in boxes])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", default=str(SAMPLE))
+    parser.add_argument("--images", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--tesseract", help="path to the tesseract binary")
+    parser.add_argument("--stand-in", type=float, metavar="MS",
+                        help="fake each read with MS ms of OpenCV work")
+    args = parser.parse_args()
+
+    img = load_image(args.image)
+    detection = detect(img)
+    print("candidates: " + " -> ".join(f"{count} {stage}"
+                                      for stage, count in detection.counts.items()))
+    print(f"grid: {detection.grid}")
+
+    ocr_inventory.configure(args.tesseract)
+    pool = OcrPool(args.workers, StandIn(args.stand_in) if args.stand_in else read_text)
+    times = {}
+    try:
+        for label, find in (("every contour", every_contour), ("detected slots", detected_slots)):
+            scan(img, find, pool)  # warm up
+            start = time.perf_counter()
+            for _ in range(args.images):
+                scan(img, find, pool)
+            times[label] = (time.perf_counter() - start) / args.images
+            print(f"{label:<15} {len(find(img)):>4} reads  {times[label] * 1000:>8.1f} ms/image")
+    except TesseractNotFoundError as e:
+        sys.exit(f"{e}\nPass --tesseract, or --stand-in MS to time with a stand-in reader.")
+    finally:
+        pool.close()
+    print(f"speedup: {times['every contour'] / times['detected slots']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
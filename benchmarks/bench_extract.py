@@ -0,0 +1,76 @@
+"""Per-screenshot cost of extract_items around OCR, with and without debug dumps.
+
+Runs ``extract_items`` on ``inventoryExample.png`` (or ``--image``) with
+a reader that returns at once, so the times cover everything but
+Tesseract itself: decoding, slot detection, crops and any dumping.
+Compared:
+
+- the old loop: a ``cvtColor`` copy per crop, and both crops written
+  as PNGs for every screenshot;
+- the in-memory path: one grayscale conversion, crops as views;
+- the same with ``DebugDumps`` saving every screenshot, then one in
+  ten.
+
+Images are decoded from PNG bytes each run, as ``Sscan`` receives them.
+
+    python -m benchmarks.bench_extract --images 50
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+
+from scripts.ocr_inventory import (DebugDumps, OcrPool, Slot, extract_items, find_boxes,
+                                   load_image)
+
+SAMPLE = Path(__file__).resolve().parent.parent / "inventoryExample.png"
+
+
+def no_read(crop):
+    return ""
+
+
+def old_extract_items(image, directory):
+    img = load_image(image)
+    slots = []
+    for i, (x, y, w, h) in enumerate(find_boxes(img)):
+        crop = img[y:y + h, x:x + w]
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        cv2.imwrite(f"{directory}/{i}_raw.png", crop)
+        cv2.imwrite(f"{directory}/{i}_gray.png", gray)
+        slots.append(Slot((x, y, w, h), no_read(gray)))
+    return slots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", default=str(SAMPLE))
+    parser.add_argument("--images", type=int, default=50)
+    args = parser.parse_args()
+
+    data = Path(args.image).read_bytes()
+    pool = OcrPool(1, no_read)
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [
+            ("old loop, always dumps", lambda: old_extract_items(data, tmp)),
+            ("in memory, no dumps", lambda: extract_items(data, pool)),
+            ("in memory, dump all", lambda: extract_items(data, pool, every)),
+            ("in memory, dump 1/10", lambda: extract_items(data, pool, tenth)),
+        ]
+        every = DebugDumps(Path(tmp) / "every")
+        tenth = DebugDumps(Path(tmp) / "tenth", every=10)
+        expected = extract_items(data, pool)
+        print(f"{len(expected)} slots per screenshot, {args.images} screenshots")
+        for label, run in runs:
+            assert run() == expected
+            start = time.perf_counter()
+            for _ in range(args.images):
+                run()
+            per_image = (time.perf_counter() - start) / args.images
+            print(f"{label:<24} {per_image * 1000:>7.2f} ms/image")
+
+
+if __name__ == "__main__":
+    main()
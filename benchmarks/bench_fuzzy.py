@@ -0,0 +1,139 @@
+"""Fuzzy name matching: trigram index against naive scans.
+
+Builds catalogs of distinct names, then looks up names with one or two
+random typos (substituted, dropped, doubled or swapped letters). Two
+vocabularies: ``shared`` composes names from the few hundred words of
+``benchmarks.synth``, so every trigram is in thousands of names (a worst
+case for the index); ``invented`` draws from several thousand made-up
+words, closer to a real catalog of that size. Reports recall (the
+intended name ranks first / in the top 5) and per-lookup latency for:
+
+- ``FuzzyMatcher``, the trigram index;
+- the same Dice scoring as a pure-Python scan over every name, which
+  must rank identically (the index only skips names that cannot score);
+- ``difflib.get_close_matches``, the stdlib's edit-similarity scan.
+
+The scans are slow at 100k names, so they run on a sample of the lookups.
+
+    python -m benchmarks.bench_fuzzy --names 10000 100000 --lookups 1000
+"""
+import argparse
+import difflib
+import random
+import string
+import time
+
+from benchmarks.synth import PREFIXES, WORDS
+from scripts.fuzzy import MIN_SCORE, TOP_K, FuzzyMatcher, trigrams
+
+
+ONSETS = ["", "b", "br", "c", "cr", "d", "dr", "f", "g", "gr", "h", "k", "kr", "l",
+          "m", "n", "p", "r", "s", "sh", "st", "t", "th", "v", "w", "z"]
+VOWELS = ["a", "e", "i", "o", "u", "ae", "ei", "ou", "y"]
+CODAS = ["", "", "n", "r", "l", "s", "th", "x", "nd", "rk", "st"]
+
+
+def shared_names(count, rng):
+    names = set()
+    while len(names) < count:
+        name = f"{rng.choice(PREFIXES)}{rng.choice(WORDS)} {rng.choice(WORDS)}"
+        if rng.random() < 0.7:
+            name += f" of {rng.choice(PREFIXES)}{rng.choice(WORDS)}"
+        names.add(name)
+    return sorted(names)
+
+
+def invented_names(count, rng):
+    vocab = {"".join(rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS)
+                     for _ in range(rng.randint(2, 3)))
+             for _ in range(8000)}
+    vocab = sorted(vocab) + WORDS
+    names = set()
+    while len(names) < count:
+        names.add(" ".join(rng.choice(vocab) for _ in range(rng.choice((1, 2, 2, 3)))))
+    return sorted(names)
+
+
+VOCABULARIES = {"shared": shared_names, "invented": invented_names}
+
+
+def typo(name, rng, edits):
+    for _ in range(edits):
+        i = rng.randrange(len(name))
+        kind = rng.randrange(4)
+        if kind == 0:
+            name = name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1:]
+        elif kind == 1 and len(name) > 4:
+            name = name[:i] + name[i + 1:]
+        elif kind == 2:
+            name = name[:i] + name[i] + name[i:]
+        elif i + 1 < len(name):
+            name = name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return name
+
+
+def dice_scan(names, name_grams, text, k=TOP_K, min_score=MIN_SCORE):
+    grams = trigrams(text)
+    scored = []
+    for name, other in zip(names, name_grams):
+        score = 2 * len(grams & other) / (len(grams) + len(other))
+        if score >= min_score:
+            scored.append((-score, name))
+    scored.sort()
+    return [name for _, name in scored[:k]]
+
+
+def measure(lookup, cases):
+    """(recall@1, recall@5, mean ms, worst ms) of ``lookup`` over (query, answer) cases."""
+    first = top = 0
+    times = []
+    for query, answer in cases:
+        start = time.perf_counter()
+        found = lookup(query)
+        times.append(time.perf_counter() - start)
+        first += bool(found) and found[0] == answer
+        top += answer in found
+    return (first / len(cases), top / len(cases),
+            sum(times) / len(times) * 1000, max(times) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--scan-lookups", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    print(f"{'vocab':<8} {'names':>7}  {'method':<10} {'build':>8}  {'recall@1':>8}"
+          f"  {'recall@5':>8}  {'mean':>9}  {'worst':>9}")
+    for vocab, count in ((vocab, count) for vocab in VOCABULARIES for count in args.names):
+        names = VOCABULARIES[vocab](count, rng)
+        cases = [(typo(answer, rng, rng.choice((1, 2))), answer)
+                 for answer in rng.sample(names, args.lookups)]
+        sample = cases[:args.scan_lookups]
+
+        start = time.perf_counter()
+        matcher = FuzzyMatcher(names)
+        build = time.perf_counter() - start
+        name_grams = [trigrams(name) for name in names]
+
+        for query, _ in sample:
+            found = [name for name, _ in matcher.search(query)]
+            assert found[:1] == dice_scan(names, name_grams, query)[:1], query
+
+        rows = [
+            ("trigram", f"{build:>6.2f} s", cases,
+             lambda q: [name for name, _ in matcher.search(q)]),
+            ("dice scan", "", sample, lambda q: dice_scan(names, name_grams, q)),
+            ("difflib", "", sample,
+             lambda q: difflib.get_close_matches(q, names, TOP_K, MIN_SCORE)),
+        ]
+        for label, built, lookups, lookup in rows:
+            r1, r5, mean, worst = measure(lookup, lookups)
+            print(f"{vocab:<8} {count:>7}  {label:<10} {built:>8}  {r1:>8.3f}  {r5:>8.3f}"
+                  f"  {mean:>6.3f} ms  {worst:>6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Raid-like bursts of identical searches, with and without single flight.
+
+Fires ``--burst`` concurrent copies of the same uncached search (over
+``--distinct`` different queries from the ``synth`` mix) at SQLite through
+``QueryRunner``, once with every caller running its own query and once
+through ``CommandGateway.run``, where callers asking for a search already
+in flight share it. Reports queries actually executed, wall time and
+p50/p99 latency, plus what a rate limit check costs per command.
+
+    python -m benchmarks.bench_gateway --rows 100000 --burst 10 100 500
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synth import QUERY_MIX, make_db
+from scripts import db as itemdb
+from scripts import search
+from scripts.gateway import CommandGateway
+from scripts.query import compile_query
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def burst(runner, queries, size, gateway=None):
+    """(queries executed, wall seconds, latencies) for ``size`` concurrent searches."""
+    executed = 0
+
+    async def query(compiled):
+        nonlocal executed
+        executed += 1
+        return await runner.run(search.execute, compiled, None, None, 11)
+
+    async def one(i):
+        compiled = queries[i % len(queries)]
+        start = time.perf_counter()
+        if gateway is None:
+            await query(compiled)
+        else:
+            await gateway.run(compiled.key, lambda: query(compiled))
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(size)))
+    return executed, time.perf_counter() - start, latencies
+
+
+async def run(args):
+    runner = itemdb.QueryRunner(args.workers, max_pending=max(args.burst))
+    queries = [compile_query(text) for text in QUERY_MIX[:args.distinct]]
+    await burst(runner, queries, len(queries))  # warm the page cache
+
+    print(f"{'burst':>6} {'mode':<9} {'queries':>8} {'wall':>10} {'p50':>10} {'p99':>10}")
+    for size in args.burst:
+        for mode, gateway in (("separate", None), ("shared", CommandGateway())):
+            executed, wall, latencies = await burst(runner, queries, size, gateway)
+            print(f"{size:>6} {mode:<9} {executed:>8} {wall * 1000:>7.1f} ms "
+                  f"{percentile(latencies, 50) * 1000:>7.1f} ms "
+                  f"{percentile(latencies, 99) * 1000:>7.1f} ms")
+    runner.close()
+
+    gateway = CommandGateway(20 / 60, 5, 300 / 60, 50)
+    calls = 200_000
+    start = time.perf_counter()
+    for i in range(calls):
+        gateway.admit(i % 5000, i % 20)
+    per_call = (time.perf_counter() - start) / calls * 1e6
+    stats = gateway.stats()
+    print(f"\nadmit: {per_call:.2f} us per command over 5000 users in 20 guilds "
+          f"({stats['throttled_user']} throttled by user, "
+          f"{stats['throttled_guild']} by guild)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--burst", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--distinct", type=int, default=3,
+                        help="different queries in each burst")
+    parser.add_argument("--workers", type=int, default=itemdb.DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        itemdb.configure(make_db(Path(tmp) / "items.db", args.rows), args.workers)
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Bulk import throughput for scripts/import_items.py.
+
+Builds a synthetic spreadsheet frame (same headers and cell shapes as
+data/items.xlsx) and times normalize + load into an empty DB, then a
+re-import with a share of edited rows. ``--baseline`` also times the old
+``iterrows()`` + one-INSERT-per-row loop on the same frame.
+
+``--stream`` writes the sheet to CSV and runs the streaming importer on
+growing prefixes of it, reporting time and peak Python heap per size.
+
+``--sync`` edits, deletes and adds ``--changed`` of the rows after the
+first import and times ``sync_frame`` against a full re-import, then
+patching the in-memory index from the change log against reloading it.
+
+    python -m benchmarks.bench_import --rows 500000 --baseline
+    python -m benchmarks.bench_import --rows 500000 --stream
+    python -m benchmarks.bench_import --rows 100000 --sync --changed 0.001
+"""
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.synth import make_row
+from scripts import db as itemdb
+from scripts.import_items import import_frame, normalize_frame, stream_import, sync_frame
+from scripts.init_db import init_db
+from scripts.item_index import ItemIndex
+
+
+def make_sheet(rows: int, seed: int = 1) -> pd.DataFrame:
+    rng = random.Random(seed)
+    data = [make_row(rng, i) for i in range(rows)]
+    return pd.DataFrame({
+        "item_name": [f"  {r[0]} " for r in data],
+        "category": [float("nan")] * rows,
+        "Subcategories": [r[2] for r in data],
+        "Rarity": [r[3].title() for r in data],
+        "VOI": ["yes" if r[4] else float("nan") for r in data],
+    })
+
+
+def row_loop(conn, df):
+    """The previous importer, kept here as the baseline."""
+    df = df.copy()
+    df.columns = [c.strip().lower() for c in df.columns]
+    cur = conn.cursor()
+    for _, row in df.iterrows():
+        name = row.get("item_name")
+        if pd.isna(name):
+            continue
+        voi_raw = str(row.get("voi", "")).strip().lower()
+        voi = 1 if voi_raw in ["yes", "true", "1"] else 0
+        cur.execute("""
+            INSERT OR IGNORE INTO items
+            (name, category, subcategories, rarity, voi, notes)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            name.strip(),
+            str(row.get("category", "")).strip().lower(),
+            str(row.get("subcategories", "")).strip().lower(),
+            str(row.get("rarity", "")).strip().lower(),
+            voi,
+            str(row.get("notes", "")).strip()
+        ))
+    conn.commit()
+
+
+def fresh_db(path: Path) -> sqlite3.Connection:
+    if path.exists():
+        path.unlink()
+    conn = sqlite3.connect(path)
+    init_db(conn)
+    return conn
+
+
+def stream_sizes(sheet: pd.DataFrame, tmp: Path, batch_size: int):
+    for rows in (len(sheet) // 10, len(sheet) // 2, len(sheet)):
+        source = tmp / f"sheet_{rows}.csv"
+        sheet.iloc[:rows].to_csv(source, index=False)
+        conn = fresh_db(tmp / f"stream_{rows}.db")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        stream_import(conn, source, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        conn.close()
+
+        print(f"stream        {rows} rows  {elapsed:7.2f} s  "
+              f"peak heap {peak / 2**20:6.1f} MiB")
+
+
+def sync_changes(sheet: pd.DataFrame, tmp: Path, share: float):
+    path = tmp / "sync.db"
+    conn = fresh_db(path)
+    import_frame(conn, normalize_frame(sheet))
+    itemdb.configure(path)
+    index = ItemIndex.load()
+    version = itemdb.data_version()
+
+    # Equal parts edited, deleted and new rows
+    count = max(1, int(len(sheet) * share / 3))
+    edited = sheet.sample(n=count, random_state=1).index
+    sheet = sheet.copy()
+    sheet.loc[edited, "Rarity"] = "Relic"
+    sheet = sheet.drop(sheet.drop(edited).sample(n=count, random_state=2).index)
+    sheet = pd.concat([sheet, make_sheet(count, seed=2).assign(
+        item_name=lambda df: df["item_name"] + " Mk II")])
+
+    start = time.perf_counter()
+    diff = sync_frame(conn, normalize_frame(sheet))
+    print(f"sync          {len(sheet)} rows  {time.perf_counter() - start:7.2f} s  "
+          f"{len(diff['added'])} added, {len(diff['changed'])} changed, "
+          f"{len(diff['removed'])} removed")
+
+    full_conn = fresh_db(tmp / "full.db")
+    start = time.perf_counter()
+    import_frame(full_conn, normalize_frame(sheet))
+    print(f"full import   {len(sheet)} rows  {time.perf_counter() - start:7.2f} s")
+    full_conn.close()
+    conn.close()
+
+    start = time.perf_counter()
+    names = itemdb.changed_names(version)
+    patched = index.reload_rows(names)
+    print(f"index patch   {len(names)} names  {(time.perf_counter() - start) * 1000:7.1f} ms"
+          f"  (stale: {patched.stale})")
+    start = time.perf_counter()
+    ItemIndex.load()
+    print(f"index reload  {len(sheet)} rows  {(time.perf_counter() - start) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--changed", type=float, default=0.01,
+                        help="share of rows edited before the re-import")
+    parser.add_argument("--baseline", action="store_true")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--sync", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    sheet = make_sheet(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.stream:
+            stream_sizes(sheet, Path(tmp), args.batch_size)
+            return
+        if args.sync:
+            sync_changes(sheet, Path(tmp), args.changed)
+            return
+
+        conn = fresh_db(Path(tmp) / "bulk.db")
+        start = time.perf_counter()
+        counts = import_frame(conn, normalize_frame(sheet), source_rows=len(sheet))
+        print(f"bulk import   {args.rows} rows  {time.perf_counter() - start:7.2f} s  {counts}")
+
+        edited = sheet.sample(frac=args.changed, random_state=1).index
+        sheet.loc[edited, "Rarity"] = "Relic"
+        start = time.perf_counter()
+        counts = import_frame(conn, normalize_frame(sheet), source_rows=len(sheet))
+        print(f"re-import     {args.rows} rows  {time.perf_counter() - start:7.2f} s  {counts}")
+        conn.close()
+
+        if args.baseline:
+            conn = fresh_db(Path(tmp) / "loop.db")
+            start = time.perf_counter()
+            row_loop(conn, sheet)
+            print(f"row loop      {args.rows} rows  {time.perf_counter() - start:7.2f} s")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
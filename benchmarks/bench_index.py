@@ -0,0 +1,67 @@
+"""ItemIndex against the SQLite search functions.
+
+Times compiled AND (``a + b``) and OR (``a, b``) tag queries on both
+backends at several catalog sizes, plus the index build.
+
+    python -m benchmarks.bench_index --rows 1000 100000 1000000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synth import make_db
+from scripts import db as itemdb
+from scripts import search
+from scripts.item_index import ItemIndex
+from scripts.query import compile_query
+
+AND_QUERIES = [compile_query(" + ".join(tags)) for tags in (
+    ["sword", "flame"], ["heavy", "frost"], ["light", "dagger"],
+    ["deep", "blade"], ["medium", "elemental", "shadow"])]
+OR_QUERIES = [compile_query(", ".join(tags)) for tags in (
+    ["sword", "spear"], ["bow", "rifle"], ["shadow", "blood"],
+    ["knell", "requiem"], ["greataxe", "hammer", "club"])]
+
+
+def per_query_ms(fn, queries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for compiled in queries:
+            fn(compiled.plan, compiled.values)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+",
+                        default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'build':>9}  {'AND sql':>10}  {'AND index':>10}"
+          f"  {'OR sql':>10}  {'OR index':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            itemdb.configure(make_db(Path(tmp) / f"items_{rows}.db", rows))
+
+            start = time.perf_counter()
+            index = ItemIndex.load()
+            build = time.perf_counter() - start
+
+            for compiled in AND_QUERIES + OR_QUERIES:
+                assert search.execute(compiled, index) == search.execute(compiled)
+
+            timings = [
+                per_query_ms(search.sql_backend.execute, AND_QUERIES, args.repeat),
+                per_query_ms(index.execute, AND_QUERIES, args.repeat),
+                per_query_ms(search.sql_backend.execute, OR_QUERIES, args.repeat),
+                per_query_ms(index.execute, OR_QUERIES, args.repeat),
+            ]
+            print(f"{rows:>9}  {build:>7.2f} s" + "".join(
+                f"  {ms:>7.3f} ms" for ms in timings))
+            del index
+
+
+if __name__ == "__main__":
+    main()
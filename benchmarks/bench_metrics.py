@@ -0,0 +1,74 @@
+"""What the instrumentation costs on the hot path.
+
+Times the query mix through ``search.execute`` on pooled SQLite
+connections with the statement clock installed (every statement shaped
+and recorded in ``bot_db_query_seconds``) and with it removed, plus the
+per-call cost of recording a histogram value and of a ``stage`` block.
+
+    python -m benchmarks.bench_metrics --rows 100000 --repeat 20
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synth import QUERY_MIX, make_db
+from scripts import db as itemdb
+from scripts import metrics, search
+from scripts.query import compile_query
+
+
+def per_call_us(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def run_mix(compiled, repeat):
+    for _ in range(repeat):
+        for query in compiled:
+            search.execute(query, limit=11)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    registry = metrics.registry
+    histogram = registry.histogram("bench_seconds")
+    print(f"histogram.observe       {per_call_us(lambda: histogram.observe(0.003), 200_000):>7.2f} us")
+    print(f"registry.observe        "
+          f"{per_call_us(lambda: registry.observe('bench_seconds', 0.003, command='item'), 200_000):>7.2f} us")
+
+    def staged():
+        with metrics.stage("bench", "fetch"):
+            pass
+    print(f"stage block             {per_call_us(staged, 200_000):>7.2f} us")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        itemdb.configure(make_db(Path(tmp) / "items.db", args.rows), max_connections=1)
+        compiled = [compile_query(text) for text in QUERY_MIX]
+        run_mix(compiled, 1)  # warm the page cache and the statement cache
+        pool = itemdb.get_pool()
+        calls = args.repeat * len(compiled)
+
+        timings = {}
+        for label, traced in (("clock off", False), ("clock on", True), ("clock off", False)):
+            with pool.connection() as conn:
+                conn.set_trace_callback(pool._clocks[conn] if traced else None)
+            start = time.perf_counter()
+            run_mix(compiled, args.repeat)
+            timings.setdefault(label, []).append((time.perf_counter() - start) / calls * 1000)
+        off = min(timings["clock off"])
+        on = timings["clock on"][0]
+        print(f"query mix, clock off    {off:>7.3f} ms/query")
+        print(f"query mix, clock on     {on:>7.3f} ms/query  ({(on - off) * 1000:+.1f} us)")
+        shapes = registry.summaries("bot_db_query_seconds")
+        print(f"{len(shapes)} statement shapes recorded for {len(QUERY_MIX)} queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Throughput of normalize_line / normalize_lines on OCR-like text.
+
+Generates lines shaped like OCR'd inventory rows (synthetic item names
+with stack sizes, brackets, stray symbols, smeared letters, curly
+apostrophes and the misreads ``COMMON_FIXES`` knows about) and reports
+lines per second for the old five-``re.sub`` implementation, the
+current ``normalize_line`` called per line, and ``normalize_lines`` over
+a generator. All three must produce the same output.
+
+    python -m benchmarks.bench_normalize --lines 200000
+"""
+import argparse
+import random
+import re
+import time
+
+from benchmarks.synth import PREFIXES, WORDS
+from scripts.normalize import COMMON_FIXES, normalize_line, normalize_lines
+
+JUNK = ["|", "!", "[", "]", "=", "%", "_", "-", "?", ".", ",", "~", "©", "»"]
+
+
+def old_normalize_line(line, fix_ocr=True):
+    line = line.lower()
+    line = line.replace("’", "'")
+    line = re.sub(r"[\[\]\|\!\?\=\%\_\-]", " ", line)
+    line = re.sub(r"\d+", " ", line)
+    line = re.sub(r"(.)\1{2,}", r"\1", line)
+    line = re.sub(r"[^a-z'\s]", " ", line)
+    line = re.sub(r"\s+", " ", line).strip()
+    if fix_ocr:
+        for bad, good in COMMON_FIXES.items():
+            line = line.replace(bad, good)
+    return line
+
+
+def ocr_line(rng):
+    words = [f"{rng.choice(PREFIXES)}{rng.choice(WORDS)}", rng.choice(WORDS)]
+    if rng.random() < 0.3:
+        words += ["of", rng.choice(WORDS)]
+    if rng.random() < 0.05:
+        words[0] = rng.choice(list(COMMON_FIXES))
+    line = " ".join(word.title() if rng.random() < 0.5 else word for word in words)
+    if rng.random() < 0.2:
+        i = rng.randrange(len(line))
+        line = line[:i] + line[i] * rng.randint(3, 5) + line[i + 1:]
+    if rng.random() < 0.1:
+        line = line.replace("'", "’") + "’s"
+    if rng.random() < 0.4:
+        line = f"{line} x{rng.randint(2, 99)}"
+    if rng.random() < 0.5:
+        line = f"{rng.choice(JUNK)} {line} {rng.choice(JUNK)}{rng.choice(JUNK)}"
+    return line
+
+
+def rate(count, seconds):
+    return f"{count / seconds:>12,.0f} lines/s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(16)
+    lines = [ocr_line(rng) for _ in range(args.lines)]
+    expected = [old_normalize_line(line) for line in lines]
+    assert [normalize_line(line) for line in lines] == expected
+    assert list(normalize_lines(iter(lines))) == expected
+    assert list(normalize_lines(lines, fix_ocr=False)) == \
+        [old_normalize_line(line, fix_ocr=False) for line in lines]
+
+    runs = [
+        ("old normalize_line", lambda: [old_normalize_line(line) for line in lines]),
+        ("normalize_line", lambda: [normalize_line(line) for line in lines]),
+        ("normalize_lines", lambda: list(normalize_lines(line for line in lines))),
+        ("  fix_ocr=False", lambda: list(normalize_lines(iter(lines), fix_ocr=False))),
+    ]
+    print(f"{len(lines):,} lines, best of {args.repeat}")
+    for label, run in runs:
+        best = min(timed(run) for _ in range(args.repeat))
+        print(f"{label:<20} {rate(len(lines), best)}  {best * 1e6 / len(lines):>6.2f} µs/line")
+
+
+def timed(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Sscan OCR throughput: screenshots and slots read per second by worker count.
+
+Reads every slot of ``inventoryExample.png`` (or ``--image``) through an
+``OcrPool`` of each worker count, ``--images`` times, and reports
+screenshots/s, slots/s and the speedup over the first worker count.
+Every run must read the same text for the same slots as the first.
+
+Needs the tesseract binary (``--tesseract`` if it is not on PATH).
+``--stand-in MS`` replaces Tesseract with about MS milliseconds of
+single-threaded OpenCV work per crop, which releases the GIL just as
+waiting on Tesseract does. Use it to check the pool's own scaling on
+machines without Tesseract.
+
+    python -m benchmarks.bench_ocr --workers 1 2 4 8 --images 5
+    python -m benchmarks.bench_ocr --stand-in 20
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from scripts import ocr_inventory
+from scripts.ocr_inventory import (OCR_SCALE, OcrPool, TesseractNotFoundError,
+                                   extract_items, load_image, read_text)
+
+SAMPLE = Path(__file__).resolve().parent.parent / "inventoryExample.png"
+
+
+class StandIn:
+    """A reader that burns about ``ms`` of single-threaded OpenCV time per crop.
+
+    The cost is the same for every crop, however small: starting a
+    Tesseract process costs about the same whatever it reads.
+    """
+
+    def __init__(self, ms):
+        cv2.setNumThreads(1)
+        self.probe = np.zeros((56 * OCR_SCALE, 56 * OCR_SCALE), np.uint8)
+        rounds, start = 0, time.perf_counter()
+        while time.perf_counter() - start < 0.2:
+            cv2.GaussianBlur(self.probe, (15, 15), 0)
+            rounds += 1
+        self.rounds = max(1, round(rounds * ms / 200))
+
+    def __call__(self, gray):
+        for _ in range(self.rounds):
+            cv2.GaussianBlur(self.probe, (15, 15), 0)
+        return str(int(gray.sum()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", default=str(SAMPLE))
+    parser.add_argument("--images", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--tesseract", help="path to the tesseract binary")
+    parser.add_argument("--stand-in", type=float, metavar="MS",
+                        help="fake each read with MS ms of OpenCV work")
+    args = parser.parse_args()
+
+    ocr_inventory.configure(args.tesseract)
+    read = StandIn(args.stand_in) if args.stand_in else read_text
+    img = load_image(args.image)
+
+    print(f"{os.cpu_count()} CPU(s); reader: "
+          f"{f'stand-in, {args.stand_in:g} ms' if args.stand_in else 'tesseract'}")
+    print(f"{'workers':>7}  {'shots/s':>8}  {'slots/s':>8}  {'speedup':>7}")
+    expected = base = None
+    for workers in args.workers:
+        pool = OcrPool(workers, read)
+        try:
+            extract_items(img, pool)  # warm up
+            start = time.perf_counter()
+            for _ in range(args.images):
+                slots = extract_items(img, pool)
+            elapsed = time.perf_counter() - start
+        except TesseractNotFoundError as e:
+            sys.exit(f"{e}\nPass --tesseract, or --stand-in MS to time the pool alone.")
+        finally:
+            pool.close()
+        if expected is None:
+            expected, base = slots, elapsed
+        assert slots == expected, "results differ from the first run"
+        print(f"{workers:>7}  {args.images / elapsed:>8.2f}"
+              f"  {args.images * len(slots) / elapsed:>8.1f}  {base / elapsed:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Ordered listings: index order versus a sort over every match.
+
+Prints the EXPLAIN QUERY PLAN of each ``ORDER BY rarity_rank, name`` query
+shape the bot runs (VOI list, rarity filter, unfiltered listing, filters
+combined with a term) and times it with the ordering indexes and with them
+dropped. tests/test_order.py checks that the shapes served by an index
+never sort.
+
+    python -m benchmarks.bench_order --rows 100000
+"""
+import argparse
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synth import make_db
+from scripts.init_db import ORDER_INDEXES
+
+SELECT = "SELECT name, category, subcategories, rarity, voi FROM items"
+ORDER = "ORDER BY rarity_rank, name"
+
+# (label, WHERE clause)
+SHAPES = [
+    ("voi list", "WHERE voi = 1"),
+    ("voi:yes", "WHERE voi = 1"),
+    ("rarity:legendary", "WHERE LOWER(rarity) = 'legendary'"),
+    ("rarity + voi", "WHERE LOWER(rarity) = 'relic' AND voi = 1"),
+    ("unfiltered", "WHERE 1=1"),
+    ("short LIKE term", "WHERE (name LIKE '%ab%' OR subcategories LIKE '%ab%' "
+                        "OR category LIKE '%ab%')"),
+    # A full-text match is usually the narrower side; sorting its few
+    # hits beats walking an ordered index
+    ("sword", "WHERE id IN (SELECT rowid FROM items_fts "
+              "WHERE items_fts MATCH '{name subcategories category} : \"sword\"')"),
+    ("sword rarity:legendary",
+     "WHERE id IN (SELECT rowid FROM items_fts WHERE items_fts MATCH "
+     "'{name subcategories} : \"sword\"') AND LOWER(rarity) = 'legendary'"),
+]
+
+
+def statement(where: str, label: str) -> str:
+    limit = "" if label == "voi list" else " LIMIT 30"
+    return f"{SELECT} {where} {ORDER}{limit}"
+
+
+def time_query(conn, sql: str, repeat: int) -> float:
+    conn.execute(sql).fetchall()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(sql).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        indexed = make_db(Path(tmp) / "indexed.db", args.rows)
+        plain = Path(tmp) / "plain.db"
+        shutil.copy(indexed, plain)
+        with_idx = sqlite3.connect(indexed)
+        without = sqlite3.connect(plain)
+        for name, _ in ORDER_INDEXES:
+            without.execute(f"DROP INDEX {name}")
+        without.execute("ANALYZE items")
+
+        print(f"{args.rows} rows")
+        print(f"{'query':<24} {'no index':>10} {'indexed':>10}  plan")
+        for label, where in SHAPES:
+            sql = statement(where, label)
+            plan = [row[3] for row in with_idx.execute(f"EXPLAIN QUERY PLAN {sql}")]
+            before = time_query(without, sql, args.repeat)
+            after = time_query(with_idx, sql, args.repeat)
+            print(f"{label:<24} {before:>7.2f} ms {after:>7.2f} ms  {' | '.join(plan)}")
+
+        with_idx.close()
+        without.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Cost of a deep results page: keyset cursor against OFFSET.
+
+Fetches page N (``--page-size`` rows) of a few listings through
+``search.execute`` with the ``page_cursor`` of the row before it, through
+the same query written with ``LIMIT ? OFFSET ?``, and through the
+in-memory index. A keyset page seeks straight to its cursor, so its cost
+should stay flat as N grows while OFFSET reads and discards every earlier
+row.
+
+    python -m benchmarks.bench_pages --rows 100000 --pages 1 10 100 1000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synth import make_db
+from scripts import db as itemdb
+from scripts import search
+from scripts.item_index import ItemIndex, page_cursor
+from scripts.query import compile_query
+
+QUERIES = ["rarity:legendary", "voi:yes", "sword", "heavy + frost"]
+
+
+def offset_page(compiled, offset, size):
+    plan = compiled.plan
+    with itemdb.connection() as conn:
+        return conn.execute(f"""
+            SELECT name, category, subcategories, rarity, voi
+            FROM items WHERE {plan.where}
+            ORDER BY rarity_rank, name LIMIT ? OFFSET ?
+        """, plan.sql_params(compiled.values) + [size, offset]).fetchall()
+
+
+def per_call_ms(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    size = args.page_size
+
+    with tempfile.TemporaryDirectory() as tmp:
+        itemdb.configure(make_db(Path(tmp) / "items.db", args.rows))
+        index = ItemIndex.load()
+
+        print(f"{'query':<18} {'page':>5}  {'OFFSET':>10} {'keyset':>10} {'index':>10}")
+        for text in QUERIES:
+            compiled = compile_query(text)
+            everything = search.execute(compiled, limit=max(args.pages) * size)
+            for page in args.pages:
+                offset = (page - 1) * size
+                if offset >= len(everything):
+                    break
+                after = page_cursor(everything[offset - 1]) if offset else None
+                expected = everything[offset:offset + size]
+                assert offset_page(compiled, offset, size) == expected
+                assert search.execute(compiled, None, after, size) == expected
+                assert search.execute(compiled, index, after, size) == expected
+
+                timings = [
+                    per_call_ms(lambda: offset_page(compiled, offset, size), args.repeat),
+                    per_call_ms(lambda: search.execute(compiled, None, after, size),
+                                args.repeat),
+                    per_call_ms(lambda: search.execute(compiled, index, after, size),
+                                args.repeat),
+                ]
+                print(f"{text:<18} {page:>5}" + "".join(f"  {ms:>7.3f} ms" for ms in timings))
+
+
+if __name__ == "__main__":
+    main()
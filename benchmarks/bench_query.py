@@ -0,0 +1,72 @@
+"""Query compiler overhead, per query.
+
+Times each stage of ``compile_query`` over the synthetic query mix plus
+variants of it with new literals: tokenize and parse alone, a cold
+compile (empty caches, so every plan is built), a compile whose shape is
+already planned (only parse and bind run) and a repeat of the exact text.
+Needs no database.
+
+    python -m benchmarks.bench_query --repeat 2000
+"""
+import argparse
+import time
+
+from benchmarks.synth import QUERY_MIX
+from scripts import query
+
+# Same shapes as QUERY_MIX with different literals: hit the plan cache
+# but not the text cache
+VARIANTS = [
+    "spear", "bow", "frost", "heavy spear", "dagger + light",
+    "bow,rifle", "club/hammer", "rarity:relic", "voi:no",
+    "axe rarity:named", "sub:shadow", "type:weapon voi:yes",
+    "medium + blood", "knell", "flame/frost", "requiem",
+]
+
+
+def per_query_us(fn, queries, repeat, setup=None):
+    total = 0.0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for text in queries:
+            fn(text)
+        total += time.perf_counter() - start
+    return total / (repeat * len(queries)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    def parse_and_lower(text):
+        query.lower(query.parse(text).tree)
+
+    def warm_shapes():
+        query.clear_caches()
+        for text in QUERY_MIX:
+            query.compile_query(text)
+
+    timings = [
+        ("tokenize", query.tokenize, None),
+        ("parse + lower", parse_and_lower, None),
+        ("compile, cold", query.compile_query, query.clear_caches),
+    ]
+    for label, fn, setup in timings:
+        print(f"{label:<22} {per_query_us(fn, QUERY_MIX, args.repeat, setup):>8.2f} us")
+
+    us = per_query_us(query.compile_query, VARIANTS, args.repeat, warm_shapes)
+    print(f"{'compile, plan cached':<22} {us:>8.2f} us")
+
+    warm_shapes()
+    us = per_query_us(query.compile_query, QUERY_MIX, args.repeat)
+    print(f"{'compile, text cached':<22} {us:>8.2f} us")
+
+    shapes = {query.compile_query(text).plan for text in QUERY_MIX + VARIANTS}
+    print(f"{len(QUERY_MIX + VARIANTS)} queries, {len(shapes)} plans")
+
+
+if __name__ == "__main__":
+    main()
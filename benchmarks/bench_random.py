@@ -0,0 +1,91 @@
+"""Srandom cost as the catalog grows, plus a uniformity check.
+
+Times ``ORDER BY RANDOM() LIMIT 1`` (the old query) against
+``search.random_item`` through SQL (rowid probing) and through the
+in-memory index, unfiltered and with ``rarity:legendary``. Then deletes a
+third of a small catalog, to leave rowid gaps, and draws from it many times.
+Every row should come up about equally often, and the chi-square statistic
+should sit near its degrees of freedom.
+
+    python -m benchmarks.bench_random --rows 10000 100000 1000000
+"""
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from benchmarks.synth import make_db
+from scripts import db as itemdb
+from scripts import search
+from scripts.item_index import ItemIndex
+from scripts.query import compile_query
+
+LEGENDARY = compile_query("rarity:legendary")
+
+
+def order_by_random(where: str = "1=1", params=()):
+    with itemdb.connection() as conn:
+        return conn.execute(f"""
+            SELECT name, category, subcategories, rarity, voi FROM items
+            WHERE {where} ORDER BY RANDOM() LIMIT 1
+        """, params).fetchone()
+
+
+def per_call(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def uniformity(tmp: Path, rows: int, draws: int):
+    path = make_db(tmp / "uniform.db", rows)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DELETE FROM items WHERE id % 3 = 0")
+    conn.close()
+    itemdb.configure(path)
+    index = ItemIndex.load()
+    rng = random.Random(7)
+
+    for label, pick in (("sql", lambda: search.random_item(rng=rng)),
+                        ("index", lambda: search.random_item(index=index, rng=rng))):
+        counts = Counter(pick()[0] for _ in range(draws))
+        expected = draws / len(index)
+        chi2 = sum((counts.get(row[0], 0) - expected) ** 2 / expected
+                   for row in index.rows)
+        print(f"uniformity {label:<5} {len(index)} rows, {draws} draws: "
+              f"chi2 {chi2:.0f} (df {len(index) - 1}), "
+              f"min/max hits {min(counts.values())}/{max(counts.values())}, "
+              f"rows never drawn {len(index) - len(counts)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--draws", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'':<16} {'ORDER BY RANDOM':>16} {'sql':>10} {'index':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            itemdb.configure(make_db(Path(tmp) / f"items_{rows}.db", rows))
+            index = ItemIndex.load()
+            for label, compiled, where, params in (
+                ("unfiltered", None, "1=1", ()),
+                ("rarity:legendary", LEGENDARY, "LOWER(rarity) = ?", ("legendary",)),
+            ):
+                old = per_call(lambda: order_by_random(where, params), args.repeat)
+                sql = per_call(lambda: search.random_item(compiled), args.repeat)
+                mem = per_call(lambda: search.random_item(compiled, index), args.repeat)
+                print(f"{rows:>9}  {label:<16} {old:>13.2f} ms {sql:>7.3f} ms {mem:>7.3f} ms")
+
+        uniformity(Path(tmp), 3000, args.draws)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Embed construction cost for a result page.
+
+Builds the Sitem embed for 30- and 500-row result sets three ways: the
+old per-row loop (rarity table rebuilt, strings formatted and names
+lower-cased on every row), ``scripts.render`` with an empty field cache,
+and ``scripts.render`` with the rows already cached. Discord caps an
+embed at 25 fields, so the 500-row case only measures per-row cost.
+
+    python -m benchmarks.bench_render --repeat 2000
+"""
+import argparse
+import random
+import time
+
+import discord
+
+from benchmarks.synth import make_row
+from scripts import render
+
+TAGS = ["sword", "flame"]
+
+
+def old_embed(rows, tags):
+    embed = discord.Embed(title="Items", description=f"Found {len(rows)} item(s)",
+                          color=discord.Color.blue())
+    for name, cat, sub, rarity, voi in rows:
+        voi_tag = " <:VOI:1470243357065220187>" if voi else ""
+        rarity_colors = {
+            'relic': '🟣',
+            'legendary': '🟡',
+            'named': '🔵',
+            'hallowtide': '🟠',
+            'normal': '⚪'
+        }
+        rarity_emoji = rarity_colors.get(rarity.lower(), '⚪')
+        display_name = name
+        for tag in tags:
+            if tag.lower() in name.lower():
+                display_name = f"**{name}**"
+                break
+        embed.add_field(
+            name=f"{rarity_emoji} {display_name}",
+            value=f"**Type:** {cat}\n**Subcategories:** {sub}\n**Rarity:** {rarity}{voi_tag}",
+            inline=True
+        )
+    return embed
+
+
+def new_embed(rows, tags):
+    return discord.Embed.from_dict({
+        "type": "rich",
+        "title": "Items",
+        "description": f"Found {len(rows)} item(s)",
+        "color": discord.Color.blue().value,
+        "fields": render.search_fields(rows, tags),
+    })
+
+
+def per_call_us(fn, repeat, setup=None):
+    total = 0.0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        total += time.perf_counter() - start
+    return total / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[30, 500])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print(f"{'rows':>5}  {'old loop':>10}  {'cold cache':>10}  {'warm cache':>10}")
+    for size in args.sizes:
+        rows = [make_row(rng, i)[:5] for i in range(size)]
+        assert new_embed(rows, TAGS).to_dict() == old_embed(rows, TAGS).to_dict()
+
+        timings = [
+            per_call_us(lambda: old_embed(rows, TAGS), args.repeat),
+            per_call_us(lambda: new_embed(rows, TAGS), args.repeat, render.clear_cache),
+            per_call_us(lambda: new_embed(rows, TAGS), args.repeat),
+        ]
+        print(f"{size:>5}" + "".join(f"  {us:>7.1f} us" for us in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Search latency as the catalog grows.
+
+Times the ``Sitem`` query mix through ``run_search`` (trigram FTS index)
+against the same predicates written as ``LIKE '%term%'`` scans.
+
+    python -m benchmarks.bench_search --rows 500 10000 100000 300000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synth import QUERY_MIX, make_db
+from scripts import db as itemdb
+from scripts import search
+
+# Plain term queries only: filters compile to the same plan either way
+TERM_QUERIES = [q for q in QUERY_MIX if ":" not in q]
+
+
+def like_scan(query):
+    """The pre-FTS predicate: one leading-wildcard LIKE per term and column."""
+    tags = [t.strip() for t in query.replace("/", ",").replace("+", ",").split(",")]
+    joiner = " AND " if "+" in query else " OR "
+    if len(tags) == 1:
+        tags = query.split()
+    where = joiner.join("(name LIKE ? OR subcategories LIKE ? OR category LIKE ?)"
+                        for _ in tags)
+    params = [f"%{t}%" for t in tags for _ in range(3)]
+    with itemdb.connection() as conn:
+        return conn.execute(f"""
+            SELECT name, category, subcategories, rarity, voi
+            FROM items WHERE {where}
+            ORDER BY CASE rarity WHEN 'relic' THEN 1 WHEN 'legendary' THEN 2
+                     WHEN 'named' THEN 3 WHEN 'hallowtide' THEN 4
+                     WHEN 'normal' THEN 5 ELSE 6 END, name
+            LIMIT 30
+        """, params).fetchall()
+
+
+def time_queries(fn, queries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            fn(query)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+",
+                        default=[500, 10_000, 100_000, 300_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'LIKE scan':>12}  {'FTS':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            itemdb.configure(make_db(Path(tmp) / f"items_{rows}.db", rows))
+            scan = time_queries(like_scan, TERM_QUERIES, args.repeat)
+            fts = time_queries(lambda q: search.run_search(q), TERM_QUERIES,
+                               args.repeat)
+            print(f"{rows:>9}  {scan:>9.2f} ms  {fts:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
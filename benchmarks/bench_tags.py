@@ -0,0 +1,95 @@
+"""Multi-tag ``sub:`` searches: tag table joins against substring matching.
+
+Builds a synthetic catalog per ``--rows`` and runs each tag combination
+four ways:
+
+- ``like``: every tag as ``LOWER(subcategories) LIKE '%tag%'``, ANDed (the
+  old ``search_items_multi``);
+- ``trigram``: every tag as a phrase in one ``items_fts`` match on the
+  subcategories column (how ``sub:`` used to run);
+- ``tags``: the compiled ``sub:a/b/c`` query on SQLite, which starts from
+  the rarest tag's rows in ``item_tags`` and probes the others;
+- ``index``: the same query on the in-memory ``ItemIndex``.
+
+Reports the first page (30 rows) and all matches for each, plus the match
+count: the substring methods also count partial words ("sword" inside
+"greatsword").
+
+    python -m benchmarks.bench_tags --rows 20000 200000 --repeat 5
+"""
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synth import make_db
+from scripts import db as itemdb
+from scripts import search
+from scripts.item_index import ItemIndex
+from scripts.query import compile_query
+
+TAG_SETS = [
+    ("heavy", "sword"),
+    ("light", "dagger", "elemental"),
+    ("heavy", "sword", "elemental", "flame"),
+    ("medium", "bow", "elemental", "gale", "hybrid"),
+]
+
+ORDER = "ORDER BY rarity_rank, name LIMIT ?"
+
+
+def substring_query(method, tags):
+    """(SQL, params) matching every tag as a substring."""
+    if method == "like":
+        where = " AND ".join(["LOWER(subcategories) LIKE ?"] * len(tags))
+        return f"SELECT name FROM items WHERE {where} {ORDER}", [f"%{tag}%" for tag in tags]
+    match = " AND ".join(f'{{subcategories}} : "{tag}"' for tag in tags)
+    return (f"SELECT name FROM items WHERE id IN "
+            f"(SELECT rowid FROM items_fts WHERE items_fts MATCH ?) {ORDER}", [match])
+
+
+def timed(fn, repeat):
+    """(result of the last call, mean milliseconds per call)."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[20_000, 200_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>7}  {'tags':<32} {'method':<8} {'matches':>8} "
+          f"{'page':>10} {'all':>10}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = make_db(Path(tmp) / "items.db", rows)
+            itemdb.configure(path)
+            index = ItemIndex.load()
+            conn = sqlite3.connect(path)
+            for tags in TAG_SETS:
+                compiled = compile_query("sub:" + "/".join(tags))
+                runs = {}
+                for method in ("like", "trigram"):
+                    sql, params = substring_query(method, tags)
+                    runs[method] = lambda limit, sql=sql, params=params: conn.execute(
+                        sql, params + [limit]).fetchall()
+                runs["tags"] = lambda limit: search.execute(compiled, limit=limit)
+                runs["index"] = lambda limit: search.execute(compiled, index, limit=limit)
+
+                for i, (method, run) in enumerate(runs.items()):
+                    _, page = timed(lambda: run(search.RESULT_LIMIT), args.repeat)
+                    found, everything = timed(lambda: run(rows), args.repeat)
+                    lead = f"{rows:>7}  {'/'.join(tags):<32}" if i == 0 else " " * 41
+                    print(f"{lead} {method:<8} {len(found):>8} "
+                          f"{page:>7.2f} ms {everything:>7.2f} ms")
+            conn.close()
+            itemdb.get_pool().close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Synthetic item databases for benchmarks.
+
+Rows follow the shape of the real catalog (weight/type/element
+subcategory paths, a long tail of normal items, a few VOI), so query
+plans and match rates look like production at any size.
+"""
+import random
+import sqlite3
+from pathlib import Path
+
+from scripts.init_db import analyze, init_db
+
+WEIGHTS = ["light", "medium", "heavy"]
+TYPES = ["dagger", "fist", "rapier", "pistol", "sword", "club", "spear",
+         "rifle", "twinblade", "bow", "greataxe", "greatsword", "hammer"]
+ELEMENTS = ["flame", "frost", "thunder", "gale", "shadow", "blood", "iron"]
+EXTRAS = ["hybrid", "alloyed", "hallowtide"]
+RARITIES = (["normal"] * 75 + ["legendary"] * 17 + ["named"] * 2
+            + ["hallowtide"] * 3 + ["relic"] * 3)
+WORDS = ["blade", "shard", "fang", "knife", "edge", "song", "thorn", "requiem",
+         "grasp", "toll", "claw", "echo", "knell", "splinter", "crusher",
+         "reaver", "spire", "wrath", "ember", "veil", "howl", "mark", "brand"]
+PREFIXES = ["dark", "deep", "soul", "iron", "wraith", "umbr", "flare", "void",
+            "hollow", "storm", "blood", "gild", "grim", "ash", "frost", "sun"]
+
+
+def make_row(rng: random.Random, i: int):
+    name = (f"{rng.choice(PREFIXES).title()}{rng.choice(WORDS)} "
+            f"{rng.choice(WORDS).title()} {i}")
+    path = [rng.choice(WEIGHTS), rng.choice(TYPES)]
+    if rng.random() < 0.3:
+        path += ["elemental", rng.choice(ELEMENTS)]
+    if rng.random() < 0.1:
+        path.append(rng.choice(EXTRAS))
+    return (name, "nan", "/".join(path), rng.choice(RARITIES),
+            1 if rng.random() < 0.05 else 0, "")
+
+
+def make_db(path: Path, rows: int, seed: int = 1) -> Path:
+    """Create (or replace) an items DB at ``path`` with ``rows`` synthetic items."""
+    path = Path(path)
+    if path.exists():
+        path.unlink()
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    init_db(conn)
+    conn.executemany("""
+        INSERT INTO items (name, category, subcategories, rarity, voi, notes)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (make_row(rng, i) for i in range(rows)))
+    conn.commit()
+    analyze(conn)
+    conn.close()
+    return path
+
+
+# Query mix seen on the bot: single terms, AND/OR tag lists and filters
+QUERY_MIX = [
+    "sword", "dagger", "flame", "light dagger", "sword + flame",
+    "sword,spear", "bow/rifle", "rarity:legendary", "voi:yes",
+    "sword rarity:legendary", "sub:elemental", "type:nan voi:yes",
+    "heavy + frost", "deep", "shadow/blood", "greataxe",
+]
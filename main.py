@@ -1,12 +1,28 @@
 # discord_bot.py
+import asyncio
 import discord
-from discord.ext import commands
-import sqlite3
+from discord import app_commands
+from discord.ext import commands, tasks
 from pathlib import Path
+import logging
+import math
 import os
 from dotenv import load_dotenv
 import sys
-from typing import List, Tuple
+import time
+
+from scripts import batch
+from scripts import db as itemdb
+from scripts import metrics
+from scripts import ocr_inventory
+from scripts import profiler
+from scripts import render
+from scripts import search
+from scripts.cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL, ResultCache
+from scripts.complete import Completer
+from scripts.gateway import CommandGateway
+from scripts.item_index import ItemIndex, page_cursor
+from scripts.query import cache_stats as query_cache_stats, compile_query
 
 load_dotenv()
 
@@ -16,306 +32,234 @@ token = os.getenv('DISCORD_TOKEN')
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = BASE_DIR / "data" / "items.db"
 
+# Worker threads for SQLite queries and how many queries may be in flight
+DB_WORKERS = int(os.getenv('DB_WORKERS', itemdb.DEFAULT_WORKERS))
+DB_MAX_PENDING = int(os.getenv('DB_MAX_PENDING', itemdb.DEFAULT_MAX_PENDING))
+
+itemdb.configure(DB_PATH, max_connections=DB_WORKERS)
+db = itemdb.QueryRunner(max_workers=DB_WORKERS, max_pending=DB_MAX_PENDING)
+
+# Search result cache and how often to check the DB for a new import
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', DEFAULT_MAX_ENTRIES))
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', DEFAULT_TTL))
+DATA_VERSION_POLL = float(os.getenv('DATA_VERSION_POLL', 5))
+
+# Sitem results per page, and how long the page buttons keep working
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 10))
+SEARCH_PAGE_TIMEOUT = float(os.getenv('SEARCH_PAGE_TIMEOUT', 300))
+
+# Sbatch limits: names per request, attachment size and summary lines per page
+BATCH_MAX_NAMES = int(os.getenv('BATCH_MAX_NAMES', 500))
+BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_BYTES', 64 * 1024))
+BATCH_PAGE_LINES = int(os.getenv('BATCH_PAGE_LINES', 20))
+
+# Close names offered when Sitem finds nothing
+DID_YOU_MEAN = int(os.getenv('DID_YOU_MEAN', 3))
+
+# Register the /item slash command with Discord on startup (turn off once
+# it is registered to skip the API call)
+SYNC_APP_COMMANDS = os.getenv('SYNC_APP_COMMANDS', '1') not in ('0', 'false', 'no')
+
+# Sscan: Tesseract binary (default: `tesseract` on PATH), screenshot size
+# limit, and how many slots are OCR'd at once across all scans
+TESSERACT_CMD = os.getenv('TESSERACT_CMD')
+SCAN_MAX_BYTES = int(os.getenv('SCAN_MAX_BYTES', 8 * 1024 * 1024))
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', ocr_inventory.DEFAULT_OCR_WORKERS))
+
+# Sscan debug crops: off unless OCR_DEBUG_DIR is set; then every Nth
+# screenshot is saved, at most OCR_DEBUG_PER_MINUTE a minute
+OCR_DEBUG_DIR = os.getenv('OCR_DEBUG_DIR')
+OCR_DEBUG_EVERY = int(os.getenv('OCR_DEBUG_EVERY', 10))
+OCR_DEBUG_PER_MINUTE = int(os.getenv('OCR_DEBUG_PER_MINUTE', 2))
+
+ocr_inventory.configure(TESSERACT_CMD)
+ocr_pool = ocr_inventory.OcrPool(OCR_WORKERS)
+ocr_dumps = (ocr_inventory.DebugDumps(OCR_DEBUG_DIR, OCR_DEBUG_EVERY, OCR_DEBUG_PER_MINUTE)
+             if OCR_DEBUG_DIR else None)
+
+# Rate limits on the commands that query the DB: each user and each guild
+# may run this many a minute, with bursts of up to *_BURST (0: no limit)
+USER_COMMANDS_PER_MINUTE = float(os.getenv('USER_COMMANDS_PER_MINUTE', 20))
+USER_COMMAND_BURST = int(os.getenv('USER_COMMAND_BURST', 5))
+GUILD_COMMANDS_PER_MINUTE = float(os.getenv('GUILD_COMMANDS_PER_MINUTE', 300))
+GUILD_COMMAND_BURST = int(os.getenv('GUILD_COMMAND_BURST', 50))
+
+# Metrics: Prometheus text at http://METRICS_HOST:METRICS_PORT/metrics,
+# off unless METRICS_PORT is set
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+# Stack profiles of commands slower than PROFILE_SLOW_MS, written under
+# PROFILE_DIR; off unless PROFILE_SLOW_MS is set
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', 0))
+PROFILE_DIR = os.getenv('PROFILE_DIR', str(BASE_DIR / "profiles"))
+
+result_cache = ResultCache(max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+
+# Rate limits, and identical searches in flight sharing one query
+gateway = CommandGateway(USER_COMMANDS_PER_MINUTE / 60, USER_COMMAND_BURST,
+                         GUILD_COMMANDS_PER_MINUTE / 60, GUILD_COMMAND_BURST)
+
+metrics.registry.add_stats("cache", result_cache.stats, cache="results")
+metrics.registry.add_stats("cache", lambda: query_cache_stats()["plans"], cache="plans")
+metrics.registry.add_stats("cache", lambda: query_cache_stats()["queries"], cache="queries")
+metrics.registry.add_stats("cache", render.cache_stats, cache="fields")
+metrics.registry.add_stats("db_pool", itemdb.pool_stats)
+metrics.registry.add_stats("gateway", gateway.stats)
+
+slow_commands = (profiler.SlowCommands(PROFILE_SLOW_MS / 1000, PROFILE_DIR)
+                 if PROFILE_SLOW_MS > 0 else None)
+
 
 intents = discord.Intents.default()
 intents.message_content = True
 bot = commands.Bot(command_prefix='S', intents=intents)
 
-def search_items_single(query: str) -> List[Tuple]:
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT name, category, subcategories, rarity, voi
-        FROM items
-        WHERE name LIKE ? 
-           OR subcategories LIKE ? 
-           OR category LIKE ?
-        ORDER BY 
-            CASE rarity 
-                WHEN 'relic' THEN 1
-                WHEN 'legendary' THEN 2
-                WHEN 'named' THEN 3
-                WHEN 'hallowtide' THEN 4
-                WHEN 'normal' THEN 5
-                ELSE 6
-            END,
-            name
-        LIMIT 30
-    """, (f"%{query}%", f"%{query}%", f"%{query}%"))
-    
-    results = cur.fetchall()
-    conn.close()
-    return results
-
-def search_items_multi(tags: List[str]) -> List[Tuple]:
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    conditions = []
-    params = []
-    
-    for tag in tags:
-        conditions.append("""
-            (name LIKE ? OR subcategories LIKE ? OR category LIKE ?)
-        """)
-        params.extend([f"%{tag}%", f"%{tag}%", f"%{tag}%"])
-    
-    where_clause = " AND ".join(conditions)
-    
-    query = f"""
-        SELECT name, category, subcategories, rarity, voi
-        FROM items
-        WHERE {where_clause}
-        ORDER BY 
-            CASE rarity 
-                WHEN 'relic' THEN 1
-                WHEN 'legendary' THEN 2
-                WHEN 'named' THEN 3
-                WHEN 'hallowtide' THEN 4
-                WHEN 'normal' THEN 5
-                ELSE 6
-            END,
-            name
-        LIMIT 30
-    """
-    
-    cur.execute(query, params)
-    results = cur.fetchall()
-    conn.close()
-    return results
-
-def search_items_any(tags: List[str]) -> List[Tuple]:
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    conditions = []
-    params = []
-    
-    for tag in tags:
-        conditions.append("""
-            (name LIKE ? OR subcategories LIKE ? OR category LIKE ?)
-        """)
-        params.extend([f"%{tag}%", f"%{tag}%", f"%{tag}%"])
-    
-    where_clause = " OR ".join(conditions)
-    
-    query = f"""
-        SELECT name, category, subcategories, rarity, voi
-        FROM items
-        WHERE {where_clause}
-        ORDER BY 
-            CASE rarity 
-                WHEN 'relic' THEN 1
-                WHEN 'legendary' THEN 2
-                WHEN 'named' THEN 3
-                WHEN 'hallowtide' THEN 4
-                WHEN 'normal' THEN 5
-                ELSE 6
-            END,
-            name
-        LIMIT 30
-    """
-    
-    cur.execute(query, params)
-    results = cur.fetchall()
-    conn.close()
-    return results
-
-def smart_search(query: str) -> List[Tuple]:
-    """Smart search with filters like rarity:legendary, voi:yes, etc."""
-    # Parse advanced filters
-    filters = {
-        'name_terms': [],
-        'rarity': None,
-        'category': None,
-        'voi': None,
-        'subcategory': None,
-        'exact_phrases': []
-    }
-    
-    # Split query into parts
-    parts = []
-    current_part = []
-    in_quotes = False
-    
-    # Parse quoted phrases
-    for char in query:
-        if char == '"':
-            in_quotes = not in_quotes
-        elif char == ' ' and not in_quotes:
-            if current_part:
-                parts.append(''.join(current_part))
-                current_part = []
+# In-memory copy of the catalog, built in setup_hook before the bot connects
+item_index = None
+
+# Normalized names for Sbatch and Sitem suggestions, built from item_index
+# on first use after each data version change
+name_resolver = None
+name_resolver_lock = asyncio.Lock()
+
+# Prefix lookups for /item autocomplete, rebuilt with item_index so a
+# keystroke never waits on a build
+completer = None
+
+# Started in setup_hook; kept here so they are not garbage collected
+loop_lag_task = None
+metrics_server = None
+
+async def build_completer(index, version):
+    global completer
+    completer = await db.run(lambda: Completer(index.live_rows(), version))
+
+async def load_item_index():
+    global item_index
+    # Read the version first: an import landing mid-load shows up as a
+    # newer version on the next poll and triggers another reload
+    version = await db.run(itemdb.data_version)
+    item_index = await db.run(ItemIndex.load)
+    await build_completer(item_index, version)
+    # Rows are loaded in result order, so these top most listings
+    render.prerender(item_index.rows[:render.FIELD_CACHE_SIZE])
+    result_cache.set_data_version(version)
+    print(f"Loaded {len(item_index)} items into the search index (data version {version})")
+
+async def patch_item_index(version):
+    """Apply just the rows an import changed, falling back to a full reload"""
+    global item_index
+    names = await db.run(itemdb.changed_names, result_cache.data_version)
+    if names is None:
+        await load_item_index()
+        return
+    patched = await db.run(item_index.reload_rows, names)
+    if patched.stale:
+        await load_item_index()
+        return
+    item_index = patched
+    await build_completer(patched, version)
+    result_cache.set_data_version(version)
+    print(f"Patched {len(names)} items in the search index (data version {version})")
+
+@tasks.loop(seconds=DATA_VERSION_POLL)
+async def watch_data_version():
+    """Update the index and drop cached results after an import"""
+    version = await db.run(itemdb.data_version)
+    if version != result_cache.data_version:
+        await patch_item_index(version)
+
+async def start_metrics():
+    global loop_lag_task, metrics_server
+    loop_lag_task = asyncio.create_task(metrics.watch_loop_lag())
+    if METRICS_PORT:
+        try:
+            metrics_server = await metrics.serve(METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            print(f"Metrics endpoint not started: {e}")
         else:
-            current_part.append(char)
-    
-    if current_part:
-        parts.append(''.join(current_part))
-    
-    # Process each part
-    for part in parts:
-        part_lower = part.lower()
-        
-        if ':' in part:
-            # It's a filter
-            key, value = part.split(':', 1)
-            key = key.strip().lower()
-            value = value.strip().lower()
-            
-            if key == 'rarity':
-                filters['rarity'] = value
-            elif key in ['type', 'category']:
-                filters['category'] = value
-            elif key == 'voi':
-                filters['voi'] = 1 if value in ['yes', 'true', '1'] else 0
-            elif key in ['sub', 'subcategory']:
-                filters['subcategory'] = value
-        elif part.startswith('"') and part.endswith('"'):
-            # Exact phrase
-            filters['exact_phrases'].append(part[1:-1])
+            print(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    if slow_commands is not None:
+        slow_commands.start()
+
+async def setup_hook():
+    await start_metrics()
+    await load_item_index()
+    watch_data_version.start()
+    if SYNC_APP_COMMANDS:
+        try:
+            synced = await bot.tree.sync()
+        except discord.HTTPException as e:
+            print(f"Couldn't register slash commands: {e}")
         else:
-            # Regular search term
-            filters['name_terms'].append(part)
-    
-    # Build SQL query based on filters
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    conditions = []
-    params = []
-    
-    # Handle name terms (OR between them)
-    if filters['name_terms']:
-        term_conditions = []
-        for term in filters['name_terms']:
-            term_conditions.append("(name LIKE ? OR subcategories LIKE ?)")
-            params.extend([f"%{term}%", f"%{term}%"])
-        conditions.append(f"({' OR '.join(term_conditions)})")
-    
-    # Handle exact phrases
-    if filters['exact_phrases']:
-        phrase_conditions = []
-        for phrase in filters['exact_phrases']:
-            phrase_conditions.append("(name LIKE ? OR subcategories LIKE ?)")
-            params.extend([f"%{phrase}%", f"%{phrase}%"])
-        if phrase_conditions:
-            if conditions:
-                conditions.append("AND")
-            conditions.append(f"({' OR '.join(phrase_conditions)})")
-    
-    # Handle filters
-    if filters['rarity']:
-        conditions.append("LOWER(rarity) = ?")
-        params.append(filters['rarity'])
-    
-    if filters['category']:
-        conditions.append("LOWER(category) LIKE ?")
-        params.append(f"%{filters['category']}%")
-    
-    if filters['voi'] is not None:
-        conditions.append("voi = ?")
-        params.append(filters['voi'])
-    
-    if filters['subcategory']:
-        conditions.append("LOWER(subcategories) LIKE ?")
-        params.append(f"%{filters['subcategory']}%")
-    
-    # Build final query
-    where_clause = " AND ".join(conditions) if conditions else "1=1"
-    
-    query_sql = f"""
-        SELECT name, category, subcategories, rarity, voi
-        FROM items
-        WHERE {where_clause}
-        ORDER BY 
-            CASE rarity 
-                WHEN 'relic' THEN 1
-                WHEN 'legendary' THEN 2
-                WHEN 'named' THEN 3
-                WHEN 'hallowtide' THEN 4
-                WHEN 'normal' THEN 5
-                ELSE 6
-            END,
-            name
-        LIMIT 30
-    """
-    
-    cur.execute(query_sql, params)
-    results = cur.fetchall()
-    conn.close()
-    return results, filters
+            print(f"Registered {len(synced)} slash command(s)")
+
+bot.setup_hook = setup_hook
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started = time.perf_counter()
+
+@bot.after_invoke
+async def record_command_time(ctx):
+    """Record how long the command took, and profile it if it was slow"""
+    end = time.perf_counter()
+    name = ctx.command.qualified_name
+    elapsed = end - ctx.started
+    metrics.registry.observe("bot_command_seconds", elapsed, command=name,
+                             status="error" if ctx.command_failed else "ok")
+    if slow_commands is not None and elapsed >= slow_commands.threshold:
+        path = await asyncio.to_thread(slow_commands.finished, name, ctx.started, end)
+        if path is not None:
+            print(f"S{name} took {elapsed * 1000:.0f} ms; stack samples in {path}")
+
+class Throttled(commands.CheckFailure):
+    def __init__(self, throttle):
+        super().__init__(f"{throttle.scope} rate limit")
+        self.throttle = throttle
+
+async def check_rate_limit(ctx):
+    """Take a token from the user's and the guild's bucket before any DB work"""
+    throttle = gateway.admit(ctx.author.id, ctx.guild.id if ctx.guild else None)
+    if throttle is not None:
+        raise Throttled(throttle)
+    return True
+
+rate_limited = commands.check(check_rate_limit)
+
+@bot.event
+async def on_command_error(ctx, error):
+    if isinstance(error, Throttled):
+        where = "in this server" if error.throttle.scope == "guild" else "for you"
+        notice = (f"⏳ Too many commands {where} right now; try again in "
+                  f"{math.ceil(error.throttle.retry_after)}s.")
+        if ctx.interaction is not None:
+            # A slash command must be answered or Discord shows it as failed;
+            # ephemeral, so only the caller sees it however often it repeats
+            await ctx.send(notice, ephemeral=True)
+        elif not error.throttle.repeated:
+            # Say so once per bucket running dry, not on every rejected command
+            await ctx.send(notice, delete_after=10)
+        return
+    if isinstance(error, commands.NotOwner):
+        return
+    # What discord.py logs when no handler is set
+    logging.getLogger("discord.ext.commands.bot").error(
+        "Ignoring exception in command %s", ctx.command, exc_info=error)
 
 @bot.event
 async def on_ready():
     print(f'{bot.user} is called by the deep!')
     await bot.change_presence(activity=discord.Game(name="Shelp for commands"))
 
-@bot.command(name='item', help='Search for items with advanced filters')
-async def item_search(ctx, *, query):
-    """
-    Search for items with multiple tags and filters:
-    
-    BASIC SEARCH:
-    Sitem sword              - Single term search
-    Sitem sword + flame      - Items with BOTH sword AND flame (AND search)
-    Sitem sword,flame        - Items with EITHER sword OR flame (OR search)
-    Sitem sword/flame        - Same as comma (OR search)
-    Sitem light dagger       - Space separated (OR search)
-    
-    ADVANCED FILTERS:
-    Sitem rarity:legendary           - Filter by rarity
-    Sitem type:weapon                - Filter by category
-    Sitem voi:yes                    - Only VOI items
-    Sitem sub:elemental              - Filter by subcategory
-    Sitem "light dagger"             - Exact phrase search
-    
-    COMBINED SEARCH:
-    Sitem sword rarity:legendary type:weapon  - Multiple filters
-    Sitem "hero's blade" rarity:legendary     - Phrase with filter
-    Sitem sword + flame voi:yes               - AND search with filter
-    """
-    if not query or len(query.strip()) < 2:
-        await ctx.send("Please provide at least 2 characters to search for.")
-        return
-    
-    query = query.strip()
-    
-    # Check if query contains advanced filters (has colon or quotes)
-    has_filters = any(':' in part or (part.startswith('"') and part.endswith('"')) 
-                     for part in query.split())
-    
-    if has_filters:
-        # Use smart search with filters
-        results, filters = smart_search(query)
-        search_type = "SMART"
-        tags = []
-    elif '+' in query:
-        # AND search
-        tags = [tag.strip() for tag in query.split('+') if tag.strip()]
-        search_type = "AND"
-        results = search_items_multi(tags)
-    elif ',' in query or '/' in query:
-        # OR search
-        tags = [tag.strip() for tag in query.replace('/', ',').split(',') if tag.strip()]
-        search_type = "OR"
-        results = search_items_any(tags)
-    elif ' ' in query:
-        # Space-separated OR search
-        tags = [tag.strip() for tag in query.split() if tag.strip()]
-        search_type = "OR"
-        results = search_items_any(tags)
-    else:
-        # Single term search
-        tags = [query]
-        search_type = "SINGLE"
-        results = search_items_single(query)
-    
-    if not results:
+def build_search_page(query, search_type, tags, results, filters, page=1, more=False):
+    """Render one page of search results as a ``(content, embed)`` message"""
+    if not results and page == 1:
         if search_type == "AND":
-            await ctx.send(f"No items found matching ALL tags: `{'`, `'.join(tags)}`")
+            return f"No items found matching ALL tags: `{'`, `'.join(tags)}`", None
         elif search_type == "OR":
-            await ctx.send(f"No items found matching ANY tag: `{'`, `'.join(tags)}`")
+            return f"No items found matching ANY tag: `{'`, `'.join(tags)}`", None
         elif search_type == "SMART":
             # Build descriptive message
             filter_msgs = []
@@ -332,10 +276,9 @@ async def item_search(ctx, *, query):
             if filters['subcategory']:
                 filter_msgs.append(f"subcategory: `{filters['subcategory']}`")
             
-            await ctx.send(f"No items found with filters: {', '.join(filter_msgs)}")
+            return f"No items found with filters: {', '.join(filter_msgs)}", None
         else:
-            await ctx.send(f"No items found for: `{query}`")
-        return
+            return f"No items found for: `{query}`", None
     
     # Create embed title and description
     if search_type == "SMART":
@@ -365,11 +308,17 @@ async def item_search(ctx, *, query):
         }
         title = title_map.get(search_type, f"Search: `{query}`")
     
-    embed = discord.Embed(
-        title=title[:256],  # Discord title limit
-        description=f"Found {len(results)} item(s)",
-        color=discord.Color.blue()
-    )
+    # The total is never counted: pages are fetched one at a time
+    first = (page - 1) * SEARCH_PAGE_SIZE
+    if page == 1 and not more:
+        description = f"Found {len(results)} item(s)"
+    elif len(results) == 1:
+        description = f"Item {first + 1}"
+    elif results:
+        description = f"Items {first + 1}-{first + len(results)}"
+    else:
+        description = "No more items"
+    fields = []
     
     # Add filter info for smart search
     if search_type == "SMART" and (filters['rarity'] or filters['category'] or filters['voi'] is not None or filters['subcategory']):
@@ -384,75 +333,227 @@ async def item_search(ctx, *, query):
             filter_info.append(f"**Subcategory:** `{filters['subcategory']}`")
         
         if filter_info:
-            embed.add_field(name="Active Filters", value="\n".join(filter_info), inline=False)
-    
-    # Add results to embed
-    for name, cat, sub, rarity, voi in results:
-        voi_tag = " <:VOI:1470243357065220187>" if voi else ""
-        rarity_colors = {
-            'relic': '🟣',
-            'legendary': '🟡',
-            'named': '🔵',
-            'hallowtide': '🟠',
-            'normal': '⚪'
-        }
-        rarity_emoji = rarity_colors.get(rarity.lower(), '⚪')
-        
-        # Highlight matching terms in the name
-        display_name = name
-        if search_type != "SMART":
-            for tag in tags:
-                if tag.lower() in name.lower():
-                    display_name = f"**{name}**"
-                    break
-        
-        embed.add_field(
-            name=f"{rarity_emoji} {display_name}",
-            value=f"**Type:** {cat}\n**Subcategories:** {sub}\n**Rarity:** {rarity}{voi_tag}",
-            inline=True
-        )
+            fields.append({"inline": False, "name": "Active Filters",
+                           "value": "\n".join(filter_info)})
+    
+    # Item fields come pre-rendered; names matching a tag are highlighted
+    fields.extend(render.search_fields(results, tags if search_type != "SMART" else ()))
+    
+    embed = discord.Embed.from_dict({
+        "type": "rich",
+        "title": title[:256],  # Discord title limit
+        "description": description,
+        "color": discord.Color.blue().value,
+        "fields": fields,
+    })
+    if page > 1 or more:
+        embed.set_footer(text=f"Page {page}")
+    
+    return None, embed
+
+async def fetch_search_page(compiled, after=None):
+    """One page of rows after cursor ``after``, and whether more follow"""
+    data_version = result_cache.data_version
+    
+    # Different spellings of the same search share cached rows
+    key = ("rows", compiled.key, after)
+    rows = result_cache.get(key)
+    if rows is None:
+        async def query_rows():
+            # One extra row says whether there is a next page
+            rows = await db.run(search.execute, compiled, item_index, after,
+                                SEARCH_PAGE_SIZE + 1)
+            result_cache.put(key, rows, data_version)
+            return rows
+        # Identical searches already in flight share that query
+        rows = await gateway.run((key, data_version), query_rows)
+    return rows[:SEARCH_PAGE_SIZE], len(rows) > SEARCH_PAGE_SIZE
+
+async def search_page(compiled, after=None, page=1):
+    """Page ``page`` of a search, after cursor ``after``, as ``(rows, more, content, embed)``
+
+    The rendered message is cached per query text and cursor, so a repeated
+    search or a revisited page skips building its embed. The rows under it
+    come from ``fetch_search_page``, whose cache spellings share.
+    """
+    data_version = result_cache.data_version
+    key = ("page", compiled.text, after, page)
+    cached = result_cache.get(key)
+    if cached is None:
+        with metrics.stage("item", "fetch"):
+            rows, more = await fetch_search_page(compiled, after)
+        with metrics.stage("item", "render"):
+            content, embed = build_search_page(compiled.text, compiled.search_type,
+                                               compiled.tags, rows, compiled.filters,
+                                               page, more)
+        cached = rows, more, content, embed
+        result_cache.put(key, cached, data_version)
+    return cached
+
+class PageButtons(discord.ui.View):
+    """Previous/next buttons that only the requester can use.
+
+    Subclasses keep their own position and implement ``turn``, which
+    edits the new page in.
+    """
+    
+    def __init__(self, author_id):
+        super().__init__(timeout=SEARCH_PAGE_TIMEOUT)
+        self.author_id = author_id
+        self.message = None
+    
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message(
+                "Only the person who asked can turn these pages.", ephemeral=True)
+            return False
+        return True
+    
+    def update_buttons(self, has_previous, has_next):
+        self.previous_page.disabled = not has_previous
+        self.next_page.disabled = not has_next
+    
+    async def turn(self, interaction, step):
+        raise NotImplementedError
+    
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        await self.turn(interaction, -1)
+    
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.primary)
+    async def next_page(self, interaction, button):
+        await self.turn(interaction, 1)
+    
+    async def on_timeout(self):
+        if self.message is None:
+            return
+        for child in self.children:
+            child.disabled = True
+        try:
+            await self.message.edit(view=self)
+        except discord.HTTPException:
+            pass
+
+class SearchPages(PageButtons):
+    """Page buttons for an Sitem reply, fetching each page on click.
+
+    Pages are addressed by keyset cursors (the last row's rarity rank and
+    name) rather than offsets, so a later page costs the same as the first.
+    """
     
-    # Split if too many results
-    if len(embed.fields) > 10:
-        embeds = []
-        for i in range(0, len(results), 10):
-            page_embed = discord.Embed(
-                title=f"{title[:240]} (Page {i//10 + 1})",
-                color=discord.Color.blue()
-            )
-            for name, cat, sub, rarity, voi in results[i:i+10]:
-                voi_tag = " <:VOI:1470243357065220187>" if voi else ""
-                page_embed.add_field(
-                    name=f"{name}",
-                    value=f"Type: {cat}\nSub: {sub}\nRarity: {rarity}{voi_tag}",
-                    inline=True
-                )
-            embeds.append(page_embed)
+    def __init__(self, compiled, author_id, rows, more):
+        super().__init__(author_id)
+        self.compiled = compiled
+        # Cursor each visited page starts after (None: the first page)
+        self.cursors = [None]
+        self.rows = rows
+        self.more = more
+        self.update_buttons(False, more)
+    
+    @property
+    def page(self):
+        return len(self.cursors)
+    
+    async def turn(self, interaction, step):
+        if step > 0:
+            self.cursors.append(page_cursor(self.rows[-1]))
+        else:
+            self.cursors.pop()
+        with metrics.stage("item", "page"):
+            self.rows, self.more, _, embed = await search_page(
+                self.compiled, self.cursors[-1], self.page)
+            self.update_buttons(self.page > 1, self.more)
+            await interaction.response.edit_message(embed=embed, view=self)
+
+class EmbedPages(PageButtons):
+    """Page buttons over embeds that are already built"""
+    
+    def __init__(self, embeds, author_id):
+        super().__init__(author_id)
+        self.embeds = embeds
+        self.page = 0
+        self.update_buttons(False, len(embeds) > 1)
+    
+    async def turn(self, interaction, step):
+        self.page += step
+        self.update_buttons(self.page > 0, self.page < len(self.embeds) - 1)
+        await interaction.response.edit_message(embed=self.embeds[self.page], view=self)
+
+async def complete_item_query(interaction, current):
+    """/item autocomplete: item names, tags and filter values for what is typed"""
+    if completer is None:
+        return []
+    with metrics.stage("item", "autocomplete"):
+        return [app_commands.Choice(name=label, value=value)
+                for label, value in completer.complete(current)]
+
+@bot.hybrid_command(name='item', help='Search for items with advanced filters')
+@app_commands.describe(query="Words, tags or filters, e.g. sword + flame rarity:legendary")
+@app_commands.autocomplete(query=complete_item_query)
+@rate_limited
+async def item_search(ctx, *, query):
+    """
+    Search for items with multiple tags and filters:
+    
+    BASIC SEARCH:
+    Sitem sword              - Single term search
+    Sitem sword + flame      - Items with BOTH sword AND flame (AND search)
+    Sitem sword,flame        - Items with EITHER sword OR flame (OR search)
+    Sitem sword/flame        - Same as comma (OR search)
+    Sitem light dagger       - Space separated (OR search)
+    
+    ADVANCED FILTERS:
+    Sitem rarity:legendary           - Filter by rarity
+    Sitem type:weapon                - Filter by category
+    Sitem voi:yes                    - Only VOI items
+    Sitem sub:elemental              - Filter by subcategory tag
+    Sitem sub:heavy/sword            - Items with ALL of these tags
+    Sitem sub:flame,frost            - Items with ANY of these tags
+    Sitem "light dagger"             - Exact phrase search
+    
+    COMBINED SEARCH:
+    Sitem sword rarity:legendary type:weapon  - Multiple filters
+    Sitem "hero's blade" rarity:legendary     - Phrase with filter
+    Sitem sword + flame voi:yes               - AND search with filter
+    """
+    # As /item, acknowledge now: a slow search must not outlast Discord's 3s deadline
+    await ctx.defer()
+    if not query or len(query.strip()) < 2:
+        await ctx.send("Please provide at least 2 characters to search for.")
+        return
+    
+    query = query.strip()
+    with metrics.stage("item", "parse"):
+        compiled = compile_query(query)
+    rows, more, content, embed = await search_page(compiled)
+    if not rows:
+        with metrics.stage("item", "suggest"):
+            content += await did_you_mean(compiled)
+    with metrics.stage("item", "send"):
+        if not more:
+            await ctx.send(content, embed=embed)
+            return
         
-        for page_embed in embeds:
-            await ctx.send(embed=page_embed)
-    else:
-        await ctx.send(embed=embed)
+        # More than one page: a single message whose buttons load the rest
+        view = SearchPages(compiled, ctx.author.id, rows, more)
+        view.message = await ctx.send(embed=embed, view=view)
 
 @bot.command(name='random', help='Get a random item')
-async def random_item(ctx):
-    """Get a random item from database"""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT name, category, subcategories, rarity, voi
-        FROM items
-        ORDER BY RANDOM()
-        LIMIT 1
-    """)
-    
-    result = cur.fetchone()
-    conn.close()
-    
-    if result:
+@rate_limited
+async def random_item(ctx, *, query: str = ""):
+    """Get a random item from database, optionally matching an Sitem query"""
+    with metrics.stage("random", "parse"):
+        compiled = compile_query(query.strip()) if query.strip() else None
+    with metrics.stage("random", "fetch"):
+        result = await db.run(search.random_item, compiled, item_index)
+    
+    if not result and compiled:
+        content, _ = build_search_page(compiled.text, compiled.search_type, compiled.tags,
+                                       [], compiled.filters)
+        await ctx.send(content)
+    elif result:
         name, cat, sub, rarity, voi = result
-        voi_tag = " <:VOI:1470243357065220187>" if voi else ""
+        voi_tag = render.VOI_TAG if voi else ""
         
         embed = discord.Embed(
             title="🎲 Random Item",
@@ -463,7 +564,152 @@ async def random_item(ctx):
         embed.add_field(name="Subcategories", value=sub, inline=True)
         embed.add_field(name="Rarity", value=f"{rarity}{voi_tag}", inline=True)
         
-        await ctx.send(embed=embed)
+        with metrics.stage("random", "send"):
+            await ctx.send(embed=embed)
+
+async def get_name_resolver():
+    global name_resolver
+    # One build at a time; requests waiting on it reuse the result
+    async with name_resolver_lock:
+        version = result_cache.data_version
+        if name_resolver is None or name_resolver.version != version:
+            index = item_index
+            name_resolver = await db.run(
+                lambda: batch.NameResolver(index.live_rows(), version))
+    return name_resolver
+
+async def did_you_mean(compiled):
+    """Close item names for a search that found nothing, as a reply suffix"""
+    if compiled.search_type == "SMART":
+        text = " ".join(compiled.filters['name_terms'])
+    else:
+        text = " ".join(compiled.tags)
+    if not text:
+        return ""
+    resolver = await get_name_resolver()
+    suggestions = resolver.suggest(text, DID_YOU_MEAN)
+    if not suggestions:
+        return ""
+    names = ", ".join(f"**{row[0]}**" for row, _ in suggestions)
+    return f"\nDid you mean: {names}?"
+
+def build_batch_pages(results, truncated, title=None):
+    """Render Sbatch results as summary embeds of BATCH_PAGE_LINES lines each"""
+    counts = batch.summary(results)
+    description = (f"✅ {counts[batch.MATCHED]} matched · "
+                   f"❓ {counts[batch.AMBIGUOUS]} ambiguous · "
+                   f"❌ {counts[batch.MISSING]} missing")
+    if truncated:
+        description += f"\nOnly the first {BATCH_MAX_NAMES} names were checked."
+    
+    lines = [render.batch_line(result) for result in results]
+    pages = [lines[i:i + BATCH_PAGE_LINES] for i in range(0, len(lines), BATCH_PAGE_LINES)]
+    embeds = []
+    for number, page in enumerate(pages, 1):
+        embed = discord.Embed(
+            title=title or f"Batch lookup: {len(results)} name(s)",
+            # Discord caps a description at 4096 characters
+            description=(description + "\n\n" + "\n".join(page))[:4096],
+            color=discord.Color.blue()
+        )
+        if len(pages) > 1:
+            embed.set_footer(text=f"Page {number} of {len(pages)}")
+        embeds.append(embed)
+    return embeds
+
+async def send_pages(ctx, embeds):
+    """Send summary embeds, with page buttons when there is more than one"""
+    if len(embeds) == 1:
+        await ctx.send(embed=embeds[0])
+        return
+    view = EmbedPages(embeds, ctx.author.id)
+    view.message = await ctx.send(embed=embeds[0], view=view)
+
+@bot.command(name='batch', help='Look up a list of item names at once')
+@rate_limited
+async def batch_lookup(ctx, *, names: str = ""):
+    """
+    Look up many item names in one go. Put one name per line (or separate
+    them with commas), or attach a .txt file:
+    
+    Sbatch
+    Darksteel Cleaver
+    The Death Knell
+    kyrsedge
+    """
+    text = names
+    for attachment in ctx.message.attachments:
+        if attachment.size > BATCH_MAX_BYTES:
+            await ctx.send(f"`{attachment.filename}` is too large "
+                           f"(limit {BATCH_MAX_BYTES // 1024} KB).")
+            return
+        if attachment.filename.lower().endswith(".txt") or (
+                attachment.content_type or "").startswith("text/"):
+            data = await attachment.read()
+            text += "\n" + data.decode("utf-8", errors="replace")
+    
+    lines = batch.batch_lines(text)
+    if not lines:
+        await ctx.send("Give me some item names: one per line after `Sbatch`, "
+                       "or attach a .txt file.")
+        return
+    truncated = len(lines) > BATCH_MAX_NAMES
+    lines = lines[:BATCH_MAX_NAMES]
+    
+    with metrics.stage("batch", "resolve"):
+        resolver = await get_name_resolver()
+        results = await db.run(resolver.resolve, lines)
+    if not results:
+        await ctx.send("None of those lines look like item names.")
+        return
+    
+    with metrics.stage("batch", "send"):
+        await send_pages(ctx, build_batch_pages(results, truncated))
+
+@bot.command(name='scan', help='Read the items in an inventory screenshot')
+@rate_limited
+async def scan_inventory(ctx):
+    """
+    Read item names off an attached inventory screenshot and look them up:
+    
+    Sscan  (with a .png or .jpg attached)
+    """
+    image = next((attachment for attachment in ctx.message.attachments
+                  if (attachment.content_type or "").startswith("image/")), None)
+    if image is None:
+        await ctx.send("Attach an inventory screenshot to `Sscan`.")
+        return
+    if image.size > SCAN_MAX_BYTES:
+        await ctx.send(f"`{image.filename}` is too large "
+                       f"(limit {SCAN_MAX_BYTES // (1024 * 1024)} MB).")
+        return
+    with metrics.stage("scan", "download"):
+        data = await image.read()
+    
+    resolver = await get_name_resolver()
+    try:
+        # Slots are read on the OCR pool; keep the wait off the event loop
+        with metrics.stage("scan", "ocr"):
+            items = await asyncio.to_thread(ocr_inventory.scan_inventory, data, resolver,
+                                            ocr_pool, ocr_dumps)
+    except ValueError:
+        await ctx.send(f"Couldn't read `{image.filename}` as an image.")
+        return
+    except ocr_inventory.TesseractNotFoundError:
+        await ctx.send("Screenshot scanning isn't set up here (Tesseract not found).")
+        return
+    except ocr_inventory.TesseractError as e:
+        print(f"Tesseract failed on {image.filename} (exit {e.status}): {e.message}")
+        await ctx.send(f"Couldn't read that screenshot (`{image.filename}`); try another one.")
+        return
+    if not items:
+        await ctx.send("No item slots found in that screenshot.")
+        return
+    
+    results = ocr_inventory.batch_results(items)
+    with metrics.stage("scan", "send"):
+        await send_pages(ctx, build_batch_pages(
+            results, False, title=f"Inventory scan: {len(items)} slot(s)"))
 
 @bot.command(name='helpme', help='Show all available commands')
 async def help_command(ctx):
@@ -481,9 +727,13 @@ async def help_command(ctx):
                          "**OR:** `Sitem sword,flame` (either term)\n"
                          "**Filters:** `Sitem rarity:legendary`\n"
                          "           `Sitem type:weapon voi:yes`\n"
-                         "           `Sitem sub:elemental`\n"
+                         "           `Sitem sub:elemental`, `Sitem sub:heavy/sword`\n"
                          "**Exact:** `Sitem \"light dagger\"`"),
-        ("Srandom", "Get a random item"),
+        ("/item <query>", "The same search as a slash command, suggesting names, tags "
+                          "and filters as you type"),
+        ("Srandom [filters]", "Get a random item, e.g. `Srandom rarity:legendary voi:yes`"),
+        ("Sbatch <names>", "Look up many names at once: one per line, or attach a .txt file"),
+        ("Sscan", "Attach an inventory screenshot to look up every item in it"),
         ("Shelp", "Show this help message"),
         ("Sexamples", "Show search examples")
     ]
@@ -514,10 +764,13 @@ async def examples_command(ctx):
         ("Rarity Filter", "`Sitem rarity:legendary` - Only legendary items"),
         ("Type Filter", "`Sitem type:weapon` - Only weapons"),
         ("VOI Filter", "`Sitem voi:yes` - Only VOI items"),
-        ("Subcategory Filter", "`Sitem sub:elemental` - Items with 'elemental' in subcategories"),
+        ("Subcategory Filter", "`Sitem sub:elemental` - Items tagged 'elemental'"),
+        ("", "`Sitem sub:heavy/sword` - Tagged both 'heavy' AND 'sword'"),
+        ("", "`Sitem sub:flame,frost` - Tagged 'flame' OR 'frost'"),
         ("Combined Filters", "`Sitem sword rarity:legendary type:weapon` - All conditions"),
         ("Mixed Search", "`Sitem sword+flame voi:yes` - AND search with VOI filter"),
-        ("Random Item", "`Srandom` - Get a random item")
+        ("Random Item", "`Srandom` - Get a random item"),
+        ("", "`Srandom rarity:legendary` - Random item matching filters")
     ]
     
     for title, example in examples:
@@ -529,29 +782,12 @@ async def examples_command(ctx):
     await ctx.send(embed=embed)
 
 @bot.command(name='voi', help='Show all VOI items')
+@rate_limited
 async def voi_items(ctx):
     """Show all VOI items"""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT name, category, subcategories, rarity, voi
-        FROM items
-        WHERE voi = 1
-        ORDER BY 
-            CASE rarity 
-                WHEN 'relic' THEN 1
-                WHEN 'legendary' THEN 2
-                WHEN 'named' THEN 3
-                WHEN 'hallowtide' THEN 4
-                WHEN 'normal' THEN 5
-                ELSE 6
-            END,
-            name
-    """)
-    
-    results = cur.fetchall()
-    conn.close()
+    with metrics.stage("voi", "fetch"):
+        results = await gateway.run(("voi", result_cache.data_version),
+                                    lambda: db.run(search.voi_items))
     
     if not results:
         await ctx.send("No VOI items found.")
@@ -564,27 +800,86 @@ async def voi_items(ctx):
         color=discord.Color.gold()
     )
     
-    # Add results in chunks
-    for i, (name, cat, sub, rarity, voi) in enumerate(results[:20], 1):
-        rarity_colors = {
-            'relic': '🟣',
-            'legendary': '🟡',
-            'named': '🔵',
-            'hallowtide': '🟠',
-            'normal': '⚪'
-        }
-        rarity_emoji = rarity_colors.get(rarity.lower(), '⚪')
-        
-        embed.add_field(
-            name=f"{i}. {rarity_emoji} {name}",
-            value=f"Type: {cat}\nRarity: {rarity}",
-            inline=True
-        )
+    # Add the first results, pre-rendered
+    for field in render.voi_fields(results[:20]):
+        embed.add_field(**field)
     
     if len(results) > 20:
         embed.set_footer(text=f"Showing 20 of {len(results)} VOI items")
     
-    await ctx.send(embed=embed)
+    with metrics.stage("voi", "send"):
+        await ctx.send(embed=embed)
+
+def stats_table(header, lines):
+    """A code block for an embed field, cut to Discord's 1024 characters"""
+    block = [header]
+    size = len(header) + 8
+    for line in lines:
+        if size + len(line) + 1 > 1024:
+            break
+        block.append(line)
+        size += len(line) + 1
+    return "```\n" + "\n".join(block) + "\n```"
+
+def build_stats_embed():
+    """Latency percentiles, slowest SQL shapes, cache hit rates and loop lag"""
+    ms = lambda seconds: f"{seconds * 1000:.1f}"
+    registry = metrics.registry
+    embed = discord.Embed(title="📊 Bot Stats", description="Latencies in ms",
+                          color=discord.Color.blue())
+
+    commands_seen = sorted(registry.summaries("bot_command_seconds"), key=lambda s: -s.count)
+    embed.add_field(name="Commands", inline=False, value=stats_table(
+        f"{'command':<14} {'n':>6} {'p50':>7} {'p95':>7} {'p99':>7}",
+        [f"{s.labels['command'] + ('' if s.labels['status'] == 'ok' else ' (err)'):<14} "
+         f"{s.count:>6} {ms(s.p50):>7} {ms(s.p95):>7} {ms(s.p99):>7}"
+         for s in commands_seen]) if commands_seen else "No commands yet")
+
+    stages = sorted(registry.summaries("bot_stage_seconds"),
+                    key=lambda s: (s.labels['command'], s.labels['stage']))
+    if stages:
+        embed.add_field(name="Stages", inline=False, value=stats_table(
+            f"{'stage':<17} {'n':>6} {'p50':>7} {'p95':>7} {'p99':>7}",
+            [f"{s.labels['command'] + '/' + s.labels['stage']:<17} "
+             f"{s.count:>6} {ms(s.p50):>7} {ms(s.p95):>7} {ms(s.p99):>7}" for s in stages]))
+
+    # Shapes that cost the most time in total, not the slowest single runs
+    queries = sorted(registry.summaries("bot_db_query_seconds"), key=lambda s: -s.total)[:5]
+    if queries:
+        embed.add_field(name="SQL (most total time)", inline=False, value=stats_table(
+            f"{'n':>6} {'mean':>7} {'p95':>7}  shape",
+            [f"{s.count:>6} {ms(s.total / s.count):>7} {ms(s.p95):>7}  "
+             f"{s.labels['shape'][:120]}" for s in queries]))
+
+    caches = []
+    for family, labels, stats in registry.stats():
+        if family == "cache":
+            caches.append(f"{labels['cache']}: {stats['hit_rate']:.0%} of "
+                          f"{stats['hits'] + stats['misses']} lookups")
+        elif family == "db_pool":
+            caches.append(f"db pool: {stats['opened']} open, {stats['waits']} waits "
+                          f"({stats['wait_ms']} ms)")
+    embed.add_field(name="Caches", value="\n".join(caches), inline=False)
+
+    requests = gateway.stats()
+    embed.add_field(name="Gateway", inline=False,
+                    value=f"{requests['executed']} queries run · "
+                          f"{requests['coalesced']} coalesced · throttled "
+                          f"{requests['throttled_user']} by user, "
+                          f"{requests['throttled_guild']} by guild")
+
+    lag = registry.summaries("bot_loop_lag_seconds")
+    if lag:
+        embed.add_field(name="Event loop lag", inline=False,
+                        value=f"p50 {ms(lag[0].p50)} · p99 {ms(lag[0].p99)} · "
+                              f"max {ms(lag[0].max)}")
+    return embed
+
+@bot.command(name='stats', help='Show latency and cache statistics (bot owner only)')
+@commands.is_owner()
+async def stats_command(ctx):
+    """Show command latencies, slow SQL, cache hit rates and event loop lag"""
+    await ctx.send(embed=build_stats_embed())
 
 # Run the bot
 if __name__ == "__main__":
@@ -592,4 +887,9 @@ if __name__ == "__main__":
         print("🚀 Starting bot...")
         bot.run(token)
     except Exception as e:
-        print(f"Error: {e}")
\ No newline at end of file
+        print(f"Error: {e}")
+    finally:
+        if slow_commands is not None:
+            slow_commands.stop()
+        db.close()
+        ocr_pool.close()
\ No newline at end of file
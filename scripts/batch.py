@@ -0,0 +1,155 @@
+"""Resolve pasted lists of item names (``Sbatch``) against the catalog.
+
+Each pasted line and each catalog name are cleaned with
+``normalize_line`` (without its OCR fix-ups, which would rewrite real
+names), so OCR noise, counts, brackets and case do not get in the way.
+A line resolves to the items whose cleaned name equals it, or failing
+that, starts with it. A line that matches neither gets the closest name
+from a trigram fuzzy matcher as a suggestion. Matching is done entirely
+in memory: ``NameResolver`` is built once per data version from the
+loaded index and then answers a whole list with dict lookups and a
+bisect (plus a fuzzy lookup for misses) per line.
+"""
+import bisect
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from scripts.fuzzy import TOP_K, FuzzyMatcher
+from scripts.normalize import normalize_line, normalize_lines
+
+MATCHED = "matched"
+AMBIGUOUS = "ambiguous"
+MISSING = "missing"
+
+# Candidates kept for an ambiguous line
+MAX_CANDIDATES = 5
+
+# Shorter lines only match a name exactly; as prefixes they match half
+# the catalog
+MIN_PREFIX = 3
+
+# A stack size before or after the name: "x2", "2x", "×2", "(3)", "[x2]"
+_QUANTITY = r"[\[(]?\s*(?:[x×]\s*(\d+)|(\d+)\s*[x×]?)\s*[\])]?"
+_LEADING_QUANTITY = re.compile(rf"^\s*{_QUANTITY}\s+", re.IGNORECASE)
+_TRAILING_QUANTITY = re.compile(rf"\s+{_QUANTITY}\s*$", re.IGNORECASE)
+
+
+class BatchResult(NamedTuple):
+    line: str                # first spelling seen
+    key: str                 # normalized line
+    status: str              # MATCHED, AMBIGUOUS or MISSING
+    rows: Tuple[Tuple, ...]  # the match, candidates, or a suggestion when missing
+    more: bool               # candidates beyond ``rows`` exist
+    count: int               # total quantity across the lines
+
+
+def split_quantity(line: str) -> Tuple[str, int]:
+    """``line`` without a leading or trailing stack size, and that size (default 1)."""
+    for pattern in (_LEADING_QUANTITY, _TRAILING_QUANTITY):
+        match = pattern.search(line)
+        if match:
+            digits = match.group(1) or match.group(2)
+            return line[:match.start()] + line[match.end():], max(int(digits), 1)
+    return line, 1
+
+
+def batch_lines(text: str) -> List[str]:
+    """Names in pasted text: one per line, or comma/semicolon separated on one line."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) == 1:
+        lines = [part for part in lines[0].replace(";", ",").split(",") if part.strip()]
+    return [line.strip() for line in lines]
+
+
+class NameResolver:
+    """Normalized item names: exact lookups, prefix search and fuzzy suggestions.
+
+    ``version`` records the data version the rows were read at, so callers
+    can tell when to rebuild.
+    """
+
+    __slots__ = ("rows", "keys", "fuzzy", "version")
+
+    def __init__(self, rows: Iterable[Tuple], version: Optional[int] = None):
+        rows = list(rows)
+        keys = normalize_lines((row[0] or "" for row in rows), fix_ocr=False)
+        self.rows: Dict[str, List[Tuple]] = {}
+        for row, key in zip(rows, keys):
+            if key:
+                self.rows.setdefault(key, []).append(row)
+        self.keys = sorted(self.rows)
+        self.fuzzy = FuzzyMatcher(self.keys)
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _prefixed(self, key: str, limit: int) -> Tuple[List[Tuple], bool]:
+        """Rows whose key starts with ``key`` (up to ``limit``), and whether there are more."""
+        keys = self.keys
+        found = []
+        i = bisect.bisect_left(keys, key)
+        while i < len(keys) and keys[i].startswith(key):
+            for row in self.rows[keys[i]]:
+                if len(found) == limit:
+                    return found, True
+                found.append(row)
+            i += 1
+        return found, False
+
+    def suggest(self, text: str, k: int = TOP_K) -> List[Tuple[Tuple, float]]:
+        """Up to ``k`` ``(row, score)`` pairs with names close to ``text``, best first."""
+        suggestions = []
+        for key, score in self.fuzzy.search(normalize_line(text, fix_ocr=False), k):
+            suggestions.extend((row, score) for row in self.rows[key])
+        return suggestions[:k]
+
+    def resolve_key(self, key: str) -> Tuple[str, Tuple[Tuple, ...], bool]:
+        """Status, matching rows and whether more rows matched than returned."""
+        exact = self.rows.get(key)
+        if exact is not None:
+            if len(exact) == 1:
+                return MATCHED, tuple(exact), False
+            return AMBIGUOUS, tuple(exact[:MAX_CANDIDATES]), len(exact) > MAX_CANDIDATES
+        found, more = ([], False) if len(key) < MIN_PREFIX else \
+            self._prefixed(key, MAX_CANDIDATES)
+        if not found:
+            suggestion = self.fuzzy.search(key, 1)
+            if suggestion:
+                return MISSING, tuple(self.rows[suggestion[0][0]][:1]), False
+            return MISSING, (), False
+        if len(found) == 1 and not more:
+            return MATCHED, tuple(found), False
+        return AMBIGUOUS, tuple(found), more
+
+    def resolve(self, lines: Sequence[str]) -> List[BatchResult]:
+        """Resolve ``lines`` in input order, merging lines that normalize alike.
+
+        Stack sizes are summed into ``count``. Lines that normalize to
+        nothing are dropped.
+        """
+        first: Dict[str, str] = {}
+        counts: Dict[str, int] = {}
+        for line in lines:
+            name, quantity = split_quantity(line)
+            key = normalize_line(name, fix_ocr=False)
+            if not key:
+                continue
+            if key not in counts:
+                first[key] = name.strip()
+                counts[key] = 0
+            counts[key] += quantity
+
+        results = []
+        for key, count in counts.items():
+            status, rows, more = self.resolve_key(key)
+            results.append(BatchResult(first[key], key, status, rows, more, count))
+        return results
+
+
+def summary(results: Sequence[BatchResult]) -> Dict[str, int]:
+    """Number of distinct lines per status."""
+    counts = {MATCHED: 0, AMBIGUOUS: 0, MISSING: 0}
+    for result in results:
+        counts[result.status] += 1
+    return counts
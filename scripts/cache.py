@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300.0
+
+
+class ResultCache:
+    """LRU + TTL cache for search results, tied to the DB data version.
+
+    Entries expire ``ttl`` seconds after they are stored and the least
+    recently used entry is evicted once ``max_entries`` is reached. When
+    the DB's data version moves (an import ran), ``set_data_version`` drops
+    everything; ``put`` ignores values computed against an older version so
+    a query racing an import cannot re-insert stale rows.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.data_version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value for ``key``, or ``None``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, data_version: Optional[int] = None) -> None:
+        with self._lock:
+            if data_version is not None and data_version != self.data_version:
+                return
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_data_version(self, version: int) -> bool:
+        """Record the DB's data version; returns True if the cache was dropped."""
+        with self._lock:
+            if version == self.data_version:
+                return False
+            changed = self.data_version is not None
+            self.data_version = version
+            if changed:
+                self._entries.clear()
+                self.invalidations += 1
+            return changed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "data_version": self.data_version,
+            }
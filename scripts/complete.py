@@ -0,0 +1,150 @@
+"""Suggestions for ``/item`` as the user types, from sorted arrays in memory.
+
+A ``Completer`` is built from the catalog rows once per data version. It
+keeps sorted lowercase keys, each pointing at an item:
+
+- every item name, so "dark" finds "Darksteel Cleaver";
+- the name from each later word on ("cleaver"), so a word in the middle
+  of a name matches too;
+- every subcategory tag ("dagger", "elemental"), and the values the
+  ``rarity:``, ``type:``, ``sub:`` and ``voi:`` filters take.
+
+A prefix lookup is a bisect to the first key at or after the prefix, then
+a walk while keys still start with it. It stops after the handful of
+choices Discord shows, so a keystroke costs microseconds whatever the
+catalog size, and never touches SQLite.
+
+What is completed depends on the last part of the query: ``key:val``
+completes the filter value; anything else suggests item names matching
+the whole query (as a quoted, exact search) and tags matching the last
+word (replacing it).
+"""
+import bisect
+import collections
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from scripts.init_db import split_tags
+from scripts.item_index import sort_key
+from scripts.query import FILTER_KEYS, TRUE_VALUES
+
+# Discord shows at most 25 choices; names and values are capped at 100 characters
+MAX_CHOICES = 25
+CHOICE_LENGTH = 100
+
+# Tag suggestions mixed in ahead of item names
+MAX_TAGS = 5
+
+# The last part of a query: what follows the last blank, '+', ',' or '/'
+_LAST_PART = re.compile(r"^(.*[\s+,/])?([^\s+,/]*)$", re.DOTALL)
+
+Choice = Tuple[str, str]  # label shown, value filled in
+
+
+def _prefixed(keys: Sequence[str], prefix: str) -> Iterable[int]:
+    """Positions in sorted ``keys`` of the keys starting with ``prefix``."""
+    i = bisect.bisect_left(keys, prefix)
+    while i < len(keys) and keys[i].startswith(prefix):
+        yield i
+        i += 1
+
+
+def _word_starts(key: str) -> List[int]:
+    """Where each word after the first begins in ``key``."""
+    return [i + 1 for i, char in enumerate(key[:-1]) if char in " -" and key[i + 1] != " "]
+
+
+class Completer:
+    """Prefix lookups over item names, name words, tags and filter values."""
+
+    __slots__ = ("names", "rarities", "name_keys", "name_ids", "word_keys", "word_ids",
+                 "filters", "popular", "version")
+
+    def __init__(self, rows: Iterable[Tuple], version: Optional[int] = None):
+        rows = sorted((row for row in rows if row[0]), key=sort_key)
+        # Rows are in result order, so equal keys list the better item first
+        self.names = [row[0] for row in rows]
+        self.rarities = [row[3] or "" for row in rows]
+
+        names = sorted((name.lower(), i) for i, name in enumerate(self.names))
+        self.name_keys = [key for key, _ in names]
+        self.name_ids = [i for _, i in names]
+        words = sorted((key[start:], i) for key, i in names for start in _word_starts(key))
+        self.word_keys = [key for key, _ in words]
+        self.word_ids = [i for _, i in words]
+
+        tags: "collections.Counter[str]" = collections.Counter()
+        categories = set()
+        rarities = set()
+        for _, cat, sub, rarity, _ in rows:
+            tags.update(split_tags(sub))
+            if cat:
+                categories.add(cat.lower())
+            if rarity:
+                rarities.add(rarity.lower())
+        values = {
+            "rarity": sorted(rarities),
+            "category": sorted(categories),
+            "subcategory": sorted(tags),
+            "voi": sorted((TRUE_VALUES[0], "no")),
+        }
+        self.filters: Dict[str, List[str]] = {key: values[field]
+                                              for key, field in FILTER_KEYS.items()}
+        # Offered before anything is typed
+        self.popular = [tag for tag, _ in tags.most_common(MAX_CHOICES)]
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def item_names(self, prefix: str, limit: int = MAX_CHOICES) -> List[int]:
+        """Items whose name, or a word of it onwards, starts with ``prefix``.
+
+        Names that start with it come first.
+        """
+        found: List[int] = []
+        if limit <= 0:
+            return found
+        seen = set()
+        for keys, ids in ((self.name_keys, self.name_ids), (self.word_keys, self.word_ids)):
+            for pos in _prefixed(keys, prefix):
+                i = ids[pos]
+                if i not in seen:
+                    seen.add(i)
+                    found.append(i)
+                    if len(found) == limit:
+                        return found
+        return found
+
+    def values(self, key: str, prefix: str, limit: int = MAX_CHOICES) -> List[str]:
+        """Values of filter ``key`` (``rarity``, ``sub``...) starting with ``prefix``."""
+        values = self.filters.get(key, ())
+        return [values[pos] for pos, _ in zip(_prefixed(values, prefix), range(limit))]
+
+    def complete(self, text: str, limit: int = MAX_CHOICES) -> List[Choice]:
+        """``(label, value)`` choices for a partly typed ``/item`` query."""
+        head, part = _LAST_PART.match(text).groups()
+        head = head or ""
+        key = part.lower()
+        if not text.strip():
+            return [(tag, tag) for tag in self.popular[:limit]]
+
+        field, colon, value = key.partition(":")
+        if colon:
+            filter_key = field.strip()
+            prefix = head + part[:len(field) + 1]
+            return [_choice(prefix + found, prefix + found)
+                    for found in self.values(filter_key, value, limit)]
+
+        choices = [_choice(f"{head}{tag} (tag)", head + tag)
+                   for tag in self.values("sub", key.strip('"'), min(MAX_TAGS, limit))]
+        query = text.strip().strip('"').lower()
+        for i in self.item_names(query, limit - len(choices)):
+            name = self.names[i]
+            rarity = f" ({self.rarities[i]})" if self.rarities[i] else ""
+            choices.append(_choice(f"{name}{rarity}", f'"{name}"'))
+        return choices
+
+
+def _choice(label: str, value: str) -> Choice:
+    return label[:CHOICE_LENGTH], value[:CHOICE_LENGTH]
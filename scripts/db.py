@@ -0,0 +1,287 @@
+import asyncio
+import functools
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from scripts import metrics
+from scripts.init_db import init_db, missing_schema
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DB_PATH = BASE_DIR / "data" / "items.db"
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_PENDING = 64
+
+# Per-connection tuning for the read-only pool
+CACHE_SIZE_KIB = 64 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+STATEMENT_CACHE = 256
+
+# Names per "WHERE name IN (...)" lookup, under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+
+
+def prepare(db_path: Path) -> None:
+    """Bring the DB schema (search index, triggers, WAL) up to date before reading.
+
+    WAL lets readers run alongside an import without blocking either side.
+    A read-only DB is used as it is, provided it already has the full
+    schema; otherwise every search would fail, so this raises instead.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        init_db(conn)
+    except sqlite3.OperationalError as error:
+        conn.rollback()
+        missing = missing_schema(conn)
+        if missing:
+            raise RuntimeError(
+                f"{db_path} could not be upgraded ({error}) and lacks "
+                f"{', '.join(missing)}; open it once with write access "
+                f"(python -m scripts.init_db) to upgrade it"
+            ) from error
+    finally:
+        conn.close()
+
+
+class StatementClock:
+    """Times the statements run on one connection, for ``metrics``.
+
+    Installed as the connection's trace callback, which SQLite calls as
+    each statement starts. A statement's time runs until the next one
+    starts or the connection goes back to the pool, so it includes
+    fetching the rows. A connection is used by one thread at a time, and
+    so is its clock.
+    """
+
+    __slots__ = ("sql", "start")
+
+    def __init__(self):
+        self.sql: Optional[str] = None
+        self.start = 0.0
+
+    def __call__(self, sql: str) -> None:
+        # Statements run inside another one (FTS5 reading its shadow
+        # tables) come prefixed with "-- "; they belong to the outer one
+        if sql.startswith("-- "):
+            return
+        now = time.perf_counter()
+        self.stop(now)
+        self.sql = sql
+        self.start = now
+
+    def stop(self, now: Optional[float] = None) -> None:
+        if self.sql is not None:
+            end = time.perf_counter() if now is None else now
+            metrics.registry.observe_sql(self.sql, end - self.start)
+            self.sql = None
+
+
+class ConnectionPool:
+    """Shared read-only SQLite connections, reused across queries.
+
+    Each connection is handed to one thread at a time and goes back to the
+    pool afterwards, so its page cache, mmap and prepared-statement cache
+    survive between queries instead of being rebuilt per call. At most
+    ``max_connections`` are opened; further callers wait for one to free up.
+    """
+
+    def __init__(self, db_path: Path, max_connections: int = DEFAULT_WORKERS):
+        if max_connections < 1:
+            raise ValueError("max_connections must be at least 1")
+        self.db_path = Path(db_path)
+        self.max_connections = max_connections
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._clocks: Dict[sqlite3.Connection, StatementClock] = {}
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._hits = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._closed = False
+
+        prepare(self.db_path)
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            f"{self.db_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE,
+        )
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA query_only=ON")
+        clock = StatementClock()
+        conn.set_trace_callback(clock)
+        with self._lock:
+            self._clocks[conn] = clock
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            with self._lock:
+                self._hits += 1
+            return conn
+
+        with self._lock:
+            can_open = self._opened < self.max_connections
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        start = time.perf_counter()
+        conn = self._idle.get()
+        with self._lock:
+            self._waits += 1
+            self._wait_time += time.perf_counter() - start
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            clock = self._clocks.get(conn)
+            if clock is not None:
+                clock.stop()
+            if self._closed:
+                self._clocks.pop(conn, None)
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "opened": self._opened,
+                "idle": self._idle.qsize(),
+                "hits": self._hits,
+                "waits": self._waits,
+                "wait_ms": round(self._wait_time * 1000, 3),
+            }
+
+    def close(self) -> None:
+        """Close idle connections; connections still checked out close on return."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._clocks.pop(conn, None)
+            conn.close()
+        with self._lock:
+            self._opened = 0
+
+
+_db_path = DB_PATH
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+_pool_size = DEFAULT_WORKERS
+
+
+def configure(db_path: Path, max_connections: int = DEFAULT_WORKERS) -> None:
+    """Point every later connection at ``db_path`` (benchmarks, scratch DBs)."""
+    global _db_path, _pool, _pool_size
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _db_path = Path(db_path)
+        _pool = None
+        _pool_size = max_connections
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(_db_path, _pool_size)
+    return _pool
+
+
+def connection():
+    """Borrow a pooled read-only connection: ``with connection() as conn: ...``"""
+    return get_pool().connection()
+
+
+def pool_stats() -> Dict[str, float]:
+    return get_pool().stats()
+
+
+def data_version() -> int:
+    """Counter bumped by triggers on every write to ``items``."""
+    with connection() as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+    return row[0] if row else 0
+
+
+def changed_names(since: int) -> Optional[List[str]]:
+    """Item names written after data version ``since``, from the change log.
+
+    ``None`` means the log cannot say: a bulk write touched everything, or
+    entries that far back were pruned (or the DB predates the log). The
+    caller should then reload the whole catalog.
+    """
+    with connection() as conn:
+        try:
+            oldest = conn.execute("SELECT MIN(version) FROM item_changes").fetchone()[0]
+            if oldest is None or oldest > since + 1:
+                return None
+            names = [row[0] for row in conn.execute(
+                "SELECT DISTINCT name FROM item_changes WHERE version > ?", (since,))]
+        except sqlite3.OperationalError:
+            return None
+    return None if None in names else names
+
+
+class QueryRunner:
+    """Runs blocking SQLite calls on a bounded thread pool.
+
+    Command handlers await ``run`` instead of calling the query functions
+    directly, so a slow scan only occupies a worker thread and the Discord
+    gateway loop keeps serving heartbeats and other guilds.
+
+    ``max_workers`` bounds how many queries execute at once and
+    ``max_pending`` bounds how many may be in flight (running or queued);
+    callers past that limit wait on the loop instead of piling up work.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS,
+                 max_pending: int = DEFAULT_MAX_PENDING):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="itemdb"
+        )
+        self._slots = asyncio.Semaphore(self.max_pending)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs)
+        async with self._slots:
+            return await loop.run_in_executor(self._executor, call)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,142 @@
+"""Admission and deduplication in front of the commands that hit the DB.
+
+``CommandGateway`` does two things before a command's query runs:
+
+- Rate limits: each user and each guild has a token bucket that refills
+  at a fixed rate up to a burst size. A command takes a token from both,
+  or from neither when either is empty, and is rejected with how long
+  until it could run. This happens in a command check, before the
+  handler does any work.
+- Single flight: ``run`` executes one call per key at a time. Callers
+  asking for a key already in flight wait for that call's result instead
+  of starting their own, so a burst of identical searches costs one
+  query.
+
+Counters for executed, coalesced and throttled requests are in
+``stats()``. Everything here runs on the event loop and is not
+thread-safe.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+# Buckets kept before full (idle) ones are dropped
+MAX_BUCKETS = 10_000
+
+
+class Throttle(NamedTuple):
+    scope: str          # "user" or "guild"
+    retry_after: float  # seconds until a token is back
+    repeated: bool      # this bucket already turned a request away since it last had a token
+
+
+class TokenBuckets:
+    """One token bucket per key: ``rate`` tokens a second, holding at most ``burst``.
+
+    A ``rate`` of 0 turns the limit off.
+    """
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._clock = clock
+        # key -> (tokens, last refill, turned a request away since)
+        self._buckets: Dict[Hashable, Tuple[float, float, bool]] = {}
+
+    def _level(self, key: Hashable, now: float) -> Tuple[float, bool]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.burst, False
+        tokens, stamp, refused = bucket
+        return min(self.burst, tokens + (now - stamp) * self.rate), refused
+
+    def wait(self, key: Hashable, now: float) -> float:
+        """Seconds until ``key`` has a token (0: it has one now)."""
+        if not self.rate:
+            return 0.0
+        tokens, _ = self._level(key, now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, key: Hashable, now: float) -> None:
+        if self.rate:
+            tokens, _ = self._level(key, now)
+            self._buckets[key] = (tokens - 1, now, False)
+            if len(self._buckets) > MAX_BUCKETS:
+                self._prune(now)
+
+    def refuse(self, key: Hashable, now: float) -> bool:
+        """Note a request turned away; returns whether one already was."""
+        tokens, refused = self._level(key, now)
+        self._buckets[key] = (tokens, now, True)
+        return refused
+
+    def _prune(self, now: float) -> None:
+        full = [key for key in self._buckets if self._level(key, now)[0] >= self.burst]
+        for key in full:
+            del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class CommandGateway:
+    """Per-user and per-guild rate limits, and single-flight execution by key."""
+
+    def __init__(self, user_rate: float = 0.0, user_burst: float = 1,
+                 guild_rate: float = 0.0, guild_burst: float = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        self.users = TokenBuckets(user_rate, user_burst, clock)
+        self.guilds = TokenBuckets(guild_rate, guild_burst, clock)
+        self._clock = clock
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.throttled = {"user": 0, "guild": 0}
+
+    def admit(self, user_id: Hashable, guild_id: Optional[Hashable] = None) -> Optional[Throttle]:
+        """Take a token for the user and the guild (``None``: a DM), or say why not."""
+        now = self._clock()
+        checks: List[Tuple[str, TokenBuckets, Hashable]] = [("user", self.users, user_id)]
+        if guild_id is not None:
+            checks.append(("guild", self.guilds, guild_id))
+        for scope, buckets, key in checks:
+            retry_after = buckets.wait(key, now)
+            if retry_after:
+                self.throttled[scope] += 1
+                return Throttle(scope, retry_after, buckets.refuse(key, now))
+        for _, buckets, key in checks:
+            buckets.take(key, now)
+        return None
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """``await fn()``, shared with every concurrent caller passing the same ``key``.
+
+        The call runs as its own task, so a caller that gives up (is
+        cancelled) does not cancel it for the others.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the error seen: every caller may have been cancelled already
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "throttled_user": self.throttled["user"],
+            "throttled_guild": self.throttled["guild"],
+            "in_flight": len(self._inflight),
+            "buckets": len(self.users) + len(self.guilds),
+        }
@@ -1,46 +1,516 @@
+"""Import the item spreadsheet into the items table.
+
+    python -m scripts.import_items [--source data/items.xlsx] [--insert-only]
+    python -m scripts.import_items --stream --source items.csv [--batch-size 5000]
+    python -m scripts.import_items --sync [--source data/items.xlsx]
+
+Cells are normalized column-at-a-time with pandas string ops and the rows
+are written in one transaction with ``executemany``. Names already in the
+DB are updated when any field changed (``--insert-only`` leaves them alone,
+the old behaviour); unchanged rows are skipped.
+
+``--stream`` handles sources too large to load at once (.xlsx, .csv or
+.jsonl): rows are read one at a time and committed in batches, so memory
+stays flat whatever the file size. Progress is saved with each batch and an
+interrupted stream import picks up after the last committed batch.
+
+``--sync`` makes the table mirror the sheet: every row carries a hash of
+its content, so only rows that were added, changed or removed are written
+(items missing from the sheet are deleted) and the rest are never touched.
+Readers pick up just those rows through the change log.
+
+A name listed more than once takes the values of its last row, in every
+mode (with ``--insert-only``, unless the name was already in the DB).
+
+Every mode also fills the ``tags`` and ``item_tags`` tables that ``sub:``
+searches use (see ``scripts.init_db``): triggers keep them in step row by
+row, and a bulk write rebuilds them once at the end.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import math
 import sqlite3
-import pandas as pd
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from scripts.db import LOOKUP_CHUNK
+from scripts.init_db import (analyze, bulk_write, init_db, prune_change_log,
+                             restore_upkeep, suspend_upkeep)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 DB_PATH = BASE_DIR / "data" / "items.db"
 XLSX_PATH = BASE_DIR / "data" / "items.xlsx"
 
-df = pd.read_excel(XLSX_PATH)
+COLUMNS = ["name", "category", "subcategories", "rarity", "voi", "notes"]
+VALUE_COLUMNS = COLUMNS[1:]
+TRUE_VALUES = ["yes", "true", "1"]
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Rewriting more than this share of the table rebuilds the search index
+# once instead of maintaining it row by row
+BULK_SHARE = 0.1
+
+# Names listed per kind in the --sync summary
+SUMMARY_NAMES = 10
+
+INSERT_SQL = """
+    INSERT OR IGNORE INTO items
+    (name, category, subcategories, rarity, voi, notes, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPDATE_SQL = """
+    UPDATE items
+    SET category = ?, subcategories = ?, rarity = ?, voi = ?, notes = ?, content_hash = ?
+    WHERE name = ?
+"""
+
+DELETE_SQL = "DELETE FROM items WHERE name = ?"
+
+# Records the hash of a row imported before hashes existed; content_hash
+# is not a trigger column, so this leaves the search index alone
+HASH_SQL = "UPDATE items SET content_hash = ? WHERE name = ?"
+
+
+def content_hash(values) -> str:
+    """Digest of a row's ``VALUE_COLUMNS`` (the name is the key, not content)."""
+    text = "\x1f".join(str(value) for value in values)
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def _text(df: pd.DataFrame, column: str) -> pd.Series:
+    """Column as stripped strings; a missing column reads as '' for every row.
+
+    Empty cells become 'nan' like ``str(cell)`` did (newer pandas keeps them
+    missing through ``astype(str)``, hence the ``fillna``).
+    """
+    if column not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[column].astype(str).fillna("nan").str.strip()
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Spreadsheet rows -> ``COLUMNS``, cleaned the same way as a manual import.
+
+    Rows without an item name are dropped. Other cells are stringified, so an
+    empty cell becomes the text 'nan', matching what earlier imports stored.
+    """
+    df = df.rename(columns=lambda c: str(c).strip().lower())
+    if "item_name" not in df.columns:
+        return pd.DataFrame(columns=COLUMNS)
+
+    df = df[df["item_name"].notna()]
+
+    return pd.DataFrame({
+        "name": df["item_name"].astype(str).str.strip(),
+        "category": _text(df, "category").str.lower(),
+        "subcategories": _text(df, "subcategories").str.lower(),
+        "rarity": _text(df, "rarity").str.lower(),
+        "voi": _text(df, "voi").str.lower().isin(TRUE_VALUES).astype(int),
+        "notes": _text(df, "notes"),
+    }, columns=COLUMNS)
+
+
+def _rows(frame: pd.DataFrame, columns) -> list:
+    # Series.tolist() yields plain Python values, which sqlite3 can bind
+    return list(zip(*(frame[column].tolist() for column in columns)))
+
+
+def _with_hashes(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.assign(content_hash=[
+        content_hash(values) for values in _rows(frame, VALUE_COLUMNS)
+    ])
+
+
+def import_frame(conn: sqlite3.Connection, frame: pd.DataFrame,
+                 update: bool = True, source_rows: Optional[int] = None) -> Dict[str, int]:
+    """Write normalized rows, returning inserted/updated/skipped counts.
+
+    Within one import the last row for a name wins, as in ``stream_import``.
+    ``source_rows`` is the raw sheet size, so rows dropped
+    for a missing name count as skipped.
+    """
+    if source_rows is None:
+        source_rows = len(frame)
+    frame = _with_hashes(frame.drop_duplicates("name", keep="last"))
+
+    existing = pd.read_sql_query(
+        f"SELECT {', '.join(COLUMNS)} FROM items", conn
+    )
+    merged = frame.merge(existing, on="name", how="left",
+                         suffixes=("", "_db"), indicator=True)
+    is_new = (merged["_merge"] == "left_only").to_numpy()
+
+    changed = pd.Series(False, index=merged.index)
+    for column in VALUE_COLUMNS:
+        changed |= merged[column] != merged[f"{column}_db"]
+    is_changed = changed.to_numpy() & ~is_new
+
+    new_rows = merged[is_new]
+    changed_rows = merged[is_changed] if update else merged.iloc[0:0]
+
+    inserted = len(new_rows)
+    updated = len(changed_rows)
+    if not inserted and not updated:
+        return {"inserted": 0, "updated": 0, "skipped": source_rows}
+
+    bulk = inserted + updated > BULK_SHARE * (len(existing) + inserted)
+    with (bulk_write(conn) if bulk else conn):
+        conn.executemany(INSERT_SQL, _rows(new_rows, COLUMNS + ["content_hash"]))
+        conn.executemany(UPDATE_SQL, _rows(changed_rows,
+                                           VALUE_COLUMNS + ["content_hash", "name"]))
+
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "skipped": source_rows - inserted - updated,
+    }
+
+
+def import_sheet(conn: sqlite3.Connection, source: Path = XLSX_PATH,
+                 update: bool = True) -> Dict[str, int]:
+    df = pd.read_excel(source)
+    return import_frame(conn, normalize_frame(df), update=update, source_rows=len(df))
+
+
+def sync_frame(conn: sqlite3.Connection, frame: pd.DataFrame) -> Dict[str, List[str]]:
+    """Make ``items`` hold exactly the rows of ``frame``, writing only the diff.
+
+    Returns the names added, changed and removed, plus the unchanged count
+    under ``"unchanged"``. Rows stored before content hashes existed are
+    compared field by field once and get their hash recorded.
+    """
+    frame = frame.drop_duplicates("name", keep="last")
+    if frame.empty:
+        # An empty or unreadable sheet would otherwise wipe the catalog
+        raise ValueError("source has no items; refusing to delete every row")
+    frame = _with_hashes(frame)
+
+    existing = pd.read_sql_query(
+        f"SELECT {', '.join(COLUMNS)}, content_hash FROM items", conn
+    )
+    merged = frame.merge(existing, on="name", how="left",
+                         suffixes=("", "_db"), indicator=True)
+    is_new = (merged["_merge"] == "left_only").to_numpy()
+
+    stored = merged["content_hash_db"]
+    same = (stored == merged["content_hash"]).to_numpy()
+    unhashed = (stored.isna().to_numpy() & ~is_new)
+    if unhashed.any():
+        equal = pd.Series(True, index=merged.index)
+        for column in VALUE_COLUMNS:
+            equal &= merged[column] == merged[f"{column}_db"]
+        backfill = unhashed & equal.to_numpy()
+        same = same | backfill
+    else:
+        backfill = unhashed
+
+    added = merged[is_new]
+    changed = merged[~is_new & ~same]
+    removed = existing.loc[~existing["name"].isin(frame["name"]), "name"].tolist()
+
+    touched = len(added) + len(changed) + len(removed)
+    if touched or backfill.any():
+        bulk = touched > BULK_SHARE * max(len(existing), len(frame))
+        with (bulk_write(conn) if bulk else conn):
+            conn.executemany(DELETE_SQL, [(name,) for name in removed])
+            conn.executemany(INSERT_SQL, _rows(added, COLUMNS + ["content_hash"]))
+            conn.executemany(UPDATE_SQL, _rows(changed,
+                                               VALUE_COLUMNS + ["content_hash", "name"]))
+            conn.executemany(HASH_SQL, _rows(merged[backfill], ["content_hash", "name"]))
+
+    return {
+        "added": added["name"].tolist(),
+        "changed": changed["name"].tolist(),
+        "removed": removed,
+        "unchanged": len(frame) - len(added) - len(changed),
+    }
+
+
+def sync_sheet(conn: sqlite3.Connection, source: Path = XLSX_PATH) -> Dict[str, List[str]]:
+    return sync_frame(conn, normalize_frame(pd.read_excel(source)))
+
+
+# -- streaming import ------------------------------------------------------
+
+def _header(cells) -> List[str]:
+    return [str(c).strip().lower() for c in cells]
+
+
+def read_xlsx(path: Path) -> Iterator[dict]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+        for row in rows:
+            yield dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def read_csv(path: Path) -> Iterator[dict]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = csv.reader(f)
+        header = _header(next(rows, ()))
+        for row in rows:
+            yield dict(zip(header, row))
+
+
+def read_jsonl(path: Path) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield {str(k).strip().lower(): v for k, v in json.loads(line).items()}
+
+
+READERS = {".xlsx": read_xlsx, ".csv": read_csv, ".jsonl": read_jsonl}
+
+
+def read_records(source: Path) -> Iterator[dict]:
+    reader = READERS.get(source.suffix.lower())
+    if reader is None:
+        raise ValueError(f"Unsupported source type: {source.suffix} "
+                         f"(expected one of {', '.join(READERS)})")
+    return reader(source)
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == "" or (isinstance(value, float) and math.isnan(value))
+
+
+def _cell(record: dict, column: str) -> str:
+    # Same rules as normalize_frame: absent column -> '', empty cell -> 'nan'
+    if column not in record:
+        return ""
+    value = record[column]
+    return "nan" if _is_empty(value) else str(value).strip()
+
+
+def normalize_record(record: dict) -> Optional[Tuple]:
+    """One source row -> a ``COLUMNS`` tuple, or None when it has no item name."""
+    name = record.get("item_name")
+    if _is_empty(name):
+        return None
+    return (
+        str(name).strip(),
+        _cell(record, "category").lower(),
+        _cell(record, "subcategories").lower(),
+        _cell(record, "rarity").lower(),
+        1 if _cell(record, "voi").lower() in TRUE_VALUES else 0,
+        _cell(record, "notes"),
+    )
+
+
+def write_batch(conn: sqlite3.Connection, batch: List[Tuple],
+                update: bool = True, first_id: Optional[int] = None) -> Tuple[int, int]:
+    """Upsert normalized rows (no commit); returns (inserted, updated).
+
+    Later rows for the same name win, within a batch and across batches,
+    as in ``import_frame``. Without ``update`` only rows this import wrote
+    itself (ids from ``first_id`` on) are overwritten.
+    """
+    pending = {row[0]: row for row in batch}
+    names = list(pending)
+
+    existing = {}
+    for i in range(0, len(names), LOOKUP_CHUNK):
+        chunk = names[i:i + LOOKUP_CHUNK]
+        existing.update(
+            (row[1], (row[0], row[1:])) for row in conn.execute(
+                f"SELECT id, {', '.join(COLUMNS)} FROM items "
+                f"WHERE name IN ({', '.join('?' * len(chunk))})", chunk)
+        )
+
+    new_rows = [row + (content_hash(row[1:]),)
+                for name, row in pending.items() if name not in existing]
+    changed_rows = [
+        row[1:] + (content_hash(row[1:]), name)
+        for name, row in pending.items()
+        if name in existing and existing[name][1] != row
+        and (update or (first_id is not None and existing[name][0] >= first_id))
+    ]
+
+    conn.executemany(INSERT_SQL, new_rows)
+    conn.executemany(UPDATE_SQL, changed_rows)
+    return len(new_rows), len(changed_rows)
+
+
+def _fingerprint(source: Path) -> str:
+    stat = source.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def stream_import(conn: sqlite3.Connection, source: Path,
+                  batch_size: int = DEFAULT_BATCH_SIZE, update: bool = True,
+                  restart: bool = False) -> Dict[str, int]:
+    """Import ``source`` row by row, committing every ``batch_size`` rows.
+
+    Each batch commits together with the number of source rows consumed so
+    far. Running again on the same, unmodified file skips those rows and
+    continues; ``restart`` discards saved progress.
+
+    Loading into an empty table skips the per-row triggers, as
+    ``bulk_write`` does: they are suspended before the first batch and the
+    search index, tags and ordering indexes are built once after the last.
+    Until an interrupted load of this kind is resumed to the end, searches
+    miss the rows it already wrote.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS import_state (
+            source TEXT PRIMARY KEY,
+            fingerprint TEXT,
+            rows_done INTEGER,
+            bulk INTEGER NOT NULL DEFAULT 0,
+            first_id INTEGER
+        )
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(import_state)")}
+    if "bulk" not in columns:
+        conn.execute("ALTER TABLE import_state ADD COLUMN bulk INTEGER NOT NULL DEFAULT 0")
+    if "first_id" not in columns:
+        conn.execute("ALTER TABLE import_state ADD COLUMN first_id INTEGER")
+    key = str(source.resolve())
+    fingerprint = _fingerprint(source)
+
+    resume_from = 0
+    state = conn.execute(
+        "SELECT fingerprint, rows_done, bulk, first_id FROM import_state WHERE source = ?",
+        (key,)
+    ).fetchone()
+    # Ids are never reused (AUTOINCREMENT), so rows from the first id this
+    # import could hand out on are its own: later duplicates replace them
+    # even with update off
+    first_id = conn.execute(
+        "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'items'), 0) + 1"
+    ).fetchone()[0]
+    if state and state[0] == fingerprint and not restart:
+        resume_from = state[1]
+        first_id = state[3]
+    # An abandoned bulk load left the triggers suspended; finish it the same way
+    bulk = bool(state and state[2]) or conn.execute(
+        "SELECT NOT EXISTS (SELECT 1 FROM items)").fetchone()[0] == 1
+    conn.commit()
+    if bulk:
+        with _transaction(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO import_state "
+                "(source, fingerprint, rows_done, bulk, first_id) VALUES (?, ?, ?, 1, ?)",
+                (key, fingerprint, resume_from, first_id))
+            suspend_upkeep(conn)
+
+    counts = {"inserted": 0, "updated": 0, "skipped": 0, "resumed_from": resume_from}
+    rows_done = 0
+    batch: List[Tuple] = []
+    batch_rows = 0
+
+    def flush():
+        nonlocal batch, batch_rows
+        with conn:
+            inserted, updated = write_batch(conn, batch, update, first_id)
+            conn.execute(
+                "INSERT OR REPLACE INTO import_state "
+                "(source, fingerprint, rows_done, bulk, first_id) VALUES (?, ?, ?, ?, ?)",
+                (key, fingerprint, rows_done, int(bulk), first_id))
+        counts["inserted"] += inserted
+        counts["updated"] += updated
+        counts["skipped"] += batch_rows - inserted - updated
+        batch = []
+        batch_rows = 0
+
+    for record in read_records(source):
+        rows_done += 1
+        if rows_done <= resume_from:
+            continue
+        batch_rows += 1
+        row = normalize_record(record)
+        if row is not None:
+            batch.append(row)
+        if batch_rows >= batch_size:
+            flush()
+    if batch_rows:
+        flush()
+
+    with _transaction(conn):
+        if bulk:
+            restore_upkeep(conn)
+        conn.execute("DELETE FROM import_state WHERE source = ?", (key,))
+    return counts
 
-df.columns = [c.strip().lower() for c in df.columns]
 
-conn = sqlite3.connect(DB_PATH)
-cur = conn.cursor()
+@contextmanager
+def _transaction(conn: sqlite3.Connection) -> Iterator[None]:
+    """An explicit transaction; the sqlite3 module would otherwise run DDL
+    (the trigger and index changes) outside any."""
+    conn.execute("BEGIN")
+    try:
+        yield
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
 
-inserted = 0
 
-for _, row in df.iterrows():
-    name = row.get("item_name")
+def main():
+    parser = argparse.ArgumentParser(description="Import items into the item DB")
+    parser.add_argument("--source", type=Path, default=XLSX_PATH)
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--insert-only", action="store_true",
+                        help="leave existing items untouched instead of updating them")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--stream", action="store_true",
+                      help="read the source row by row and commit in batches")
+    mode.add_argument("--sync", action="store_true",
+                      help="mirror the sheet, writing only added, changed and removed rows")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore progress saved by an interrupted --stream import")
+    args = parser.parse_args()
+    if args.sync and args.insert_only:
+        parser.error("--sync cannot be combined with --insert-only")
 
-    if pd.isna(name):
-        continue
+    conn = sqlite3.connect(args.db)
+    init_db(conn)
 
-    voi_raw = str(row.get("voi", "")).strip().lower()
-    voi = 1 if voi_raw in ["yes", "true", "1"] else 0
+    start = time.perf_counter()
+    if args.sync:
+        diff = sync_sheet(conn, args.source)
+        prune_change_log(conn)
+        analyze(conn)
+        conn.close()
+        print(f"Synced in {time.perf_counter() - start:.2f}s: {len(diff['added'])} added, "
+              f"{len(diff['changed'])} changed, {len(diff['removed'])} removed, "
+              f"{diff['unchanged']} unchanged")
+        for kind, mark in (("added", "+"), ("changed", "~"), ("removed", "-")):
+            names = diff[kind]
+            for name in names[:SUMMARY_NAMES]:
+                print(f"  {mark} {name}")
+            if len(names) > SUMMARY_NAMES:
+                print(f"  {mark} ... and {len(names) - SUMMARY_NAMES} more")
+        return
 
-    cur.execute("""
-        INSERT OR IGNORE INTO items
-        (name, category, subcategories, rarity, voi, notes)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (
-        name.strip(),
-        str(row.get("category", "")).strip().lower(),
-        str(row.get("subcategories", "")).strip().lower(),
-        str(row.get("rarity", "")).strip().lower(),
-        voi,
-        str(row.get("notes", "")).strip()
-    ))
+    if args.stream:
+        counts = stream_import(conn, args.source, batch_size=args.batch_size,
+                               update=not args.insert_only, restart=args.restart)
+        if counts["resumed_from"]:
+            print(f"Resumed after {counts['resumed_from']} rows")
+    else:
+        counts = import_sheet(conn, args.source, update=not args.insert_only)
+    prune_change_log(conn)
+    analyze(conn)
+    conn.close()
 
-    if cur.rowcount > 0:
-        inserted += 1
+    print(f"Imported {counts['inserted']} items, updated {counts['updated']}, "
+          f"skipped {counts['skipped']} in {time.perf_counter() - start:.2f}s")
 
-conn.commit()
-conn.close()
 
-print(f"Imported {inserted} items successfully")
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,429 @@
 import sqlite3
+import string
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator, List, Optional
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
 
 DB_PATH = DATA_DIR / "items.db"
 
-conn = sqlite3.connect(DB_PATH)
-cur = conn.cursor()
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS items (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT UNIQUE,
-    category TEXT,
-    subcategories TEXT,
-    rarity TEXT,
-    voi INTEGER,
-    notes TEXT
-)
-""")
-
-conn.commit()
-conn.close()
-
-print(f"Database initialized at:\n{DB_PATH}")
+# Result order of a rarity (the bot lists relics first); stored in the
+# virtual column items.rarity_rank so indexes can hold it
+RARITY_RANK_SQL = """CASE rarity
+            WHEN 'relic' THEN 1
+            WHEN 'legendary' THEN 2
+            WHEN 'named' THEN 3
+            WHEN 'hallowtide' THEN 4
+            WHEN 'normal' THEN 5
+            ELSE 6
+        END"""
+
+# Every listing is ordered by (rarity_rank, name). With these, a VOI or
+# rarity filter (and the unfiltered listing) walks an index in result
+# order and stops at the LIMIT instead of sorting every match. The
+# trailing columns make them covering: a scan that has to test most rows
+# (a short LIKE term) never touches the table.
+ORDER_INDEXES = [
+    ("items_rank", "rarity_rank, name, category, subcategories, rarity, voi"),
+    ("items_voi_rank", "voi, rarity_rank, name, category, subcategories, rarity"),
+    # Rarity filters compare LOWER(rarity), so the index must hold it too
+    ("items_rarity_rank", "lower(rarity), rarity_rank, name, category, subcategories, voi"),
+]
+
+# Rows sampled per index by ANALYZE; plenty for the planner, and fast on
+# large catalogs
+ANALYSIS_LIMIT = 1000
+
+# Keep items_fts in step with items
+SYNC_TRIGGERS = [
+    ("items_fts_insert", """
+    CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts (rowid, name, category, subcategories)
+        VALUES (new.id, new.name, new.category, new.subcategories);
+    END
+    """),
+    ("items_fts_delete", """
+    CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts (items_fts, rowid, name, category, subcategories)
+        VALUES ('delete', old.id, old.name, old.category, old.subcategories);
+    END
+    """),
+    ("items_fts_update", """
+    CREATE TRIGGER IF NOT EXISTS items_fts_update
+    AFTER UPDATE OF name, category, subcategories ON items BEGIN
+        INSERT INTO items_fts (items_fts, rowid, name, category, subcategories)
+        VALUES ('delete', old.id, old.name, old.category, old.subcategories);
+        INSERT INTO items_fts (rowid, name, category, subcategories)
+        VALUES (new.id, new.name, new.category, new.subcategories);
+    END
+    """),
+]
+
+# Subcategory paths ("light/dagger/elemental") are also stored as tags,
+# one item_tags row per (tag, item), so tag filters are index lookups
+# rather than LIKE scans. Tags are split on '/' and ',', trimmed and
+# lower-cased by SQLite's lower(); split_tags does the same in Python.
+# The triggers are plain SQL, so hand edits from any SQLite client keep
+# the tags in step.
+TAG_SEPARATORS = "/,"
+_TAG_BLANKS = " \t\n\r"
+_TAG = "trim(value, ' ' || char(9, 10, 13))"
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def fold_tag(text: str) -> str:
+    """``text`` lower-cased the way SQLite's lower() does: ASCII letters only.
+
+    Tags and ``sub:`` values are compared in this form on both backends,
+    so "Épée" and "épée" are two tags there as here.
+    """
+    return text.translate(_ASCII_LOWER)
+
+
+def _tags_of(subcategories: str) -> str:
+    """SQL walking the tags of ``subcategories`` (each in json_each's ``value``).
+
+    json_quote escapes the text, so replacing each separator with '","'
+    turns it into a JSON array; unlike a recursive CTE this works inside
+    a trigger.
+    """
+    return (f"json_each('[' || replace(replace(json_quote(lower({subcategories})), "
+            f"',', '/'), '/', '\",\"') || ']')")
+
+
+_ADD_NEW_TAGS = f"""
+        INSERT OR IGNORE INTO tags (tag)
+        SELECT {_TAG} FROM {_tags_of("new.subcategories")} WHERE {_TAG} <> '';
+        INSERT OR IGNORE INTO item_tags (tag_id, item_id)
+        SELECT tags.id, new.id FROM {_tags_of("new.subcategories")}
+        JOIN tags ON tags.tag = {_TAG};"""
+
+# tags.item_count lets tag searches start from the rarest tag
+_COUNT_TAGS = """
+        UPDATE tags SET item_count = item_count {change}
+        WHERE id IN (SELECT tag_id FROM item_tags WHERE item_id = {row}.id);"""
+_DROP_OLD_TAGS = _COUNT_TAGS.format(change="- 1", row="old") + """
+        DELETE FROM item_tags WHERE item_id = old.id;"""
+_COUNT_NEW_TAGS = _COUNT_TAGS.format(change="+ 1", row="new")
+
+# Keep tags and item_tags in step with items
+TAG_TRIGGERS = [
+    ("item_tags_insert", f"""
+    CREATE TRIGGER IF NOT EXISTS item_tags_insert AFTER INSERT ON items BEGIN{
+        _ADD_NEW_TAGS}{_COUNT_NEW_TAGS}
+    END
+    """),
+    ("item_tags_delete", f"""
+    CREATE TRIGGER IF NOT EXISTS item_tags_delete AFTER DELETE ON items BEGIN{_DROP_OLD_TAGS}
+    END
+    """),
+    ("item_tags_update", f"""
+    CREATE TRIGGER IF NOT EXISTS item_tags_update
+    AFTER UPDATE OF subcategories ON items BEGIN{
+        _DROP_OLD_TAGS}{_ADD_NEW_TAGS}{_COUNT_NEW_TAGS}
+    END
+    """),
+]
+
+# Tags of every item at once, for a rebuild. Most items share a handful
+# of paths, so each distinct path is split once and its tags joined back
+# to the items; sorting by the key makes the inserts appends.
+REBUILD_TAGS = [
+    f"""INSERT OR IGNORE INTO tags (tag)
+    SELECT {_TAG} FROM (SELECT DISTINCT subcategories FROM items),
+        {_tags_of("subcategories")}
+    WHERE {_TAG} <> ''""",
+    f"""INSERT OR IGNORE INTO item_tags (tag_id, item_id)
+    WITH path_tags AS (
+        SELECT paths.subcategories, tags.id AS tag_id
+        FROM (SELECT DISTINCT subcategories FROM items) AS paths,
+            {_tags_of("paths.subcategories")}
+        JOIN tags ON tags.tag = {_TAG}
+    )
+    SELECT path_tags.tag_id, items.id
+    FROM path_tags JOIN items ON items.subcategories = path_tags.subcategories
+    ORDER BY path_tags.tag_id, items.id""",
+    "UPDATE tags SET item_count = (SELECT COUNT(*) FROM item_tags WHERE tag_id = tags.id)",
+]
+
+# item_tags' primary key serves lookups by tag; this one serves the
+# triggers' lookups by item and checking an item for a tag
+TAG_ITEM_INDEX = ("item_tags_item", "item_id")
+
+
+def split_tags(subcategories: Optional[str]) -> List[str]:
+    """The tags of a subcategory path, as stored in ``tags``."""
+    if not subcategories:
+        return []
+    text = fold_tag(subcategories)
+    for separator in TAG_SEPARATORS[1:]:
+        text = text.replace(separator, TAG_SEPARATORS[0])
+    tags = (tag.strip(_TAG_BLANKS) for tag in text.split(TAG_SEPARATORS[0]))
+    return [tag for tag in tags if tag]
+
+
+# Columns whose changes matter to readers; rewriting content_hash alone
+# leaves the search index and data version untouched
+CONTENT_COLUMNS = "name, category, subcategories, rarity, voi, notes"
+
+# Bump meta.data_version on every change to items and log the affected
+# names under the new version, so readers can refresh just those rows
+_LOG_CHANGE = """
+        INSERT INTO item_changes (version, name)
+        SELECT value, {row}.name FROM meta WHERE key = 'data_version';"""
+
+# A row edited without a new content hash (by hand, say) loses its hash,
+# so the next sync compares it field by field instead of trusting it
+_STALE_HASH = """
+        UPDATE items SET content_hash = NULL
+        WHERE id = new.id AND new.content_hash IS old.content_hash;"""
+
+VERSION_TRIGGERS = [
+    (f"items_version_{event.split()[0].lower()}", f"""
+    CREATE TRIGGER IF NOT EXISTS items_version_{event.split()[0].lower()}
+    AFTER {event} ON items BEGIN
+        UPDATE meta SET value = value + 1 WHERE key = 'data_version';{log}
+    END
+    """)
+    for event, log in (
+        ("INSERT", _LOG_CHANGE.format(row="new")),
+        (f"UPDATE OF {CONTENT_COLUMNS}",
+         _LOG_CHANGE.format(row="old") + _LOG_CHANGE.format(row="new") + _STALE_HASH),
+        ("DELETE", _LOG_CHANGE.format(row="old")),
+    )
+]
+
+# Change log entries kept, counted in data versions; a reader further
+# behind than this reloads everything
+CHANGE_LOG_KEEP = 100_000
+
+
+def init_db(conn: sqlite3.Connection) -> None:
+    """Create the item schema on an open connection (safe to run repeatedly)."""
+    cur = conn.cursor()
+
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE,
+        category TEXT,
+        subcategories TEXT,
+        rarity TEXT,
+        voi INTEGER,
+        notes TEXT,
+        content_hash TEXT,
+        rarity_rank INTEGER GENERATED ALWAYS AS ({RARITY_RANK_SQL}) VIRTUAL
+    )
+    """)
+
+    # table_xinfo also lists generated columns
+    columns = {row[1] for row in cur.execute("PRAGMA table_xinfo(items)")}
+    if "content_hash" not in columns:
+        cur.execute("ALTER TABLE items ADD COLUMN content_hash TEXT")
+    if "rarity_rank" not in columns:
+        cur.execute(f"ALTER TABLE items ADD COLUMN rarity_rank INTEGER "
+                    f"GENERATED ALWAYS AS ({RARITY_RANK_SQL}) VIRTUAL")
+
+    has_indexes = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+        (ORDER_INDEXES[0][0],)
+    ).fetchone()
+    for index_name, index_columns in ORDER_INDEXES:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON items ({index_columns})")
+
+    # Trigram full-text index over the searchable columns. It stores no
+    # copy of the text (content='items') and answers substring matches
+    # that a LIKE '%term%' could only find with a full scan.
+    has_fts = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items_fts'"
+    ).fetchone()
+
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+        name, category, subcategories,
+        content='items', content_rowid='id', tokenize='trigram'
+    )
+    """)
+
+    if not has_fts:
+        # Index rows that were imported before the FTS table existed
+        cur.execute("INSERT INTO items_fts (items_fts) VALUES ('rebuild')")
+
+    has_tags = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'item_tags'"
+    ).fetchone()
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS tags (
+        id INTEGER PRIMARY KEY,
+        tag TEXT NOT NULL UNIQUE,
+        item_count INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    # Keyed by tag first: the items with a tag are one range of the key,
+    # already in id order for intersecting with another tag's
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS item_tags (
+        tag_id INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        PRIMARY KEY (tag_id, item_id)
+    ) WITHOUT ROWID
+    """)
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {TAG_ITEM_INDEX[0]} "
+                f"ON item_tags ({TAG_ITEM_INDEX[1]})")
+
+    # Triggers that called a Python fold_tag() function folded every
+    # letter, not just ASCII
+    old_trigger = cur.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+        (TAG_TRIGGERS[0][0],)
+    ).fetchone()
+    if not has_tags or (old_trigger and "fold_tag(" in old_trigger[0]):
+        # Tag rows that were imported before the tag tables existed, or
+        # folded the old way
+        rebuild_tags(conn)
+
+    # Bumped on every change to items, so the bot can tell when its
+    # in-memory index and result cache are stale
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER
+    )
+    """)
+    cur.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)")
+
+    # Names touched by each data version (NULL: everything, after a bulk write)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS item_changes (
+        version INTEGER NOT NULL,
+        name TEXT
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS item_changes_version ON item_changes (version)")
+
+    # Recreated every time so databases made by older versions pick up
+    # trigger changes
+    for name, trigger_sql in SYNC_TRIGGERS + TAG_TRIGGERS + VERSION_TRIGGERS:
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cur.execute(trigger_sql)
+
+    conn.commit()
+
+    if not has_indexes or not has_tags:
+        analyze(conn)
+
+    # Readers keep running while an import writes (must be outside a transaction)
+    cur.execute("PRAGMA journal_mode=WAL")
+
+
+# Tables the bot reads besides items
+READER_TABLES = ("items_fts", "tags", "item_tags", "meta", "item_changes")
+
+
+def missing_schema(conn: sqlite3.Connection) -> List[str]:
+    """Schema objects the bot reads that ``conn``'s database lacks."""
+    tables = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "items" not in tables:
+        return ["items"]
+    missing = [table for table in READER_TABLES if table not in tables]
+    columns = {row[1] for row in conn.execute("PRAGMA table_xinfo(items)")}
+    if "rarity_rank" not in columns:
+        missing.append("items.rarity_rank")
+    return missing
+
+
+def analyze(conn: sqlite3.Connection) -> None:
+    """Refresh planner statistics for items.
+
+    Without them SQLite guesses that a rarity or VOI filter is selective
+    and walks its ordered index even when a full-text match would narrow
+    the rows far more.
+    """
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    conn.execute("ANALYZE items")
+    conn.execute("ANALYZE item_tags")
+    conn.commit()
+
+
+def rebuild_tags(conn: sqlite3.Connection) -> None:
+    """Refill tags and item_tags from every item's subcategories (no commit)."""
+    conn.execute("DELETE FROM item_tags")
+    # Tags no item uses any more go too
+    conn.execute("DELETE FROM tags")
+    for statement in REBUILD_TAGS:
+        conn.execute(statement)
+
+
+def suspend_upkeep(conn: sqlite3.Connection) -> None:
+    """Drop the per-row triggers and the ordering indexes (no commit).
+
+    Until ``restore_upkeep`` runs, writes to items leave items_fts, the tag
+    tables and the data version untouched.
+    """
+    for name, _ in SYNC_TRIGGERS + TAG_TRIGGERS + VERSION_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for name, _ in ORDER_INDEXES + [TAG_ITEM_INDEX]:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def restore_upkeep(conn: sqlite3.Connection) -> None:
+    """Rebuild what ``suspend_upkeep`` dropped and bump the data version
+    once, logged as a change to every row (no commit)."""
+    # FTS first: rebuilding it after the indexes runs several times slower
+    conn.execute("INSERT INTO items_fts (items_fts) VALUES ('rebuild')")
+    for name, columns in ORDER_INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON items ({columns})")
+    rebuild_tags(conn)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {TAG_ITEM_INDEX[0]} "
+                 f"ON item_tags ({TAG_ITEM_INDEX[1]})")
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+    conn.execute("INSERT INTO item_changes (version, name) "
+                 "SELECT value, NULL FROM meta WHERE key = 'data_version'")
+    for name, trigger_sql in SYNC_TRIGGERS + TAG_TRIGGERS + VERSION_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(trigger_sql)
+
+
+@contextmanager
+def bulk_write(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """One transaction for a large write, with the per-row triggers suspended.
+
+    Keeping items_fts, the tag tables and the ordering indexes in step row
+    by row costs far more than building them once, so the indexes, sync,
+    tag and version triggers are dropped for the duration, then everything
+    is rebuilt and the data version bumped a single time (logged as a
+    change to every row). The trigger changes are part of the transaction
+    and roll back with it.
+    """
+    conn.commit()
+    conn.execute("BEGIN")
+    try:
+        suspend_upkeep(conn)
+        yield conn
+        restore_upkeep(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def prune_change_log(conn: sqlite3.Connection, keep: int = CHANGE_LOG_KEEP) -> None:
+    """Drop change log entries more than ``keep`` data versions old."""
+    with conn:
+        conn.execute(
+            "DELETE FROM item_changes WHERE version <= "
+            "(SELECT value FROM meta WHERE key = 'data_version') - ?", (keep,))
+
+
+if __name__ == "__main__":
+    DATA_DIR.mkdir(exist_ok=True)
+
+    conn = sqlite3.connect(DB_PATH)
+    init_db(conn)
+    conn.close()
+
+    print(f"Database initialized at:\n{DB_PATH}")
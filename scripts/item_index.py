@@ -0,0 +1,549 @@
+"""In-memory item index answering ``Sitem`` searches without touching SQLite.
+
+The catalog is loaded once in result order (rarity rank, then name), so a
+row's position doubles as its sort key: every search walks the posting
+list of its most selective predicate in ascending order, checks the other
+predicates per row, and stops after the first 30 hits. Matching keeps the
+SQL semantics exactly: a term matches when it is a case-insensitive
+substring of a column, and a ``sub:`` filter when the row's subcategory
+tags include it whole.
+
+After an incremental import the index is patched rather than rebuilt
+(``with_changes``): changed rows are masked out of the base arrays and
+their current versions live in a small sorted overlay that every search
+merges in. Once the overlay grows past a few percent of the catalog the
+index reports itself ``stale`` and is reloaded from scratch.
+"""
+import bisect
+import copy
+import heapq
+import random
+import sys
+from array import array
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from scripts.db import LOOKUP_CHUNK, connection
+from scripts.init_db import fold_tag, split_tags
+from scripts.query import MATCH, TAGGED, Plan
+
+RESULT_LIMIT = 30
+GRAM = 3
+NO_VALUE = -1
+
+# Row tuple positions
+FIELDS = {"name": 0, "category": 1, "subcategories": 2, "rarity": 3, "voi": 4}
+
+# Same order as RARITY_RANK_SQL (scripts/init_db.py)
+RARITY_RANK = {"relic": 1, "legendary": 2, "named": 3, "hallowtide": 4, "normal": 5}
+OTHER_RANK = 6
+
+# Overlay size (masked + patched rows) past which a full reload is cheaper
+STALE_ROWS = 1000
+STALE_SHARE = 0.05
+
+LOAD_SQL = """
+    SELECT name, category, subcategories, rarity, voi
+    FROM items
+    {where}
+    ORDER BY rarity_rank, name
+"""
+
+
+def sort_key(row: Tuple) -> Tuple:
+    """Result order of a row, matching LOAD_SQL (NULL names sort first)."""
+    name = row[0]
+    return RARITY_RANK.get(row[3], OTHER_RANK), name is not None, name or ""
+
+
+def page_cursor(row: Tuple) -> Tuple[int, str]:
+    """Keyset cursor after ``row``: its ``(rarity_rank, name)``."""
+    return RARITY_RANK.get(row[3], OTHER_RANK), row[0]
+
+
+def _intern_row(row: Tuple) -> Tuple:
+    intern = sys.intern
+    name, cat, sub, rarity, voi = row
+    return (name, intern(cat) if cat else cat, intern(sub) if sub else sub,
+            intern(rarity) if rarity else rarity, voi)
+
+
+def _grams(text: str) -> Set[str]:
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class Bitmap:
+    """Fixed-size bit set over row positions."""
+
+    __slots__ = ("bits",)
+
+    def __init__(self, size: int, positions: Iterable[int] = ()):
+        self.bits = bytearray((size + 7) >> 3)
+        for pos in positions:
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, pos: int) -> bool:
+        return bool(self.bits[pos >> 3] & (1 << (pos & 7)))
+
+
+class ColumnIndex:
+    """Substring lookup over one text column.
+
+    Trigram postings point at *distinct* values, lower-cased by ``fold``, so
+    repetitive columns (category, subcategories) index a few hundred strings
+    rather than every row. ``codes`` maps each row to its value id, which makes
+    "does row N match" a set membership test.
+    """
+
+    __slots__ = ("values", "grams", "rows", "codes", "unique")
+
+    def __init__(self, column: Sequence[Optional[str]], unique: bool = False,
+                 fold: Callable[[str], str] = str.lower):
+        value_ids: Dict[str, int] = {}
+        rows: List[array] = []
+        codes = array("i")
+        for pos, value in enumerate(column):
+            if value is None:
+                # NULL never matches LIKE, so it never enters the index
+                codes.append(NO_VALUE)
+                continue
+            key = fold(value)
+            vid = value_ids.get(key)
+            if vid is None:
+                vid = value_ids[key] = len(value_ids)
+                rows.append(array("I"))
+            rows[vid].append(pos)
+            codes.append(vid)
+
+        self.values = list(value_ids)
+        self.codes = codes
+        self.unique = unique and all(len(r) == 1 for r in rows)
+        # For a unique column each value maps to exactly one row, and value
+        # ids are handed out in row order
+        self.rows = array("I", (r[0] for r in rows)) if self.unique else rows
+
+        grams: Dict[str, array] = {}
+        for vid, value in enumerate(self.values):
+            for gram in _grams(value):
+                postings = grams.get(gram)
+                if postings is None:
+                    postings = grams[gram] = array("I")
+                postings.append(vid)
+        self.grams = grams
+
+    def _rarest_postings(self, term: str) -> Optional[Sequence[int]]:
+        """Value ids sharing the term's rarest trigram (``None`` for short terms)."""
+        if len(term) < GRAM:
+            return None
+        postings = [self.grams.get(gram) for gram in _grams(term)]
+        if any(p is None for p in postings):
+            return ()
+        return min(postings, key=len)
+
+    def estimate(self, term: str) -> int:
+        """Cheap upper bound on the number of values containing ``term``."""
+        rarest = self._rarest_postings(term.lower())
+        return len(self.values) if rarest is None else len(rarest)
+
+    def iter_value_ids(self, term: str) -> Iterable[int]:
+        """Ids of the values containing ``term``, ascending and lazily checked."""
+        term = term.lower()
+        values = self.values
+        rarest = self._rarest_postings(term)
+        if rarest is None:
+            return (vid for vid, value in enumerate(values) if term in value)
+        if len(term) == GRAM:
+            return rarest
+        return (vid for vid in rarest if term in values[vid])
+
+    def value_ids(self, term: str) -> List[int]:
+        """Ascending ids of the values containing ``term``."""
+        return list(self.iter_value_ids(term))
+
+    def count(self, vids: Sequence[int]) -> int:
+        if self.unique:
+            return len(vids)
+        rows = self.rows
+        return sum(len(rows[vid]) for vid in vids)
+
+    def positions(self, vids: Iterable[int], start: int = 0) -> Iterable[int]:
+        """Ascending row positions from ``start`` holding any of the ascending ``vids``."""
+        rows = self.rows
+        if self.unique:
+            return (pos for pos in (rows[vid] for vid in vids) if pos >= start)
+        streams = [rows[vid] for vid in vids]
+        if start:
+            streams = [stream[bisect.bisect_left(stream, start):] for stream in streams]
+        if len(streams) == 1:
+            return streams[0]
+        return heapq.merge(*streams)
+
+
+class TermMatch:
+    """Rows where any of several terms occurs in any of several columns.
+
+    Repetitive columns resolve the terms to a (small) set of value ids up
+    front. The unique name column only estimates its match count: value ids
+    are resolved if this predicate ends up driving the scan, otherwise rows
+    are checked with a direct substring test.
+    """
+
+    __slots__ = ("terms", "columns", "fields", "value_sets", "estimate")
+
+    def __init__(self, index: "ItemIndex", terms: Sequence[str],
+                 columns: Sequence[str]):
+        self.terms = [term.lower() for term in terms]
+        self.columns = [index.columns[column] for column in columns]
+        self.fields = [FIELDS[column] for column in columns]
+        self.value_sets: List[Optional[Set[int]]] = []
+        # Upper bound: a row matching several columns is counted once per column
+        self.estimate = 0
+        for col in self.columns:
+            if col.unique:
+                self.value_sets.append(None)
+                self.estimate += sum(col.estimate(term) for term in self.terms)
+            else:
+                vids: Set[int] = set()
+                for term in self.terms:
+                    vids.update(col.value_ids(term))
+                self.value_sets.append(vids)
+                self.estimate += col.count(vids)
+
+    def positions(self, start: int = 0) -> Iterator[int]:
+        streams = []
+        for col, vids in zip(self.columns, self.value_sets):
+            if vids is None:
+                # Unique column: value ids ascend with row order, so the
+                # candidates can be checked lazily and the scan can stop early
+                streams.extend(col.positions(col.iter_value_ids(term), start)
+                               for term in self.terms)
+            elif vids:
+                streams.append(col.positions(sorted(vids), start))
+        if not streams:
+            return
+        merged = streams[0] if len(streams) == 1 else heapq.merge(*streams)
+        last = NO_VALUE
+        for pos in merged:
+            if pos != last:
+                last = pos
+                yield pos
+
+    def __contains__(self, pos: int) -> bool:
+        for col, vids in zip(self.columns, self.value_sets):
+            code = col.codes[pos]
+            if code == NO_VALUE:
+                continue
+            if vids is None:
+                value = col.values[code]
+                for term in self.terms:
+                    if term in value:
+                        return True
+            elif code in vids:
+                return True
+        return False
+
+    def matches(self, row: Tuple) -> bool:
+        """The same test against a row tuple (for overlay rows)."""
+        for field in self.fields:
+            value = row[field]
+            if value is not None:
+                value = value.lower()
+                for term in self.terms:
+                    if term in value:
+                        return True
+        return False
+
+
+class TagMatch:
+    """Rows whose subcategory tags include all (``every``) or any of ``tags``.
+
+    Resolved against the distinct subcategory values, like ``TermMatch``:
+    a row matches when its value's tag set does.
+    """
+
+    __slots__ = ("tags", "every", "column", "vids", "estimate")
+
+    def __init__(self, index: "ItemIndex", tags: Sequence[str], every: bool):
+        self.tags = list(tags)
+        self.every = every
+        self.column = index.tag_column
+        sets = [index.tags.get(tag, set()) for tag in self.tags]
+        if not sets:
+            self.vids: Set[int] = set()
+        elif every:
+            self.vids = set.intersection(*sets)
+        else:
+            self.vids = set().union(*sets)
+        self.estimate = self.column.count(self.vids)
+
+    def positions(self, start: int = 0) -> Iterable[int]:
+        return self.column.positions(sorted(self.vids), start)
+
+    def __contains__(self, pos: int) -> bool:
+        return self.column.codes[pos] in self.vids
+
+    def matches(self, row: Tuple) -> bool:
+        if not self.tags:
+            return False
+        tags = set(split_tags(row[FIELDS["subcategories"]]))
+        test = all if self.every else any
+        return test(tag in tags for tag in self.tags)
+
+
+class RowSet:
+    """A precomputed set of rows (one rarity, one VOI flag).
+
+    ``field`` and ``value`` say what the rows share, for testing overlay rows.
+    """
+
+    __slots__ = ("rows", "bitmap", "estimate", "field", "value")
+
+    def __init__(self, size: int, rows: Sequence[int], field: int, value):
+        self.rows = rows
+        self.bitmap = Bitmap(size, rows)
+        self.estimate = len(rows)
+        self.field = field
+        self.value = value
+
+    def positions(self, start: int = 0) -> Iterable[int]:
+        if not start:
+            return self.rows
+        return self.rows[bisect.bisect_left(self.rows, start):]
+
+    def __contains__(self, pos: int) -> bool:
+        return pos in self.bitmap
+
+    def matches(self, row: Tuple) -> bool:
+        value = row[self.field]
+        if isinstance(value, str):
+            value = value.lower()
+        return value == self.value
+
+
+class ItemIndex:
+    """Column arrays plus per-column substring indexes and rarity/VOI bitmaps.
+
+    Executes compiled query plans (:mod:`scripts.query`) like the SQL
+    backend in :mod:`scripts.search`, returning identical rows.
+    """
+
+    __slots__ = ("rows", "columns", "tag_column", "tags", "rarities", "voi", "masked",
+                 "overlay")
+
+    def __init__(self, rows: Sequence[Tuple]):
+        # Category, subcategory and rarity strings repeat on most rows;
+        # interning keeps one copy of each.
+        self.rows = [_intern_row(row) for row in rows]
+        size = len(self.rows)
+        # Base positions replaced since the load, and their replacements
+        # (plus new rows) in result order
+        self.masked: Set[int] = set()
+        self.overlay: List[Tuple] = []
+
+        self.columns = {
+            "name": ColumnIndex([row[0] for row in self.rows], unique=True),
+            "category": ColumnIndex([row[1] for row in self.rows]),
+            "subcategories": ColumnIndex([row[2] for row in self.rows]),
+        }
+        # Tags fold only ASCII letters, like SQLite's lower(), so they are
+        # resolved against subcategory values folded the same way
+        self.tag_column = ColumnIndex([row[2] for row in self.rows], fold=fold_tag)
+        # Tag -> ids of the tag_column values holding it
+        self.tags: Dict[str, Set[int]] = {}
+        for vid, value in enumerate(self.tag_column.values):
+            for tag in split_tags(value):
+                self.tags.setdefault(tag, set()).add(vid)
+
+        by_rarity: Dict[str, array] = {}
+        by_voi: Dict[int, array] = {0: array("I"), 1: array("I")}
+        for pos, row in enumerate(self.rows):
+            if row[3] is not None:
+                by_rarity.setdefault(row[3].lower(), array("I")).append(pos)
+            if row[4] in by_voi:
+                by_voi[row[4]].append(pos)
+        rarity_field, voi_field = FIELDS["rarity"], FIELDS["voi"]
+        self.rarities = {r: RowSet(size, p, rarity_field, r) for r, p in by_rarity.items()}
+        self.voi = {flag: RowSet(size, p, voi_field, flag) for flag, p in by_voi.items()}
+
+    @classmethod
+    def load(cls) -> "ItemIndex":
+        with connection() as conn:
+            return cls(conn.execute(LOAD_SQL.format(where="")).fetchall())
+
+    def __len__(self) -> int:
+        return len(self.rows) - len(self.masked) + len(self.overlay)
+
+    def live_rows(self) -> Iterator[Tuple]:
+        """Every current row, patches applied (not in result order)."""
+        masked = self.masked
+        if masked:
+            yield from (row for pos, row in enumerate(self.rows) if pos not in masked)
+        else:
+            yield from self.rows
+        yield from self.overlay
+
+    # -- incremental updates ----------------------------------------------
+
+    def _base_position(self, name: str) -> Optional[int]:
+        col = self.columns["name"]
+        key = name.lower()
+        for vid in col.iter_value_ids(key):
+            if col.values[vid] == key:
+                positions = (col.rows[vid],) if col.unique else col.rows[vid]
+                for pos in positions:
+                    if self.rows[pos][0] == name:
+                        return pos
+        return None
+
+    def with_changes(self, names: Iterable[str], rows: Iterable[Tuple]) -> "ItemIndex":
+        """A copy with ``names`` replaced by ``rows`` (their current state).
+
+        Names without a row were deleted. The base arrays are shared, not
+        copied, so this costs time proportional to the change only; the
+        original keeps serving searches unchanged meanwhile.
+        """
+        names = set(names)
+        patched = copy.copy(self)
+        patched.masked = set(self.masked)
+        for name in names:
+            pos = self._base_position(name)
+            if pos is not None:
+                patched.masked.add(pos)
+        patched.overlay = [row for row in self.overlay if row[0] not in names]
+        patched.overlay.extend(_intern_row(row) for row in rows)
+        patched.overlay.sort(key=sort_key)
+        return patched
+
+    def reload_rows(self, names: Sequence[str]) -> "ItemIndex":
+        """``with_changes`` for ``names``, reading their rows from the DB."""
+        rows = []
+        with connection() as conn:
+            for i in range(0, len(names), LOOKUP_CHUNK):
+                chunk = names[i:i + LOOKUP_CHUNK]
+                where = f"WHERE name IN ({', '.join('?' * len(chunk))})"
+                rows.extend(conn.execute(LOAD_SQL.format(where=where), chunk))
+        return self.with_changes(names, rows)
+
+    @property
+    def stale(self) -> bool:
+        """True once patches cover enough rows that a full reload pays off."""
+        patched = len(self.masked) + len(self.overlay)
+        return patched > max(STALE_ROWS, STALE_SHARE * len(self.rows))
+
+    # -- search -----------------------------------------------------------
+
+    def _select(self, predicates: List, limit: Optional[int] = RESULT_LIMIT,
+                after: Optional[Tuple[int, str]] = None) -> List[Tuple]:
+        """First ``limit`` rows (all if None) satisfying every predicate, in result order.
+
+        With a ``page_cursor`` as ``after``, only rows sorting after it count.
+        """
+        start = 0
+        overlay = self.overlay
+        if after is not None:
+            after_key = (after[0], True, after[1])
+            start = bisect.bisect_right(self.rows, after_key, key=sort_key)
+            overlay = overlay[bisect.bisect_right(overlay, after_key, key=sort_key):]
+        results = self._select_base(predicates, limit, start)
+        if not overlay:
+            return results
+        patched = (row for row in overlay
+                   if all(predicate.matches(row) for predicate in predicates))
+        return list(islice(heapq.merge(results, islice(patched, limit), key=sort_key),
+                           limit))
+
+    def _select_base(self, predicates: List, limit: Optional[int],
+                     start: int = 0) -> List[Tuple]:
+        rows = self.rows
+        masked = self.masked
+        if not predicates:
+            stop = None if limit is None else start + limit
+            if not masked:
+                return rows[start:stop]
+            live = (row for pos, row in enumerate(islice(rows, start, None), start)
+                    if pos not in masked)
+            return list(islice(live, limit))
+
+        predicates = sorted(predicates, key=lambda p: p.estimate)
+        driver, others = predicates[0], predicates[1:]
+        if driver.estimate == 0:
+            return []
+
+        results = []
+        for pos in driver.positions(start):
+            if masked and pos in masked:
+                continue
+            for predicate in others:
+                if pos not in predicate:
+                    break
+            else:
+                results.append(rows[pos])
+                if len(results) == limit:
+                    break
+        return results
+
+    # -- query plans (see scripts.query) ---------------------------------
+
+    def _predicates(self, plan: Plan, values: Sequence) -> List:
+        predicates = []
+        for step, value in zip(plan.steps, values):
+            if step[0] == MATCH:
+                predicates.append(TermMatch(self, value, step[1]))
+            elif step[0] == TAGGED:
+                predicates.append(TagMatch(self, value, step[1]))
+            elif step[1] == "rarity":
+                rarity = self.rarities.get(value)
+                if rarity is None:
+                    # No loaded row has it, though a patched one might
+                    rarity = RowSet(0, (), FIELDS["rarity"], value)
+                predicates.append(rarity)
+            else:
+                predicates.append(self.voi[value])
+        return predicates
+
+    def execute(self, plan: Plan, values: Sequence,
+                after: Optional[Tuple[int, str]] = None,
+                limit: int = RESULT_LIMIT) -> List[Tuple]:
+        """Rows matching a compiled query, identical to the SQL backend's.
+
+        The plan's static order is only a starting point: ``_select`` drives
+        the scan from whichever predicate has the fewest actual matches.
+        """
+        return self._select(self._predicates(plan, values), limit, after)
+
+    def random_item(self, plan: Optional[Plan] = None, values: Sequence = (),
+                    rng: random.Random = random) -> Optional[Tuple]:
+        """A uniformly random row, optionally among those matching ``plan``.
+
+        With no predicates, or a lone rarity/VOI filter, a position is drawn
+        straight from a precomputed list (redrawing if it lands on a
+        patched-out row), so the cost does not grow with the catalog. Other
+        queries collect every match and pick one.
+        """
+        predicates = self._predicates(plan, values) if plan is not None else []
+        if len(predicates) > 1 or (predicates and not isinstance(predicates[0], RowSet)):
+            matches = self._select(predicates, limit=None)
+            return rng.choice(matches) if matches else None
+
+        masked = self.masked
+        if predicates:
+            candidates = predicates[0].rows
+            extra = [row for row in self.overlay if predicates[0].matches(row)]
+            live = len(candidates)
+            if live:
+                live -= sum(1 for pos in masked if pos in predicates[0])
+        else:
+            candidates = range(len(self.rows))
+            extra = self.overlay
+            live = len(candidates) - len(masked)
+        if live + len(extra) == 0:
+            return None
+
+        total = len(candidates) + len(extra)
+        while True:
+            i = rng.randrange(total)
+            if i >= len(candidates):
+                return extra[i - len(candidates)]
+            pos = candidates[i]
+            if pos not in masked:
+                return self.rows[pos]
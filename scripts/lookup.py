@@ -1,6 +1,15 @@
+"""Interactive item lookup with "did you mean" suggestions.
+
+    python -m scripts.lookup
+
+Run it as a module from the repository root: it imports the shared
+``scripts`` package, so ``python scripts/lookup.py`` no longer works.
+"""
 import sqlite3
 from pathlib import Path
 
+from scripts.batch import NameResolver
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 DB_PATH = BASE_DIR / "data" / "items.db"
 
@@ -28,8 +37,17 @@ def load_all_item_names():
     conn.close()
     return names
 
+def load_name_matcher():
+    """Every item name keyed like Sbatch's (``normalize_line`` without the
+    OCR fix-ups), for typo-tolerant suggestions"""
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute("SELECT name FROM items").fetchall()
+    conn.close()
+    return NameResolver(rows)
+
 
 if __name__ == "__main__":
+    matcher = load_name_matcher()
     while True:
         q = input("\nSearch item (or 'exit'): ").strip()
         if q.lower() == "exit":
@@ -38,7 +56,12 @@ if __name__ == "__main__":
         results = search_items(q)
 
         if not results:
-            print("No items found.")
+            suggestions = matcher.suggest(q, 3)
+            if suggestions:
+                print("No items found. Did you mean: "
+                      + ", ".join(row[0] for row, _ in suggestions) + "?")
+            else:
+                print("No items found.")
             continue
 
         for name, cat, sub, rarity, voi in results:
@@ -0,0 +1,297 @@
+"""Latency histograms for the bot's hot paths, served Prometheus-style.
+
+Everything records into one process-wide registry (``registry``):
+
+- ``bot_command_seconds{command,status}``: a whole command, invoke to
+  return (recorded by the bot's invoke hooks);
+- ``bot_stage_seconds{command,stage}``: steps inside a command (parse,
+  fetch, render, send), timed with ``stage``;
+- ``bot_db_query_seconds{shape}``: every SQLite statement run on a pooled
+  connection, keyed by its shape (``sql_shape``: literals replaced with
+  ``?``, whitespace collapsed), so one histogram covers every value a
+  query is run with;
+- ``bot_loop_lag_seconds``: how late the event loop wakes a sleeping task
+  (``watch_loop_lag``);
+- cache and pool counters, read from their ``stats()`` when scraped.
+
+Histograms have fixed buckets: recording is a bisect and a few additions
+under a lock, and memory does not grow with traffic. ``render`` writes the
+Prometheus text format and ``serve`` answers ``GET /metrics`` with it.
+"""
+import asyncio
+import bisect
+import functools
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) of the histogram buckets; a last, unbounded
+# bucket catches anything slower
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Distinct SQL shapes tracked; statements past this share one "other" series
+MAX_SQL_SHAPES = 200
+
+# How often the event loop lag is sampled (seconds)
+LOOP_LAG_INTERVAL = 0.5
+
+HELP = {
+    "bot_command_seconds": "Time to run a command, from invoke to return.",
+    "bot_stage_seconds": "Time spent in one stage of a command.",
+    "bot_db_query_seconds": "Time to run and fetch one SQLite statement, by statement shape.",
+    "bot_loop_lag_seconds": "How late the event loop woke a task sleeping a fixed interval.",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum, count, min and max."""
+
+    __slots__ = ("bounds", "counts", "total", "count", "min", "max", "_lock")
+
+    def __init__(self, bounds: Sequence[float] = BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.min = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += value
+            self.count += 1
+            if value < self.min or self.count == 1:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    def snapshot(self) -> Tuple[List[int], float, int, float]:
+        """Bucket counts (not cumulative), sum, count and max, read together."""
+        with self._lock:
+            return list(self.counts), self.total, self.count, self.max
+
+    def quantile(self, q: float) -> float:
+        """Estimated ``q``-quantile: interpolated inside the bucket it falls in,
+        narrowed to the smallest and largest values seen."""
+        with self._lock:
+            counts, count, smallest, largest = list(self.counts), self.count, self.min, self.max
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                if i == len(self.bounds):
+                    return largest
+                lower = max(self.bounds[i - 1] if i else 0.0, smallest)
+                upper = min(self.bounds[i], largest)
+                return lower + (upper - lower) * max(rank - seen, 0) / n
+            seen += n
+        return largest
+
+
+class Summary(NamedTuple):
+    labels: Dict[str, str]
+    count: int
+    total: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def sql_shape(sql: str) -> str:
+    """``sql`` with its literal values replaced by ``?`` and whitespace collapsed.
+
+    SQLite reports statements with their parameters filled in; this maps
+    every run of one query back to the same text. ``IN`` lists of any
+    length share a shape.
+    """
+    shape = _STRING.sub("?", sql)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("IN (?, ...)", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Histograms by name and labels, and stats read from other components."""
+
+    def __init__(self, bounds: Sequence[float] = BUCKETS):
+        self.bounds = tuple(bounds)
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._stats: List[Tuple[str, Labels, Callable[[], Dict[str, Any]]]] = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, **labels: Any) -> Histogram:
+        key = _labels(labels)
+        family = self._histograms.get(name)
+        histogram = family.get(key) if family is not None else None
+        if histogram is None:
+            with self._lock:
+                family = self._histograms.setdefault(name, {})
+                histogram = family.setdefault(key, Histogram(self.bounds))
+        return histogram
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        self.histogram(name, **labels).observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """Observe how long the ``with`` block takes, even when it raises."""
+        histogram = self.histogram(name, **labels)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def observe_sql(self, sql: str, seconds: float) -> None:
+        shape = sql_shape(sql)
+        family = self._histograms.get("bot_db_query_seconds", {})
+        if (("shape", shape),) not in family and len(family) >= MAX_SQL_SHAPES:
+            shape = "other"
+        self.observe("bot_db_query_seconds", seconds, shape=shape)
+
+    def add_stats(self, family: str, stats: Callable[[], Dict[str, Any]], **labels: Any) -> None:
+        """Export the numbers in ``stats()`` as ``bot_<family>_<key>`` gauges."""
+        with self._lock:
+            self._stats.append((family, _labels(labels), stats))
+
+    def stats(self) -> List[Tuple[str, Dict[str, str], Dict[str, Any]]]:
+        """``(family, labels, stats())`` for every registered stats source."""
+        with self._lock:
+            sources = list(self._stats)
+        return [(family, dict(labels), stats()) for family, labels, stats in sources]
+
+    def summaries(self, name: str) -> List[Summary]:
+        """Count, total, quantiles and max of every series of histogram ``name``."""
+        with self._lock:
+            family = dict(self._histograms.get(name, {}))
+        summaries = []
+        for labels, histogram in family.items():
+            _, total, count, largest = histogram.snapshot()
+            summaries.append(Summary(dict(labels), count, total, histogram.quantile(0.5),
+                                     histogram.quantile(0.95), histogram.quantile(0.99),
+                                     largest))
+        return summaries
+
+    def render(self) -> str:
+        """Everything recorded, in the Prometheus text exposition format."""
+        with self._lock:
+            families = {name: dict(family) for name, family in self._histograms.items()}
+        lines = []
+        for name, family in sorted(families.items()):
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(family.items()):
+                counts, total, count, _ = histogram.snapshot()
+                cumulative = 0
+                for bound, n in zip(self.bounds + (None,), counts):
+                    cumulative += n
+                    le = "+Inf" if bound is None else repr(bound)
+                    bucket_labels = _format_labels(labels, f'le="{le}"')
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        gauges: Dict[str, List[Tuple[Labels, Any]]] = {}
+        for family, labels, stats in self.stats():
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges.setdefault(f"bot_{family}_{key}", []).append((_labels(labels), value))
+        for name, series in sorted(gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in series:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        """Forget every observation (stats sources stay registered)."""
+        with self._lock:
+            self._histograms.clear()
+
+
+registry = Metrics()
+
+
+def stage(command: str, name: str):
+    """Time one stage of a command: ``with stage("item", "fetch"): ...``"""
+    return registry.timer("bot_stage_seconds", command=command, stage=name)
+
+
+async def watch_loop_lag(interval: float = LOOP_LAG_INTERVAL,
+                         metrics: Optional[Metrics] = None) -> None:
+    """Record, forever, how late each ``interval`` sleep wakes up.
+
+    Anything that blocks the loop (a slow callback, a sync call that
+    should have gone to a thread) shows up as lag here. An idle loop
+    still reads about a millisecond: its timers are that coarse.
+    """
+    metrics = metrics or registry
+    histogram = metrics.histogram("bot_loop_lag_seconds")
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        histogram.observe(max(loop.time() - start - interval, 0.0))
+
+
+async def serve(host: str, port: int, metrics: Optional[Metrics] = None) -> asyncio.AbstractServer:
+    """Answer ``GET /metrics`` on ``host:port`` with ``render()``; 404 otherwise."""
+    metrics = metrics or registry
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+            method, path = (request.split(b"\r\n", 1)[0].split(b" ") + [b"", b""])[:2]
+            if method == b"GET" and path.split(b"?", 1)[0] == b"/metrics":
+                status, body = "200 OK", metrics.render().encode()
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                status, body, content_type = "404 Not Found", b"Not found\n", "text/plain"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                         + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -1,4 +1,14 @@
+"""Clean OCR'd or pasted text down to comparable item names.
+
+A line is lowercased, then one ``str.translate`` turns everything but
+letters, apostrophes and whitespace into spaces (curly apostrophes
+become straight ones), one regex collapses letters repeated three or
+more times, and splitting on whitespace drops the gaps. Common OCR
+misreads are fixed last. ``normalize_lines`` does the same over any
+iterable, lazily, so a whole inventory can be streamed through it.
+"""
 import re
+from typing import Iterable, Iterator
 
 COMMON_FIXES = {
     "impecator": "imperator",
@@ -10,29 +20,55 @@ COMMON_FIXES = {
     "darkstee": "darksteel",
 }
 
-def normalize_line(line: str) -> str:
-    line = line.lower()
 
-    # replace fancy quotes
-    line = line.replace("’", "'")
+class _CharMap(dict):
+    """``str.translate`` table: letters, apostrophes and whitespace kept, the rest spaced.
+
+    ASCII is filled in up front; other characters are classified on
+    first sight and remembered.
+    """
+
+    def __missing__(self, code):
+        char = chr(code)
+        self[code] = kept = char if char.isspace() else " "
+        return kept
 
-    # remove symbols and junk
-    line = re.sub(r"[\[\]\|\!\?\=\%\_\-]", " ", line)
 
-    # remove numbers
-    line = re.sub(r"\d+", " ", line)
+_CHARS = _CharMap({code: chr(code) if chr(code).isspace() else " " for code in range(128)})
+_CHARS.update({ord(c): c for c in "abcdefghijklmnopqrstuvwxyz'"})
+_CHARS[ord("’")] = "'"
 
-    # collapse repeated characters (llll → l)
-    line = re.sub(r"(.)\1{2,}", r"\1", line)
+# collapse repeated characters (llll → l); a search is much cheaper than
+# a sub that finds nothing, and few lines have any
+_REPEATS = re.compile(r"([a-z'])\1\1+")
 
-    # keep only letters + spaces
-    line = re.sub(r"[^a-z'\s]", " ", line)
+# any fix that could apply; lines without one (most) skip the fix loop
+_FIXABLE = re.compile("|".join(map(re.escape, COMMON_FIXES)))
 
-    # normalize spaces
-    line = re.sub(r"\s+", " ", line).strip()
 
-    # fix common OCR mistakes
+def _fix(line: str) -> str:
+    # One replace per entry, in order: a fix can feed the next, and
+    # normalized text has always been produced this way
     for bad, good in COMMON_FIXES.items():
         line = line.replace(bad, good)
+    return line
+
+
+def normalize_line(line: str, fix_ocr: bool = True) -> str:
+    line = line.lower().translate(_CHARS)
+    if _REPEATS.search(line):
+        line = _REPEATS.sub(r"\1", line)
+    line = " ".join(line.split())
+
+    # fix common OCR mistakes (off when matching against the catalog,
+    # where a real name like "kyrsieger" must not turn into another)
+    if fix_ocr and _FIXABLE.search(line):
+        line = _fix(line)
 
     return line
+
+
+def normalize_lines(lines: Iterable[str], fix_ocr: bool = True) -> Iterator[str]:
+    """``normalize_line`` of each of ``lines``, in order, as they are consumed."""
+    for line in lines:
+        yield normalize_line(line, fix_ocr)
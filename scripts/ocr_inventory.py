@@ -1,50 +1,350 @@
+"""Read an inventory screenshot into a list of catalog items.
+
+The pipeline runs in four steps:
+
+1. Find the item slots (``scripts.slots``): mask the slot background,
+   filter the contours by shape, and snap them to the inventory grid.
+2. OCR each slot with Tesseract. The screenshot is converted to
+   grayscale once, and each slot is a view into it. The view is
+   upscaled, thresholded and piped to Tesseract, so nothing is copied
+   per slot and nothing touches the disk.
+3. Clean the text with ``normalize_line``.
+4. Resolve the text against the catalog with the ``NameResolver`` that
+   ``Sbatch`` uses.
+
+Slot labels wrap long names without a hyphen ("Hallowscle" / "ave"), so
+each line break is also tried closed up. Text that still matches no
+name falls back to the fuzzy matcher.
+
+Tesseract runs as an external binary, one process per slot read. It is
+looked up on PATH unless ``configure`` (or ``--tesseract`` on the
+command line) points at it. An ``OcrPool`` reads the slots of a
+screenshot in parallel, one Tesseract process per worker.
+
+Slot crops can be saved for checking detection and OCR by eye. Pass a
+``DebugDumps`` to ``extract_items`` (or ``--debug-dir`` on the command
+line). It saves a sample of screenshots, rate limited, and is off by
+default.
+
+    python -m scripts.ocr_inventory inventoryExample.png --workers 4
+    python -m scripts.ocr_inventory inventoryExample.png --debug-dir debug_boxes
+    python -m scripts.ocr_inventory shot.png --tesseract "C:\\Program Files\\Tesseract-OCR\\tesseract.exe"
+"""
+import argparse
+import collections
+import functools
+import itertools
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
 import cv2
 import numpy as np
 import pytesseract
-import os
+from pytesseract import TesseractError, TesseractNotFoundError
+
+from scripts.batch import AMBIGUOUS, MATCHED, MAX_CANDIDATES, BatchResult, NameResolver
+from scripts.normalize import normalize_line, normalize_lines
+from scripts.slots import Box, find_boxes
+
+# Slot crops are upscaled before OCR; label text is ~10 px tall on screen
+OCR_SCALE = 3
+# Treat the crop as one uniform block of text
+TESSERACT_CONFIG = "--psm 6"
+
+# Digits and bars Tesseract reads for letters; labels never contain digits
+LOOKALIKES = str.maketrans("015|", "olsl")
+
+# Upgrade stars above a name come out as short junk lines ("*", "kk")
+MIN_LINE = 3
+
+# Lowest fuzzy score accepted as a match rather than shown as a guess
+OCR_MATCH_SCORE = 0.5
+
+# Slots read at once by an OcrPool
+DEFAULT_OCR_WORKERS = os.cpu_count() or 1
+
+Image = Union[str, Path, bytes, np.ndarray]
+
+
+class Slot(NamedTuple):
+    box: Box
+    text: str  # raw OCR text
+
+
+class ScannedItem(NamedTuple):
+    box: Box
+    text: str                # raw OCR text
+    key: str                 # normalized text
+    status: str              # batch.MATCHED, AMBIGUOUS or MISSING
+    rows: Tuple[Tuple, ...]  # the match, candidates, or a suggestion when missing
+    score: float             # 1.0 for a name match, else the fuzzy score
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.rows[0][0] if self.status == MATCHED else None
+
+    @property
+    def rarity(self) -> Optional[str]:
+        return self.rows[0][3] if self.status == MATCHED else None
+
+    @property
+    def voi(self) -> bool:
+        return self.status == MATCHED and bool(self.rows[0][4])
 
-pytesseract.pytesseract.tesseract_cmd = (
-    r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-)
 
-os.makedirs("debug_boxes", exist_ok=True)
+def configure(tesseract_cmd: Optional[str] = None) -> None:
+    """Use the Tesseract binary at ``tesseract_cmd`` (default: ``tesseract`` on PATH)."""
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
 
 
-def extract_items(image_path):
-    img = cv2.imread(image_path)
+def load_image(image: Image) -> np.ndarray:
+    """A BGR image from a path, encoded image bytes, or an array (returned as is)."""
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        img = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("not a readable image")
+        return img
+    img = cv2.imread(str(image))
     if img is None:
-        raise FileNotFoundError(image_path)
+        raise FileNotFoundError(image)
+    return img
+
+
+def read_text(gray: np.ndarray, omp_threads: Optional[int] = None) -> str:
+    """Tesseract's reading of one grayscale slot crop.
+
+    The crop goes to Tesseract as a PGM on stdin and the text comes back
+    on stdout, where ``pytesseract`` would write both to temp files.
+    ``omp_threads`` caps Tesseract's OpenMP threads for this process
+    only, unless ``OMP_THREAD_LIMIT`` is already set.
+    """
+    big = cv2.resize(gray, None, fx=OCR_SCALE, fy=OCR_SCALE, interpolation=cv2.INTER_CUBIC)
+    _, binary = cv2.threshold(big, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    _, pgm = cv2.imencode(".pgm", binary)
+    command = [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout", *TESSERACT_CONFIG.split()]
+    env = None
+    if omp_threads is not None:
+        env = dict(os.environ)
+        env.setdefault("OMP_THREAD_LIMIT", str(omp_threads))
+    try:
+        done = subprocess.run(command, input=pgm.tobytes(), capture_output=True, env=env)
+    except FileNotFoundError:
+        raise TesseractNotFoundError() from None
+    if done.returncode:
+        raise TesseractError(done.returncode, done.stderr.decode("utf-8", "replace").strip())
+    return done.stdout.decode("utf-8", "replace")
+
+
+class DebugDumps:
+    """Saves the slot crops of some screenshots under ``directory``.
+
+    Every ``every``-th screenshot is saved, and at most ``per_minute`` of
+    them in any minute (``None``: no limit). Each slot is written as
+    ``<shot>_<slot>_raw.png`` and ``<shot>_<slot>_gray.png``. The
+    directory is created on the first save.
+    """
+
+    def __init__(self, directory: Union[str, Path], every: int = 1,
+                 per_minute: Optional[int] = None):
+        if every < 1:
+            raise ValueError("every must be at least 1")
+        self.directory = Path(directory)
+        self.every = every
+        self.per_minute = per_minute
+        self._seen = itertools.count()
+        self._saved = 0
+        self._recent: "collections.deque[float]" = collections.deque()
+        self._lock = threading.Lock()
+
+    def take(self) -> Optional[int]:
+        """A number to save the next screenshot under, or None to skip it."""
+        with self._lock:
+            if next(self._seen) % self.every:
+                return None
+            if self.per_minute is not None:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.per_minute:
+                    return None
+                self._recent.append(now)
+            self._saved += 1
+            return self._saved
+
+    def save(self, shot: int, img: np.ndarray, gray: np.ndarray, boxes: List[Box]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for i, (x, y, w, h) in enumerate(boxes):
+            cv2.imwrite(str(self.directory / f"{shot}_{i}_raw.png"), img[y:y + h, x:x + w])
+            cv2.imwrite(str(self.directory / f"{shot}_{i}_gray.png"), gray[y:y + h, x:x + w])
+
+
+class OcrPool:
+    """Reads slot crops on a bounded set of workers, results in crop order.
+
+    Each read is a separate Tesseract process, so worker threads, each
+    waiting on its own process, keep ``workers`` cores busy. With one
+    worker, crops are read in the calling thread. Several scans may share
+    a pool; together they never run more than ``workers`` Tesseracts.
+    """
+
+    def __init__(self, workers: int = DEFAULT_OCR_WORKERS,
+                 read: Callable[[np.ndarray], str] = read_text):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.read = read
+        self._executor = None
+        if workers > 1:
+            if read is read_text:
+                # Tesseract's own OpenMP threads would fight the pool for cores
+                self.read = functools.partial(read_text, omp_threads=1)
+            self._executor = ThreadPoolExecutor(max_workers=workers,
+                                                thread_name_prefix="ocr")
+
+    def map(self, crops: Sequence[np.ndarray]) -> List[str]:
+        """The text of each crop, in order."""
+        if self._executor is None or len(crops) < 2:
+            return [self.read(crop) for crop in crops]
+        return list(self._executor.map(self.read, crops))
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+def extract_items(image: Image, pool: Optional[OcrPool] = None,
+                  dumps: Optional[DebugDumps] = None) -> List[Slot]:
+    """OCR every slot of an inventory screenshot, in reading order.
+
+    Crops are read on ``pool`` (default: one at a time with
+    ``read_text``), and saved with ``dumps`` when it picks this
+    screenshot.
+    """
+    img = load_image(image)
+    boxes = find_boxes(img)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    crops = [gray[y:y + h, x:x + w] for x, y, w, h in boxes]
+    if dumps is not None:
+        shot = dumps.take()
+        if shot is not None:
+            dumps.save(shot, img, gray, boxes)
+    texts = pool.map(crops) if pool is not None else [read_text(crop) for crop in crops]
+    return [Slot(box, text) for box, text in zip(boxes, texts)]
+
+
+def spellings(lines: List[str]) -> List[str]:
+    """Ways to read wrapped label lines: joined by spaces, then each break closed up."""
+    joined = [" ".join(lines)]
+    for i in range(1, len(lines)):
+        joined.append(" ".join(lines[:i - 1] + [lines[i - 1] + lines[i]] + lines[i + 1:]))
+    return joined
+
+
+def _named(rows: List[Tuple]) -> Tuple[str, Tuple[Tuple, ...]]:
+    """Status and rows for the catalog rows sharing one name."""
+    if len(rows) == 1:
+        return MATCHED, tuple(rows)
+    return AMBIGUOUS, tuple(rows[:MAX_CANDIDATES])
+
 
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+def resolve_text(resolver: NameResolver, text: str) -> Optional[Tuple[str, str, Tuple, float]]:
+    """Key, status, rows and score for one slot's OCR text, or None for an empty slot.
 
-    lower = np.array([5, 10, 80])
-    upper = np.array([40, 255, 255])
+    Lines shorter than ``MIN_LINE`` above the name are dropped. Tries
+    every spelling as an exact name, then with the OCR fix-ups,
+    then the best fuzzy match, accepted at ``OCR_MATCH_SCORE``. Below
+    that, the text is resolved as an ``Sbatch`` line would be.
+    """
+    lines = [line for line in normalize_lines(text.translate(LOOKALIKES).splitlines(),
+                                              fix_ocr=False) if line]
+    while lines and len(lines[0]) < MIN_LINE:
+        del lines[0]
+    if not lines:
+        return None
+    tries = spellings(lines)
+    key = tries[0]
+    tries += [fixed for fixed in map(normalize_line, tries) if fixed not in tries]
+    for spelling in tries:
+        rows = resolver.rows.get(spelling)
+        if rows:
+            return (key, *_named(rows), 1.0)
 
-    mask = cv2.inRange(hsv, lower, upper)
+    best, score = None, 0.0
+    for spelling in tries:
+        for name, found in resolver.fuzzy.search(spelling, 1):
+            if found > score:
+                best, score = name, found
+    if score >= OCR_MATCH_SCORE:
+        return (key, *_named(resolver.rows[best]), score)
 
-    contours, _ = cv2.findContours(
-        mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
-    )
+    status, rows, _ = resolver.resolve_key(key)
+    return key, status, rows, score
 
-    print("TOTAL CONTOURS FOUND:", len(contours))
 
-    for i, c in enumerate(contours):
-        x, y, w, h = cv2.boundingRect(c)
+def scan_inventory(image: Image, resolver: NameResolver, pool: Optional[OcrPool] = None,
+                   dumps: Optional[DebugDumps] = None) -> List[ScannedItem]:
+    """The items in an inventory screenshot, one per non-empty slot, in reading order."""
+    items = []
+    for box, text in extract_items(image, pool, dumps):
+        resolved = resolve_text(resolver, text)
+        if resolved is not None:
+            items.append(ScannedItem(box, text, *resolved))
+    return items
 
-        print(f"[{i}] box size: {w}x{h}")
 
-        crop = img[y:y+h, x:x+w]
+def batch_results(items: List[ScannedItem]) -> List[BatchResult]:
+    """Scanned slots merged per item (or per unread text), counted, as ``Sbatch`` shows them."""
+    merged: Dict[Tuple, BatchResult] = {}
+    for item in items:
+        group = (item.status, item.rows[0][0] if item.status == MATCHED else item.key)
+        found = merged.get(group)
+        if found is None:
+            merged[group] = BatchResult(item.key, item.key, item.status, item.rows, False, 1)
+        else:
+            merged[group] = found._replace(count=found.count + 1)
+    return list(merged.values())
 
-        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
 
-        # Save RAW crop
-        cv2.imwrite(f"debug_boxes/{i}_raw.png", crop)
+def main():
+    # Imported here: the item index is only needed when run on its own
+    from scripts import db as itemdb
+    from scripts.item_index import ItemIndex
 
-        # Save grayscale
-        cv2.imwrite(f"debug_boxes/{i}_gray.png", gray)
+    parser = argparse.ArgumentParser(description="Read the items in an inventory screenshot.")
+    parser.add_argument("image", nargs="?", default="inventoryExample.png")
+    parser.add_argument("--tesseract", help="path to the tesseract binary")
+    parser.add_argument("--workers", type=int, default=DEFAULT_OCR_WORKERS)
+    parser.add_argument("--debug-dir", help="save the slot crops here")
+    parser.add_argument("--db", default=str(itemdb.DB_PATH))
+    args = parser.parse_args()
 
-    print("Saved ALL boxes to debug_boxes/")
+    configure(args.tesseract)
+    itemdb.configure(args.db)
+    resolver = NameResolver(ItemIndex.load().live_rows())
+    pool = OcrPool(args.workers)
+    dumps = DebugDumps(args.debug_dir) if args.debug_dir else None
+    try:
+        items = scan_inventory(args.image, resolver, pool, dumps)
+    finally:
+        pool.close()
+    for item in items:
+        x, y, _, _ = item.box
+        if item.status == MATCHED:
+            voi_tag = " | VOI" if item.voi else ""
+            print(f"({x:>4},{y:>4})  {item.name} [{item.rarity}]{voi_tag}")
+        else:
+            names = ", ".join(row[0] for row in item.rows)
+            print(f"({x:>4},{y:>4})  {item.status}: {item.key!r}" + (f" -> {names}" if names else ""))
+    print(f"{len(items)} item(s) read" + (f"; crops saved to {args.debug_dir}/" if dumps else ""))
 
 
 if __name__ == "__main__":
-    extract_items("inventoryExample.png")
+    main()
@@ -0,0 +1,128 @@
+"""Stack samples of commands that run slower than a threshold.
+
+A background thread records every thread's stack every ``interval``
+seconds into a short ring buffer. A command that ran at least
+``threshold`` seconds has the samples taken while it ran written out in
+collapsed-stack format (``thread;outer;...;inner count`` per line), which
+flame graph tools read directly. Nothing is traced per call, so the cost
+is one walk over the stacks per sample whether commands are slow or not.
+
+Samples cover the whole process: other commands running on the event
+loop at the same time show up alongside the slow one.
+"""
+import collections
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Counter, List, Optional, Tuple, Union
+
+SAMPLE_INTERVAL = 0.01
+# Samples kept: the slowest command that can be profiled, in seconds
+KEEP_SECONDS = 30.0
+
+Sample = Tuple[float, Tuple[str, ...]]  # time, collapsed stack of each thread
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples every other thread's stack on a daemon thread."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, keep: float = KEEP_SECONDS):
+        self.interval = interval
+        self._samples: "collections.deque[Sample]" = collections.deque(
+            maxlen=max(int(keep / interval), 1))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sample(self) -> None:
+        now = time.perf_counter()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            stacks.append(";".join(reversed(stack)))
+        self._samples.append((now, tuple(stacks)))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def between(self, start: float, end: float) -> Counter[str]:
+        """How often each stack was seen between two ``perf_counter`` times."""
+        return collections.Counter(stack for at, stacks in list(self._samples)
+                                   if start <= at <= end for stack in stacks)
+
+
+class SlowCommands:
+    """Writes the stack samples of each command slower than ``threshold`` seconds.
+
+    Profiles go to ``<directory>/<time>-<command>.folded`` (the directory
+    is created on the first write), at most ``per_minute`` of them in any
+    minute.
+    """
+
+    def __init__(self, threshold: float, directory: Union[str, Path],
+                 interval: float = SAMPLE_INTERVAL, per_minute: int = 6):
+        self.threshold = threshold
+        self.directory = Path(directory)
+        self.per_minute = per_minute
+        self.sampler = StackSampler(interval, max(KEEP_SECONDS, threshold * 4))
+        self._recent: "collections.deque[float]" = collections.deque()
+        # finished() runs on worker threads; the per-minute check and its
+        # update must be one step
+        self._recent_lock = threading.Lock()
+
+    def start(self) -> None:
+        self.sampler.start()
+
+    def stop(self) -> None:
+        self.sampler.stop()
+
+    def _allowed(self) -> bool:
+        with self._recent_lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.per_minute:
+                return False
+            self._recent.append(now)
+            return True
+
+    def finished(self, command: str, start: float, end: float) -> Optional[Path]:
+        """Profile a command that ran from ``start`` to ``end`` (``perf_counter``)
+        if it was slow; returns the file written, if any."""
+        if end - start < self.threshold or not self._allowed():
+            return None
+        stacks = self.sampler.between(start, end)
+        if not stacks:
+            return None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = self.directory / f"{stamp}-{command.replace(' ', '_')}.folded"
+        lines: List[str] = [f"{stack} {count}" for stack, count in stacks.most_common()]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        return path
+
@@ -0,0 +1,522 @@
+"""Compiler for ``Sitem`` queries.
+
+A query goes through four steps:
+
+1. ``tokenize`` makes one pass over the text, producing tokens plus the
+   features (colon, ``+``, ``,``/``/``, blanks, quoted parts) that pick the
+   search mode.
+2. ``parse`` builds a small AST of ``Term``, ``Filter``, ``AnyOf`` and
+   ``AllOf`` nodes, following the mode rules the bot has always used.
+3. ``lower`` flattens the AST into ANDed predicates: ``Match`` (any of some
+   terms is a substring of any of some columns), ``Tagged`` (a ``sub:``
+   filter: all or any of some whole subcategory tags) and ``Equals``.
+4. ``plan_for`` orders the predicates by estimated selectivity and
+   generates the SQL. It works on the query *shape*, the predicates with
+   their literals taken out, so plans are cached per shape and a new
+   query of a known shape only binds its values.
+
+``compile_query`` runs all four steps, memoizing both the plans and the
+most recent query texts. A ``CompiledQuery`` carries the plan and its
+values; ``scripts.search`` executes it against SQLite and
+``ItemIndex.execute`` against the in-memory index.
+"""
+import math
+import re
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from scripts.cache import ResultCache
+from scripts.init_db import fold_tag
+
+SEARCH_COLUMNS = ("name", "subcategories", "category")
+TERM_COLUMNS = ("name", "subcategories")
+
+# The trigram tokenizer cannot match substrings shorter than this
+MIN_FTS_TERM = 3
+
+PLAN_CACHE_SIZE = 256
+QUERY_CACHE_SIZE = 1024
+
+# Token kinds
+WORD = "word"
+BLANK = "blank"    # run of ' '
+SPACE = "space"    # run of other whitespace (tabs, newlines)
+QUOTE = "quote"
+PLUS = "plus"
+COMMA = "comma"    # ',' or '/'
+
+_TOKEN_RE = re.compile(r'( +)|([^\S ]+)|(")|(\+)|([,/])|([^\s"+,/]+)')
+_KINDS = (None, BLANK, SPACE, QUOTE, PLUS, COMMA, WORD)
+
+TRUE_VALUES = ("yes", "true", "1")
+FILTER_KEYS = {
+    "rarity": "rarity",
+    "type": "category",
+    "category": "category",
+    "voi": "voi",
+    "sub": "subcategory",
+    "subcategory": "subcategory",
+}
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+
+
+def tokenize(text: str) -> Tuple[List[Token], FrozenSet[str]]:
+    """Split ``text`` into tokens in one pass.
+
+    Also returns the features the mode choice depends on: ``"colon"``,
+    ``"plus"``, ``"comma"``, ``"blank"`` and ``"quoted"`` (a
+    whitespace-delimited part that starts and ends with a quote).
+    """
+    tokens = []
+    features = set()
+    part_start = part_end = None
+    for match in _TOKEN_RE.finditer(text):
+        kind = _KINDS[match.lastindex]
+        token = Token(kind, match.group())
+        tokens.append(token)
+        if kind == BLANK or kind == SPACE:
+            if kind == BLANK:
+                features.add("blank")
+            if part_start == QUOTE and part_end == QUOTE:
+                features.add("quoted")
+            part_start = part_end = None
+            continue
+        if part_start is None:
+            part_start = kind
+        part_end = kind
+        if kind == WORD:
+            if ":" in token.text:
+                features.add("colon")
+        elif kind == PLUS:
+            features.add("plus")
+        elif kind == COMMA:
+            features.add("comma")
+    if part_start == QUOTE and part_end == QUOTE:
+        features.add("quoted")
+    return tokens, frozenset(features)
+
+
+# -- AST ---------------------------------------------------------------
+
+class Term(NamedTuple):
+    """``text`` occurs (case-insensitively) in any of ``columns``."""
+    text: str
+    columns: Tuple[str, ...]
+    phrase: bool = False
+
+
+class Filter(NamedTuple):
+    """A ``key:value`` filter (key already resolved from its aliases)."""
+    key: str
+    value: Union[str, int]
+
+
+class AnyOf(NamedTuple):
+    children: Tuple
+
+
+class AllOf(NamedTuple):
+    children: Tuple
+
+
+class Parsed(NamedTuple):
+    search_type: str          # SMART, AND, OR or SINGLE
+    tags: List[str]
+    filters: Optional[dict]   # the smart filters, for reply messages
+    tree: Union[Term, AnyOf, AllOf]
+
+
+def _chunks(tokens: Sequence[Token], separators: Tuple[str, ...]) -> List[str]:
+    """Stripped, non-empty texts between separator tokens."""
+    chunks = []
+    current = []
+    for token in tokens:
+        if token.kind in separators:
+            chunks.append("".join(current).strip())
+            current = []
+        else:
+            current.append(token.text)
+    chunks.append("".join(current).strip())
+    return [chunk for chunk in chunks if chunk]
+
+
+def _smart_parts(tokens: Sequence[Token]) -> List[Tuple[str, bool]]:
+    """Parts split on blanks outside quotes, quotes removed.
+
+    Returns ``(text, quoted)`` pairs; ``quoted`` marks parts with a quoted
+    section.
+    """
+    parts = []
+    current = []
+    quoted = in_quotes = False
+    for kind, text in tokens:
+        if kind == QUOTE:
+            in_quotes = not in_quotes
+            quoted = True
+        elif kind == BLANK and not in_quotes:
+            if current:
+                parts.append(("".join(current), quoted))
+            current = []
+            quoted = False
+        else:
+            current.append(text)
+    if current:
+        parts.append(("".join(current), quoted))
+    return parts
+
+
+def _parse_smart(tokens: Sequence[Token]) -> Parsed:
+    filters = {
+        'name_terms': [],
+        'rarity': None,
+        'category': None,
+        'voi': None,
+        'subcategory': None,
+        'exact_phrases': [],
+    }
+    terms = []
+    for part, quoted in _smart_parts(tokens):
+        if ":" in part:
+            key, value = part.split(":", 1)
+            key = FILTER_KEYS.get(key.strip().lower())
+            value = value.strip()
+            if key == "voi":
+                filters[key] = 1 if value.lower() in TRUE_VALUES else 0
+            elif key == "subcategory":
+                # tag_filter folds it the way the stored tags are
+                filters[key] = value
+            elif key:
+                filters[key] = value.lower()
+        else:
+            filters['name_terms'].append(part)
+            terms.append(Term(part, TERM_COLUMNS, phrase=quoted))
+
+    children = []
+    if terms:
+        children.append(AnyOf(tuple(terms)))
+    for key in ("rarity", "category", "voi", "subcategory"):
+        if filters[key] is not None and filters[key] != "":
+            children.append(Filter(key, filters[key]))
+    return Parsed("SMART", [], filters, AllOf(tuple(children)))
+
+
+def parse(text: str) -> Parsed:
+    """Parse an ``Sitem`` query.
+
+    Any ``key:value`` part or quoted part makes it a smart query (space
+    separated terms ORed, plus filters). Otherwise ``+`` separates ANDed
+    terms, ``,`` or ``/`` ORed ones, then blanks ORed words; a lone word is
+    a single-term search.
+    """
+    tokens, features = tokenize(text)
+    if "colon" in features or "quoted" in features:
+        return _parse_smart(tokens)
+    if "plus" in features:
+        tags = _chunks(tokens, (PLUS,))
+        if not tags:
+            return Parsed("AND", tags, None, AnyOf(()))
+        return Parsed("AND", tags, None,
+                      AllOf(tuple(Term(tag, SEARCH_COLUMNS) for tag in tags)))
+    if "comma" in features:
+        tags = _chunks(tokens, (COMMA,))
+    elif "blank" in features:
+        tags = _chunks(tokens, (BLANK, SPACE))
+    else:
+        return Parsed("SINGLE", [text], None, Term(text, SEARCH_COLUMNS))
+    return Parsed("OR", tags, None,
+                  AnyOf(tuple(Term(tag, SEARCH_COLUMNS) for tag in tags)))
+
+
+# -- predicates --------------------------------------------------------
+
+MATCH = "match"
+EQUALS = "equals"
+TAGGED = "tagged"
+
+
+class Match(NamedTuple):
+    """Any of ``terms`` is a substring of any of ``columns``."""
+    terms: Tuple[str, ...]
+    columns: Tuple[str, ...]
+
+
+class Equals(NamedTuple):
+    field: str
+    value: Union[str, int]
+
+
+class Tagged(NamedTuple):
+    """The item has every one (``every``) or any one of ``tags``."""
+    tags: Tuple[str, ...]
+    every: bool
+
+
+Predicate = Union[Match, Equals, Tagged]
+
+
+def shape_of(predicate: Predicate) -> tuple:
+    """The predicate without its literals (term lengths still pick FTS or LIKE)."""
+    if isinstance(predicate, Equals):
+        return EQUALS, predicate.field
+    if isinstance(predicate, Tagged):
+        return TAGGED, predicate.every, len(predicate.tags)
+    return (MATCH, predicate.columns,
+            tuple(len(term) >= MIN_FTS_TERM for term in predicate.terms))
+
+
+def value_of(predicate: Predicate):
+    if isinstance(predicate, Equals):
+        return predicate.value
+    return predicate.tags if isinstance(predicate, Tagged) else predicate.terms
+
+
+def key_of(predicate: Predicate) -> tuple:
+    if isinstance(predicate, Equals):
+        return EQUALS, predicate.field, predicate.value
+    if isinstance(predicate, Tagged):
+        return TAGGED, predicate.every, tuple(sorted(predicate.tags))
+    return MATCH, predicate.columns, tuple(sorted({t.lower() for t in predicate.terms}))
+
+
+_FILTER_COLUMNS = {"category": ("category",)}
+
+# In a sub: filter '/' and '+' join tags that must all be present, and
+# ',' separates alternatives: sub:heavy/sword, sub:flame,frost
+_ALL_TAGS = re.compile(r"[/+]")
+_ANY_TAGS = re.compile(r"[/+,]")
+
+
+def tag_filter(value: str) -> Tagged:
+    """The ``Tagged`` predicate of a ``sub:`` filter value.
+
+    Tags match whole: ``sub:elem`` does not match "elemental". A value
+    with a ',' matches items having any of its tags.
+    """
+    every = "," not in value
+    tags = (_ALL_TAGS if every else _ANY_TAGS).split(fold_tag(value))
+    # dict.fromkeys drops repeats but keeps the order
+    return Tagged(tuple(dict.fromkeys(tag.strip() for tag in tags if tag.strip())), every)
+
+
+def lower(node) -> List[Predicate]:
+    """The AST as a list of ANDed predicates."""
+    if isinstance(node, Term):
+        return [Match((node.text,), node.columns)]
+    if isinstance(node, Filter):
+        if node.key == "subcategory":
+            return [tag_filter(node.value)]
+        if node.key in _FILTER_COLUMNS:
+            return [Match((node.value,), _FILTER_COLUMNS[node.key])]
+        return [Equals(node.key, node.value)]
+    if isinstance(node, AllOf):
+        return [predicate for child in node.children for predicate in lower(child)]
+    # AnyOf: the grammar only ORs plain terms over the same columns. With
+    # no terms at all it matches nothing.
+    columns = node.children[0].columns if node.children else SEARCH_COLUMNS
+    return [Match(tuple(child.text for child in node.children), columns)]
+
+
+# -- planning ----------------------------------------------------------
+
+# Rough share of the catalog a predicate keeps. Only the order matters:
+# indexed full-text terms first, then the cheap equality tests, then
+# short terms that need a LIKE scan. Backends that know real counts
+# (ItemIndex) refine the order per query.
+FTS_TERM_SELECTIVITY = 0.01
+LIKE_TERM_SELECTIVITY = 0.5
+EQUALS_SELECTIVITY = {"rarity": 0.2, "voi": 0.4}
+TAG_SELECTIVITY = 0.1
+
+
+def selectivity(shape: tuple) -> float:
+    if shape[0] == EQUALS:
+        return EQUALS_SELECTIVITY.get(shape[1], 0.5)
+    if shape[0] == TAGGED:
+        _, every, count = shape
+        return TAG_SELECTIVITY ** count if every else min(1.0, TAG_SELECTIVITY * count)
+    _, columns, long_terms = shape
+    per_term = sum(FTS_TERM_SELECTIVITY if is_long else LIKE_TERM_SELECTIVITY
+                   for is_long in long_terms)
+    # ORed terms and columns each widen the match
+    return min(1.0, per_term * len(columns))
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _fts_group(terms: Sequence[str], columns: Sequence[str]) -> str:
+    column_filter = "{" + " ".join(columns) + "}"
+    return " OR ".join(f"{column_filter} : {_fts_phrase(term)}" for term in terms)
+
+
+def _like_clause(columns: Sequence[str]) -> str:
+    return "(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in columns) + ")"
+
+
+def _like_pattern(term: str) -> str:
+    """``%term%`` with the term's own ``%`` and ``_`` matched literally, as
+    the FTS and in-memory backends do."""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+FTS_CLAUSE = "id IN (SELECT rowid FROM items_fts WHERE items_fts MATCH ?)"
+EQUALS_SQL = {"rarity": "LOWER(rarity) = ?", "voi": "voi = ?"}
+
+_TAG_ID = "(SELECT id FROM tags WHERE tag = ?)"
+_HAS_TAG = ("EXISTS (SELECT 1 FROM item_tags AS other "
+            f"WHERE other.item_id = item_tags.item_id AND other.tag_id = {_TAG_ID})")
+
+
+def _tag_clause(every: bool, count: int) -> str:
+    """SQL for a ``Tagged`` shape; binds the tags (twice for several ANDed).
+
+    Any of the tags: the union of their item ranges in item_tags. All of
+    them: the range of the rarest tag (by tags.item_count), keeping the
+    items that have every tag, each checked with one index probe.
+    """
+    if not count:
+        return "0"
+    marks = ", ".join("?" * count)
+    if not every:
+        return (f"id IN (SELECT item_id FROM item_tags "
+                f"WHERE tag_id IN (SELECT id FROM tags WHERE tag IN ({marks})))")
+    if count == 1:
+        return f"id IN (SELECT item_id FROM item_tags WHERE tag_id = {_TAG_ID})"
+    rarest = f"(SELECT id FROM tags WHERE tag IN ({marks}) ORDER BY item_count LIMIT 1)"
+    return (f"id IN (SELECT item_id FROM item_tags WHERE tag_id = {rarest} AND "
+            + " AND ".join([_HAS_TAG] * count) + ")")
+
+
+class Plan:
+    """Ordered predicate shapes for one query shape, with their SQL.
+
+    ``steps`` are the predicate shapes in execution order; a compiled
+    query's ``values`` line up with them. ``where`` is the SQL condition
+    (``1=1`` for no predicates) and ``sql_params`` binds values to it. All
+    terms long enough for the trigram index, across every predicate, go
+    into one ``items_fts MATCH``.
+    """
+
+    __slots__ = ("steps", "order", "where", "_fts_steps", "_bind")
+
+    def __init__(self, shapes: Sequence[tuple]):
+        self.order = tuple(sorted(range(len(shapes)),
+                                  key=lambda i: (selectivity(shapes[i]), i)))
+        self.steps = tuple(shapes[i] for i in self.order)
+
+        conditions = []
+        bind = []
+        self._fts_steps = tuple(
+            i for i, step in enumerate(self.steps)
+            if step[0] == MATCH and step[2] and all(step[2])
+        )
+        if self._fts_steps:
+            conditions.append(FTS_CLAUSE)
+        for i, step in enumerate(self.steps):
+            if step[0] == EQUALS:
+                conditions.append(EQUALS_SQL[step[1]])
+                bind.append((EQUALS, i))
+            elif step[0] == TAGGED:
+                conditions.append(_tag_clause(step[1], step[2]))
+                bind.append((TAGGED, i))
+            elif i not in self._fts_steps:
+                _, columns, long_terms = step
+                parts = []
+                if any(long_terms):
+                    parts.append(FTS_CLAUSE)
+                parts.extend(_like_clause(columns) for is_long in long_terms
+                             if not is_long)
+                conditions.append("(" + " OR ".join(parts) + ")" if parts else "0")
+                bind.append((MATCH, i))
+        self.where = " AND ".join(conditions) if conditions else "1=1"
+        self._bind = tuple(bind)
+
+    def sql_params(self, values: Sequence) -> list:
+        steps = self.steps
+        params = []
+        if self._fts_steps:
+            groups = [_fts_group(values[i], steps[i][1]) for i in self._fts_steps]
+            params.append(groups[0] if len(groups) == 1
+                          else " AND ".join(f"({group})" for group in groups))
+        for kind, i in self._bind:
+            if kind == EQUALS:
+                params.append(values[i])
+                continue
+            if kind == TAGGED:
+                _, every, count = steps[i]
+                params.extend(values[i] * (2 if every and count > 1 else 1))
+                continue
+            terms = values[i]
+            columns = steps[i][1]
+            long = [term for term in terms if len(term) >= MIN_FTS_TERM]
+            if long:
+                params.append(_fts_group(long, columns))
+            for term in terms:
+                if len(term) < MIN_FTS_TERM:
+                    params.extend([_like_pattern(term)] * len(columns))
+        return params
+
+
+_plans = ResultCache(max_entries=PLAN_CACHE_SIZE, ttl=math.inf)
+_queries = ResultCache(max_entries=QUERY_CACHE_SIZE, ttl=math.inf)
+
+
+def plan_for(shapes: Tuple[tuple, ...]) -> Plan:
+    """The cached plan for a query shape, building it on first use."""
+    plan = _plans.get(shapes)
+    if plan is None:
+        plan = Plan(shapes)
+        _plans.put(shapes, plan)
+    return plan
+
+
+class CompiledQuery(NamedTuple):
+    text: str
+    search_type: str
+    tags: List[str]
+    filters: Optional[dict]
+    plan: Plan
+    values: tuple     # one per plan step
+    key: tuple        # same for every spelling of the same predicates
+
+    @property
+    def sql_params(self) -> list:
+        return self.plan.sql_params(self.values)
+
+
+def compile_query(text: str) -> CompiledQuery:
+    """Parse, plan and bind ``text``, reusing cached work where possible."""
+    compiled = _queries.get(text)
+    if compiled is not None:
+        return compiled
+
+    parsed = parse(text)
+    predicates = lower(parsed.tree)
+    plan = plan_for(tuple(shape_of(predicate) for predicate in predicates))
+    compiled = CompiledQuery(
+        text=text,
+        search_type=parsed.search_type,
+        tags=parsed.tags,
+        filters=parsed.filters,
+        plan=plan,
+        values=tuple(value_of(predicates[i]) for i in plan.order),
+        # Matching is case-insensitive and ANDed predicates (and ORed
+        # terms) commute, so sorted, lower-cased keys identify the rows
+        key=tuple(sorted(key_of(predicate) for predicate in predicates)),
+    )
+    _queries.put(text, compiled)
+    return compiled
+
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    return {"plans": _plans.stats(), "queries": _queries.stats()}
+
+
+def clear_caches() -> None:
+    _plans.clear()
+    _queries.clear()
@@ -0,0 +1,120 @@
+"""Embed fields for item rows, formatted once and shared between replies.
+
+Listings show the same rows over and over, so each row's embed fields are
+built on first display and kept in a bounded LRU keyed by the row tuple
+itself: an import that changes a row changes its key, so nothing needs
+invalidating. Fields are plain dicts in Discord's embed format, meant to
+be handed to ``discord.Embed.from_dict``, which keeps them by reference.
+Callers must not modify a returned field.
+"""
+import functools
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+from scripts.batch import AMBIGUOUS, MATCHED, MISSING, BatchResult
+
+FIELD_CACHE_SIZE = 4096
+
+RARITY_EMOJI = {
+    'relic': '🟣',
+    'legendary': '🟡',
+    'named': '🔵',
+    'hallowtide': '🟠',
+    'normal': '⚪',
+}
+DEFAULT_EMOJI = '⚪'
+VOI_TAG = " <:VOI:1470243357065220187>"
+
+
+class RenderedItem(NamedTuple):
+    lower_name: str     # for highlight checks
+    field: dict         # Sitem listing
+    bold_field: dict    # Sitem listing, name highlighted
+    voi_label: str      # Svoi listing, numbered per reply
+    voi_value: str
+
+
+# functools' C LRU rather than ResultCache: a hit has to cost less than
+# formatting the row again, which leaves no room for locks or clocks
+@functools.lru_cache(maxsize=FIELD_CACHE_SIZE)
+def render_item(row: Tuple) -> RenderedItem:
+    """The rendered fields of ``row``, formatting it on first use."""
+    name, cat, sub, rarity, voi = row
+    emoji = RARITY_EMOJI.get((rarity or "").lower(), DEFAULT_EMOJI)
+    voi_tag = VOI_TAG if voi else ""
+    value = f"**Type:** {cat}\n**Subcategories:** {sub}\n**Rarity:** {rarity}{voi_tag}"
+    return RenderedItem(
+        lower_name=(name or "").lower(),
+        field={"inline": True, "name": f"{emoji} {name}", "value": value},
+        bold_field={"inline": True, "name": f"{emoji} **{name}**", "value": value},
+        voi_label=f"{emoji} {name}",
+        voi_value=f"Type: {cat}\nRarity: {rarity}",
+    )
+
+
+def search_fields(rows: Iterable[Tuple], highlight: Sequence[str] = ()) -> List[dict]:
+    """Sitem fields for ``rows``, bolding names that contain a ``highlight`` term."""
+    if not highlight:
+        return [render_item(row).field for row in rows]
+    terms = [term.lower() for term in highlight]
+    fields = []
+    for row in rows:
+        rendered = render_item(row)
+        for term in terms:
+            if term in rendered.lower_name:
+                fields.append(rendered.bold_field)
+                break
+        else:
+            fields.append(rendered.field)
+    return fields
+
+
+def voi_fields(rows: Iterable[Tuple], start: int = 1) -> List[dict]:
+    """Numbered Svoi fields for ``rows``."""
+    fields = []
+    for i, row in enumerate(rows, start):
+        rendered = render_item(row)
+        fields.append({"inline": True, "name": f"{i}. {rendered.voi_label}",
+                       "value": rendered.voi_value})
+    return fields
+
+
+BATCH_MARKS = {MATCHED: "✅", AMBIGUOUS: "❓", MISSING: "❌"}
+
+
+def batch_line(result: BatchResult) -> str:
+    """One compact Sbatch summary line."""
+    mark = BATCH_MARKS[result.status]
+    count = f" ×{result.count}" if result.count > 1 else ""
+    if result.status == MATCHED:
+        name, _, _, rarity, voi = result.rows[0]
+        emoji = RARITY_EMOJI.get((rarity or "").lower(), DEFAULT_EMOJI)
+        voi_tag = VOI_TAG if voi else ""
+        return f"{mark} {emoji} **{name}**{count} · {rarity}{voi_tag}"
+    if result.status == AMBIGUOUS:
+        names = ", ".join(row[0] for row in result.rows)
+        more = ", …" if result.more else ""
+        return f"{mark} `{result.line}`{count} → {names}{more}"
+    if result.rows:
+        return f"{mark} `{result.line}`{count} → did you mean {result.rows[0][0]}?"
+    return f"{mark} `{result.line}`{count}"
+
+
+def prerender(rows: Iterable[Tuple]) -> None:
+    """Render ``rows`` ahead of their first display."""
+    for row in rows:
+        render_item(row)
+
+
+def cache_stats() -> Dict[str, float]:
+    info = render_item.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "entries": info.currsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": round(info.hits / lookups, 3) if lookups else 0.0,
+    }
+
+
+def clear_cache() -> None:
+    render_item.cache_clear()
@@ -0,0 +1,140 @@
+import random
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+from scripts.db import connection
+from scripts.query import CompiledQuery, Plan, compile_query
+
+if TYPE_CHECKING:
+    from scripts.item_index import ItemIndex
+
+RESULT_LIMIT = 30
+
+# Keyset condition for a page_cursor (scripts.item_index); both the
+# unfiltered and the filtered listings seek their index to it
+AFTER_SQL = "(rarity_rank, name) > (?, ?)"
+
+# Rowid probes before random_item falls back to an OFFSET scan
+RANDOM_PROBES = 32
+
+RANDOM_ROW_SQL = """
+    SELECT name, category, subcategories, rarity, voi FROM items WHERE id = ?
+"""
+
+
+class SqlBackend:
+    """Runs compiled query plans against SQLite.
+
+    The statement text comes from the plan, so it is the same for every
+    query of a shape and stays in each pooled connection's statement cache.
+    """
+
+    def execute(self, plan: Plan, values: Sequence,
+                after: Optional[Tuple[int, str]] = None,
+                limit: int = RESULT_LIMIT) -> List[Tuple]:
+        """Up to ``limit`` matching rows in result order, after cursor ``after``."""
+        where = plan.where
+        params = plan.sql_params(values)
+        if after is not None:
+            where = f"{where} AND {AFTER_SQL}"
+            params.extend(after)
+        with connection() as conn:
+            cur = conn.cursor()
+
+            cur.execute(f"""
+                SELECT name, category, subcategories, rarity, voi
+                FROM items
+                WHERE {where}
+                ORDER BY rarity_rank, name
+                LIMIT ?
+            """, params + [limit])
+
+            results = cur.fetchall()
+        return results
+
+    def random_item(self, plan: Optional[Plan] = None, values: Sequence = (),
+                    rng: random.Random = random) -> Optional[Tuple]:
+        """A uniformly random item, optionally among those matching ``plan``.
+
+        Without a plan (or one with no predicates) a random rowid in
+        [min, max] is probed until it hits a row (deleted ids leave gaps,
+        so a probe can miss; each live row is equally likely either way).
+        Otherwise the matches are counted and a random offset into them is
+        read, both from an index where the predicates allow it.
+        """
+        with connection() as conn:
+            if plan is not None and plan.steps:
+                params = plan.sql_params(values)
+                count = conn.execute(f"SELECT COUNT(*) FROM items WHERE {plan.where}",
+                                     params).fetchone()[0]
+                if not count:
+                    return None
+                return conn.execute(
+                    f"SELECT name, category, subcategories, rarity, voi FROM items "
+                    f"WHERE {plan.where} LIMIT 1 OFFSET ?",
+                    params + [rng.randrange(count)]
+                ).fetchone()
+
+            # Separate subqueries: each is a single B-tree seek, while
+            # MIN(id), MAX(id) in one SELECT scans the table
+            low, high = conn.execute(
+                "SELECT (SELECT MIN(id) FROM items), (SELECT MAX(id) FROM items)"
+            ).fetchone()
+            if low is None:
+                return None
+            for _ in range(RANDOM_PROBES):
+                row = conn.execute(RANDOM_ROW_SQL, (rng.randint(low, high),)).fetchone()
+                if row is not None:
+                    return row
+
+            # Mostly gaps: an OFFSET scan is linear but still uniform
+            count = conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+            return conn.execute(
+                "SELECT name, category, subcategories, rarity, voi FROM items "
+                "LIMIT 1 OFFSET ?", (rng.randrange(count),)
+            ).fetchone()
+
+
+sql_backend = SqlBackend()
+
+
+def execute(compiled: CompiledQuery, index: Optional["ItemIndex"] = None,
+            after: Optional[Tuple[int, str]] = None,
+            limit: int = RESULT_LIMIT) -> List[Tuple]:
+    """Run a compiled query against ``index`` when one is loaded, else SQLite.
+
+    Both backends return the same rows. ``after`` is the ``page_cursor``
+    of the last row already shown; the next ``limit`` rows follow it.
+    """
+    backend = index if index is not None else sql_backend
+    return backend.execute(compiled.plan, compiled.values, after, limit)
+
+def run_search(query: str, index: Optional["ItemIndex"] = None):
+    """Compile and run an ``Sitem`` query.
+
+    Returns ``(search_type, tags, results, filters)``.
+    """
+    compiled = compile_query(query)
+    return compiled.search_type, compiled.tags, execute(compiled, index), compiled.filters
+
+def random_item(compiled: Optional[CompiledQuery] = None,
+                index: Optional["ItemIndex"] = None,
+                rng: random.Random = random) -> Optional[Tuple]:
+    """A uniformly random item, among those matching ``compiled`` if given."""
+    backend = index if index is not None else sql_backend
+    if compiled is None:
+        return backend.random_item(rng=rng)
+    return backend.random_item(compiled.plan, compiled.values, rng)
+
+def voi_items() -> List[Tuple]:
+    with connection() as conn:
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT name, category, subcategories, rarity, voi
+            FROM items
+            WHERE voi = 1
+            ORDER BY rarity_rank, name
+        """)
+
+        results = cur.fetchall()
+    return results
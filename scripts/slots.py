@@ -0,0 +1,213 @@
+"""Find the item slots in an inventory screenshot.
+
+The slot background is masked by hue and brightness, and every outer
+contour of the mask is a candidate. Most candidates are noise: specks
+of matching colour, slot borders, stray lines. Each one would cost a
+Tesseract run, so candidates go through these stages:
+
+1. Drop specks too small to be part of a slot.
+2. Merge fragments (pieces not slot-shaped on their own) that overlap
+   or nearly touch. A label can cut a slot's background in two. Whole
+   slots are left alone, so noise next to a slot can't deform it.
+3. Keep the slot-shaped boxes (square, mostly filled) near the common
+   slot size.
+4. Infer the grid from the survivors: column and row pitch and origin.
+   Drop boxes that sit off it, keep one box per cell, and give every
+   slot the common size around its own centre. A highlighted slot's
+   thicker border then crops like any other.
+
+``detect`` reports how many candidates each stage kept.
+"""
+import statistics
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# HSV range of the slot background
+SLOT_LOWER = np.array([5, 10, 80])
+SLOT_UPPER = np.array([40, 255, 255])
+
+# Candidates smaller than this (bounding box, px²) are specks
+MIN_PIECE_AREA = 64
+# Fragments this close (px) are one slot
+MERGE_GAP = 4
+# Slot shape: sides of at least MIN_SLOT px, no longer than MAX_ASPECT
+# times each other, at least MIN_FILL of the box inside the contour, and
+# within SIZE_TOLERANCE times the median slot size
+MIN_SLOT = 20
+MAX_ASPECT = 1.3
+MIN_FILL = 0.6
+SIZE_TOLERANCE = 1.4
+# Furthest a slot centre may sit from its grid cell, as a share of the pitch
+GRID_TOLERANCE = 0.25
+
+Box = Tuple[int, int, int, int]  # x, y, w, h
+Region = Tuple[Box, float]       # bounding box, area inside the contour
+
+
+class Grid(NamedTuple):
+    x: float        # centre of the first column
+    y: float        # centre of the first row
+    pitch_x: float  # distance between column centres
+    pitch_y: float
+    width: int      # slot size
+    height: int
+
+
+class Detection(NamedTuple):
+    boxes: List[Box]        # slots, in reading order
+    grid: Optional[Grid]    # None with too few slots to tell
+    counts: Dict[str, int]  # candidates kept by each stage
+
+
+def reading_order(boxes: List[Box]) -> List[Box]:
+    """``boxes`` row by row, left to right.
+
+    A row is every box whose centre lies within half a box height of the
+    first box's centre, so slots a few pixels off still read in line.
+    """
+    boxes = sorted(boxes, key=lambda b: b[1] + b[3] / 2)
+    ordered = []
+    while boxes:
+        top = boxes[0][1] + boxes[0][3] / 2
+        reach = boxes[0][3] / 2
+        row = [b for b in boxes if b[1] + b[3] / 2 - top <= reach]
+        boxes = boxes[len(row):]
+        ordered.extend(sorted(row))
+    return ordered
+
+
+def mask_regions(img: np.ndarray) -> List[Region]:
+    """Every outer contour of the slot-colour mask, as a region."""
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(hsv, SLOT_LOWER, SLOT_UPPER)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return [(cv2.boundingRect(c), cv2.contourArea(c)) for c in contours]
+
+
+def drop_specks(regions: Sequence[Region]) -> List[Region]:
+    return [region for region in regions if region[0][2] * region[0][3] >= MIN_PIECE_AREA]
+
+
+def _slot_like(box: Box, area: float) -> bool:
+    _, _, w, h = box
+    return (min(w, h) >= MIN_SLOT and max(w, h) <= MAX_ASPECT * min(w, h)
+            and area >= MIN_FILL * w * h)
+
+
+def _near(a: Box, b: Box) -> bool:
+    return (a[0] - MERGE_GAP <= b[0] + b[2] and b[0] - MERGE_GAP <= a[0] + a[2]
+            and a[1] - MERGE_GAP <= b[1] + b[3] and b[1] - MERGE_GAP <= a[1] + a[3])
+
+
+def merge_fragments(regions: Sequence[Region]) -> List[Region]:
+    """Slot-like regions as they are, plus the other regions with every
+    overlapping or nearly touching group joined into one."""
+    whole = [region for region in regions if _slot_like(*region)]
+    merged = sorted(region for region in regions if not _slot_like(*region))
+    changed = True
+    while changed:
+        changed = False
+        out: List[Region] = []
+        for box, area in merged:
+            for i, (other, other_area) in enumerate(out):
+                if _near(box, other):
+                    x, y = min(box[0], other[0]), min(box[1], other[1])
+                    right = max(box[0] + box[2], other[0] + other[2])
+                    bottom = max(box[1] + box[3], other[1] + other[3])
+                    out[i] = ((x, y, right - x, bottom - y), area + other_area)
+                    changed = True
+                    break
+            else:
+                out.append((box, area))
+        merged = out
+    return whole + merged
+
+
+def slot_shaped(regions: Sequence[Region]) -> List[Box]:
+    """Boxes of the regions shaped like slots, near the median slot size."""
+    boxes = [box for box, area in regions if _slot_like(box, area)]
+    if not boxes:
+        return boxes
+    width = statistics.median(b[2] for b in boxes)
+    height = statistics.median(b[3] for b in boxes)
+    return [b for b in boxes
+            if width / SIZE_TOLERANCE <= b[2] <= width * SIZE_TOLERANCE
+            and height / SIZE_TOLERANCE <= b[3] <= height * SIZE_TOLERANCE]
+
+
+def _lines(centres: Sequence[float], size: float) -> List[float]:
+    """Centres of the columns (or rows) the box centres fall into."""
+    lines: List[List[float]] = []
+    for centre in sorted(centres):
+        if lines and centre - lines[-1][-1] <= size / 2:
+            lines[-1].append(centre)
+        else:
+            lines.append([centre])
+    return [sum(line) / len(line) for line in lines]
+
+
+def _pitch(lines: List[float]) -> Optional[float]:
+    """Spacing of ``lines``, allowing for whole lines missing in between."""
+    gaps = [b - a for a, b in zip(lines, lines[1:])]
+    if not gaps:
+        return None
+    typical = statistics.median(gaps)
+    return statistics.median(gap / max(round(gap / typical), 1) for gap in gaps)
+
+
+def infer_grid(boxes: Sequence[Box]) -> Optional[Grid]:
+    """The grid ``boxes`` sit on, or None when there are not two of them in a row or column."""
+    if len(boxes) < 2:
+        return None
+    width = round(statistics.median(b[2] for b in boxes))
+    height = round(statistics.median(b[3] for b in boxes))
+    columns = _lines([b[0] + b[2] / 2 for b in boxes], width)
+    rows = _lines([b[1] + b[3] / 2 for b in boxes], height)
+    pitch_x, pitch_y = _pitch(columns), _pitch(rows)
+    if pitch_x is None and pitch_y is None:
+        return None
+    # A single row or column: assume square cells
+    return Grid(columns[0], rows[0], pitch_x or pitch_y, pitch_y or pitch_x, width, height)
+
+
+def snap_to_grid(boxes: Sequence[Box], grid: Grid, shape: Tuple[int, ...]) -> List[Box]:
+    """One slot-sized box per occupied cell, in reading order; off-grid boxes dropped."""
+    cells: Dict[Tuple[int, int], Tuple[float, Box]] = {}
+    for x, y, w, h in boxes:
+        cx, cy = x + w / 2, y + h / 2
+        col = round((cx - grid.x) / grid.pitch_x)
+        row = round((cy - grid.y) / grid.pitch_y)
+        off = max(abs(cx - grid.x - col * grid.pitch_x) / grid.pitch_x,
+                  abs(cy - grid.y - row * grid.pitch_y) / grid.pitch_y)
+        if off > GRID_TOLERANCE:
+            continue
+        # Several boxes in a cell: keep the one closest to the slot size
+        misfit = abs(w - grid.width) + abs(h - grid.height)
+        if (row, col) not in cells or misfit < cells[row, col][0]:
+            left = min(max(round(cx - grid.width / 2), 0), shape[1] - grid.width)
+            top = min(max(round(cy - grid.height / 2), 0), shape[0] - grid.height)
+            cells[row, col] = (misfit, (left, top, grid.width, grid.height))
+    return [cells[cell][1] for cell in sorted(cells)]
+
+
+def detect(img: np.ndarray) -> Detection:
+    """The item slots in ``img``, the grid they sit on, and the candidates kept per stage."""
+    regions = mask_regions(img)
+    counts = {"contours": len(regions)}
+    regions = drop_specks(regions)
+    counts["pieces"] = len(regions)
+    regions = merge_fragments(regions)
+    counts["merged"] = len(regions)
+    boxes = slot_shaped(regions)
+    counts["slot-shaped"] = len(boxes)
+    grid = infer_grid(boxes)
+    boxes = snap_to_grid(boxes, grid, img.shape) if grid is not None else reading_order(boxes)
+    counts["on grid"] = len(boxes)
+    return Detection(boxes, grid, counts)
+
+
+def find_boxes(img: np.ndarray) -> List[Box]:
+    """Bounding boxes of the item slots in ``img``, in reading order."""
+    return detect(img).boxes
@@ -0,0 +1,31 @@
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from scripts import db as itemdb  # noqa: E402
+from scripts.item_index import ItemIndex  # noqa: E402
+
+
+@pytest.fixture
+def use_db():
+    """Point ``scripts.db`` at a DB for one test; puts the default back after."""
+    def use(path):
+        itemdb.configure(Path(path))
+        return path
+
+    yield use
+    itemdb.configure(itemdb.DB_PATH)
+
+
+@pytest.fixture
+def catalog(tmp_path, use_db):
+    """An ``ItemIndex`` of a copy of the bundled catalog (loading upgrades the DB in place)."""
+    path = tmp_path / "items.db"
+    shutil.copyfile(ROOT / "data" / "items.db", path)
+    use_db(path)
+    return ItemIndex.load()
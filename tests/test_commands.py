@@ -0,0 +1,21 @@
+"""The offline command harness (benchmarks/bench_commands.py) runs clean.
+
+Its ``FakeContext`` has to keep up with the context API the handlers
+use, so a short run of it guards them against Discord-only calls.
+"""
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+
+@pytest.mark.parametrize("extra", [[], ["--sql", "--no-cache", "--limits"]])
+def test_command_harness_runs(extra):
+    done = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_commands", "--rows", "1000",
+         "--requests", "100", "--concurrency", "1", "8", *extra],
+        cwd=ROOT, capture_output=True, text=True, timeout=300)
+    assert done.returncode == 0, done.stderr
+    assert "executed" in done.stdout
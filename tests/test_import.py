@@ -0,0 +1,67 @@
+"""A source with repeated names imports the same way in every mode."""
+import csv
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from scripts.import_items import import_frame, normalize_frame, stream_import, sync_frame
+from scripts.init_db import init_db
+
+HEADER = ["item_name", "category", "subcategories", "rarity", "voi", "notes"]
+ROWS = [
+    ["Alpha", "weapon", "heavy/sword", "normal", "no", "first"],
+    ["Beta", "weapon", "light/dagger", "named", "no", ""],
+    ["Alpha", "weapon", "heavy/sword/flame", "legendary", "yes", "second"],
+    ["Gamma", "armor", "shield", "normal", "no", "only"],
+    ["Beta", "weapon", "light/dagger", "relic", "yes", "again"],
+    ["Alpha", "weapon", "heavy/sword/frost", "relic", "no", "last"],
+]
+# Already in the DB before the import
+STORED = ("Alpha", "weapon", "old", "normal", 0, "stored")
+
+
+def make_db(path, stored):
+    conn = sqlite3.connect(path)
+    init_db(conn)
+    if stored:
+        with conn:
+            conn.execute("INSERT INTO items (name, category, subcategories, rarity, voi, notes) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", STORED)
+    return conn
+
+
+def items(conn):
+    return conn.execute("SELECT name, category, subcategories, rarity, voi, notes "
+                        "FROM items ORDER BY name").fetchall()
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "items.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows([HEADER] + ROWS)
+    return path
+
+
+@pytest.mark.parametrize("stored", [False, True])
+@pytest.mark.parametrize("update", [True, False])
+def test_stream_and_frame_imports_agree(tmp_path, source, stored, update):
+    frame_db = make_db(tmp_path / "frame.db", stored)
+    import_frame(frame_db, normalize_frame(pd.read_csv(source, dtype=str)), update=update)
+    stream_db = make_db(tmp_path / "stream.db", stored)
+    # Two rows per batch: the repeats of a name land in different batches
+    stream_import(stream_db, source, batch_size=2, update=update)
+
+    assert items(stream_db) == items(frame_db)
+    alpha = dict((row[0], row) for row in items(frame_db))["Alpha"]
+    if stored and not update:
+        assert alpha == STORED
+    else:
+        assert alpha[5] == "last"
+
+
+def test_sync_keeps_the_last_row(tmp_path, source):
+    conn = make_db(tmp_path / "sync.db", stored=True)
+    sync_frame(conn, normalize_frame(pd.read_csv(source, dtype=str)))
+    assert [row[5] for row in items(conn)] == ["last", "again", "only"]
@@ -0,0 +1,116 @@
+"""Sscan's pipeline on the bundled inventoryExample.png.
+
+The slot reads come from ``fixtures/inventory_example.tsv``, a typed
+transcript of the screenshot, so everything but Tesseract itself runs
+anywhere. The last test reads the slots with the real Tesseract and is
+skipped where the binary is missing.
+"""
+import random
+import shutil
+
+import pytest
+
+from conftest import ROOT
+from scripts import ocr_inventory
+from scripts.batch import MATCHED, MISSING, NameResolver
+from scripts.ocr_inventory import OcrPool, load_image, scan_inventory
+from scripts.slots import find_boxes
+
+IMAGE = ROOT / "inventoryExample.png"
+TRANSCRIPT = ROOT / "tests" / "fixtures" / "inventory_example.tsv"
+
+
+def load_transcript():
+    """(label, catalog name or None) per slot, in reading order."""
+    slots = []
+    for line in TRANSCRIPT.read_text(encoding="utf-8").splitlines():
+        if line and not line.startswith("#"):
+            label, name = line.split("\t")
+            slots.append((label, None if name == "-" else name))
+    return slots
+
+
+def slot_text(label):
+    """The text a clean Tesseract read of ``label`` comes back as."""
+    stars, _, rest = label.partition(" ") if label.startswith("*") else ("", "", label)
+    return "".join(f"{line}\n" for line in [stars, *rest.split("/")] if line)
+
+
+class Transcribed:
+    """An ``OcrPool`` reader that answers each crop with the transcript of its slot.
+
+    Crops are views into the screenshot's grayscale copy, so the crop's
+    offset into it gives its slot, whichever worker reads it. ``noise``
+    swaps that share of the letters for random ones.
+    """
+
+    def __init__(self, boxes, labels, noise=0.0, seed=0):
+        self.texts = {(x, y): slot_text(label) for (x, y, _, _), label in zip(boxes, labels)}
+        self.noise = noise
+        self.rng = random.Random(seed)
+
+    def __call__(self, gray):
+        offset = gray.ctypes.data - gray.base.ctypes.data
+        y, x = divmod(offset, gray.base.strides[0])
+        text = self.texts[x, y]
+        if self.noise:
+            text = "".join(
+                self.rng.choice("abcdefghijklmnopqrstuvwxyz")
+                if ch.isalpha() and self.rng.random() < self.noise else ch
+                for ch in text)
+        return text
+
+
+@pytest.fixture(scope="module")
+def transcript():
+    return load_transcript()
+
+
+@pytest.fixture
+def resolver(catalog):
+    return NameResolver(catalog.live_rows())
+
+
+def scan(resolver, read, workers=1):
+    pool = OcrPool(workers, read)
+    try:
+        return scan_inventory(IMAGE, resolver, pool)
+    finally:
+        pool.close()
+
+
+def test_transcript_covers_every_slot(transcript):
+    assert len(find_boxes(load_image(IMAGE))) == len(transcript) == 86
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_transcript_resolves_to_the_typed_names(resolver, transcript, workers):
+    boxes = find_boxes(load_image(IMAGE))
+    items = scan(resolver, Transcribed(boxes, [label for label, _ in transcript]), workers)
+
+    assert [item.box for item in items] == boxes
+    assert [item.name for item in items] == [name for _, name in transcript]
+    khan = items[[label for label, _ in transcript].index("*** Khan Shield")]
+    assert khan.status == MISSING and khan.key == "khan shield"
+
+
+def test_garbled_reads_never_match_the_wrong_item(resolver, transcript):
+    boxes = find_boxes(load_image(IMAGE))
+    read = Transcribed(boxes, [label for label, _ in transcript], noise=0.05, seed=1)
+    items = scan(resolver, read)
+
+    assert len(items) == len(transcript)
+    for item, (_, name) in zip(items, transcript):
+        assert item.status != MATCHED or item.name == name, item.text
+    assert sum(item.name is not None for item in items) >= 80
+
+
+@pytest.mark.skipif(shutil.which(ocr_inventory.pytesseract.pytesseract.tesseract_cmd) is None,
+                    reason="tesseract binary not found")
+def test_tesseract_reads_the_screenshot(resolver, transcript):
+    items = scan(resolver, ocr_inventory.read_text)
+
+    assert len(items) == len(transcript)
+    for item, (_, name) in zip(items, transcript):
+        assert item.status != MATCHED or item.name == name, item.text
+    assert sum(item.name is not None for item in items) >= 80
@@ -0,0 +1,60 @@
+"""Listings ordered by (rarity_rank, name) walk an ordering index.
+
+Each statement is checked with EXPLAIN QUERY PLAN on a synthetic catalog:
+the VOI list, rarity and VOI filters, the unfiltered listing and short
+LIKE terms must stream in index order rather than sort every match in a
+temp B-tree. ``benchmarks/bench_order.py`` times the same shapes.
+"""
+import sqlite3
+
+import pytest
+
+from benchmarks.synth import make_db
+from scripts.query import compile_query
+from scripts.search import AFTER_SQL
+
+COLUMNS = "name, category, subcategories, rarity, voi"
+ORDER = "ORDER BY rarity_rank, name"
+
+# The statement SqlBackend.execute runs for a plan
+LISTING = f"SELECT {COLUMNS} FROM items WHERE {{where}} {ORDER} LIMIT ?"
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    path = make_db(tmp_path_factory.mktemp("order") / "items.db", 20_000)
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+
+
+def plan_of(conn, sql, params=()):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def assert_no_sort(conn, sql, params=()):
+    plan = plan_of(conn, sql, params)
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_voi_list(conn):
+    # search.voi_items: every VOI item, no LIMIT
+    assert_no_sort(conn, f"SELECT {COLUMNS} FROM items WHERE voi = 1 {ORDER}")
+
+
+def test_unfiltered_listing(conn):
+    assert_no_sort(conn, LISTING.format(where="1"), [30])
+
+
+@pytest.mark.parametrize("query", ["voi:yes", "rarity:legendary", "rarity:relic voi:yes", "ab"])
+def test_filtered_listing(conn, query):
+    compiled = compile_query(query)
+    params = compiled.plan.sql_params(compiled.values)
+    assert_no_sort(conn, LISTING.format(where=compiled.plan.where), params + [30])
+
+
+@pytest.mark.parametrize("query", ["voi:yes", "rarity:legendary"])
+def test_next_page_seeks_the_index(conn, query):
+    compiled = compile_query(query)
+    params = compiled.plan.sql_params(compiled.values) + [3, "m", 30]
+    assert_no_sort(conn, LISTING.format(where=f"{compiled.plan.where} AND {AFTER_SQL}"), params)
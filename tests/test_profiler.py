@@ -0,0 +1,25 @@
+"""SlowCommands keeps to its per-minute cap when commands finish at once."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.profiler import SlowCommands
+
+
+def test_per_minute_cap_holds_across_threads(tmp_path):
+    slow = SlowCommands(threshold=0.0, directory=tmp_path, per_minute=3)
+    # One sample (of this thread's stack) for every profile to include
+    sampling = threading.Thread(target=slow.sampler.sample)
+    sampling.start()
+    sampling.join()
+    start = slow.sampler._samples[0][0]
+    barrier = threading.Barrier(16)
+
+    def finish(i):
+        barrier.wait()
+        return slow.finished(f"cmd{i}", start, start + 1)
+
+    with ThreadPoolExecutor(16) as pool:
+        written = [path for path in pool.map(finish, range(16)) if path is not None]
+
+    assert len(written) == 3
+    assert sorted(tmp_path.iterdir()) == sorted(written)
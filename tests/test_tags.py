@@ -0,0 +1,100 @@
+"""``sub:`` filters give the same rows on SQLite and on the ItemIndex,
+however the tags were written."""
+import sqlite3
+
+import pytest
+
+from scripts import search
+from scripts.init_db import bulk_write, init_db, split_tags
+from scripts.item_index import ItemIndex
+from scripts.query import compile_query
+
+ITEMS = [
+    ("Duelist's Épée", "weapon", "Épée/light", "legendary", 0),
+    ("Court Épée", "weapon", "épée, ceremonial", "normal", 0),
+    ("Umbral Fang", "weapon", "ÜMBRA/dagger", "relic", 1),
+    ("Shade Knife", "weapon", "ümbra/light/dagger", "normal", 0),
+    ("Iron Sword", "weapon", "heavy/sword", "normal", 0),
+]
+
+# Tags fold like SQLite's lower(): ASCII letters only, so "Épée" and
+# "épée" stay two tags
+QUERIES = {
+    "sub:épée": ["Court Épée"],
+    "sub:Épée/LIGHT": ["Duelist's Épée"],
+    "sub:ÉPÉE": [],
+    "sub:ümbra": ["Shade Knife"],
+    "sub:ÜMBRA": ["Umbral Fang"],
+    "sub:ümbra+Light": ["Shade Knife"],
+    "sub:ÜMBRA,sword": ["Umbral Fang", "Iron Sword"],
+    "sub:dagger": ["Umbral Fang", "Shade Knife"],
+}
+
+
+def make_db(path, bulk):
+    conn = sqlite3.connect(path)
+    init_db(conn)
+    insert = "INSERT INTO items (name, category, subcategories, rarity, voi) VALUES (?, ?, ?, ?, ?)"
+    if bulk:
+        # Tags built by the rebuild rather than the per-row triggers
+        with bulk_write(conn):
+            conn.executemany(insert, ITEMS)
+    else:
+        with conn:
+            conn.executemany(insert, ITEMS)
+    return conn
+
+
+@pytest.fixture(params=["triggers", "rebuild"])
+def tagged_db(request, tmp_path, use_db):
+    path = tmp_path / "items.db"
+    make_db(path, bulk=request.param == "rebuild").close()
+    return use_db(path)
+
+
+def test_stored_tags_match_split_tags(tagged_db):
+    conn = sqlite3.connect(tagged_db)
+    stored = {row[0] for row in conn.execute("SELECT tag FROM tags")}
+    conn.close()
+    assert stored == {tag for item in ITEMS for tag in split_tags(item[2])}
+    assert {"épée", "Épée", "ümbra", "Ümbra"} <= stored
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_sub_filter_matches_on_both_backends(tagged_db, query):
+    index = ItemIndex.load()
+    compiled = compile_query(query)
+
+    in_sql = search.execute(compiled)
+    in_index = search.execute(compiled, index)
+
+    assert in_sql == in_index
+    assert sorted(row[0] for row in in_sql) == sorted(QUERIES[query])
+
+
+def test_plain_connection_keeps_tags_in_step(tagged_db):
+    # A hand edit from a client that never ran init_db
+    conn = sqlite3.connect(tagged_db)
+    with conn:
+        conn.execute("INSERT INTO items (name, category, subcategories, rarity, voi) "
+                     "VALUES ('Gilded Épée', 'weapon', 'Épée/Heavy', 'named', 0)")
+        conn.execute("UPDATE items SET subcategories = 'ÜMBRA/Light' WHERE name = 'Iron Sword'")
+        conn.execute("DELETE FROM items WHERE name = 'Court Épée'")
+        stored = dict(conn.execute("SELECT tag, item_count FROM tags WHERE item_count > 0"))
+        paths = [row[0] for row in conn.execute("SELECT subcategories FROM items")]
+    conn.close()
+
+    expected = {}
+    for path in paths:
+        for tag in split_tags(path):
+            expected[tag] = expected.get(tag, 0) + 1
+    assert stored == expected
+
+    index = ItemIndex.load()
+    for query, names in [("sub:Épée/heavy", ["Gilded Épée"]),
+                         ("sub:ÜMBRA+light", ["Iron Sword"]),
+                         ("sub:épée", [])]:
+        compiled = compile_query(query)
+        in_sql = search.execute(compiled)
+        assert in_sql == search.execute(compiled, index)
+        assert [row[0] for row in in_sql] == names